@@ -0,0 +1,82 @@
+# actualizador_progreso.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Referencias a los ciclos en curso: asyncio solo guarda referencias débiles a las tareas
+_tareas_activas = set()
+
+class ActualizadorProgreso:
+    """
+    Edita un mensaje de progreso a ritmo acotado: entre dos ediciones pasan al menos
+    `intervalo` segundos y de los textos publicados en ese lapso solo se envía el último.
+    Publicar no espera a Telegram, así las ediciones quedan fuera del camino crítico.
+    """
+    
+    def __init__(self, editar: Callable[[str], Awaitable], intervalo: float = None):
+        self.editar = editar
+        self.intervalo = Config.PROGRESO_INTERVALO if intervalo is None else intervalo
+        self._pendiente: Optional[str] = None
+        self._ultimo: Optional[str] = None
+        self._hay_cambio = asyncio.Event()
+        self._cerrado = False
+        self._loop = asyncio.get_running_loop()
+        self.ediciones = 0
+        self.descartados = 0
+        
+        tarea = self._loop.create_task(self._ciclo())
+        _tareas_activas.add(tarea)
+        tarea.add_done_callback(_tareas_activas.discard)
+    
+    def publicar(self, texto: str):
+        """Reemplaza el texto pendiente (llamar desde el event loop)"""
+        if self._cerrado:
+            return
+        if self._pendiente is not None:
+            self.descartados += 1
+        self._pendiente = texto
+        self._hay_cambio.set()
+    
+    def publicar_desde_hilo(self, texto: str):
+        """Igual que publicar, desde un hilo worker"""
+        self._loop.call_soon_threadsafe(self.publicar, texto)
+    
+    def cerrar(self, texto_final: str = None):
+        """Deja de aceptar textos; el final (si hay) se envía respetando el intervalo, sin esperarlo"""
+        if texto_final is not None:
+            self.publicar(texto_final)
+        self._cerrado = True
+        self._hay_cambio.set()
+    
+    async def _ciclo(self):
+        while True:
+            await self._hay_cambio.wait()
+            self._hay_cambio.clear()
+            
+            texto, self._pendiente = self._pendiente, None
+            if texto is not None and texto != self._ultimo:
+                espera = self.intervalo
+                try:
+                    await self.editar(texto)
+                    self._ultimo = texto
+                    self.ediciones += 1
+                except Exception as e:
+                    # RetryAfter de Telegram indica cuánto esperar antes de la siguiente edición
+                    retry_after = getattr(e, 'retry_after', 0) or 0
+                    if hasattr(retry_after, 'total_seconds'):
+                        retry_after = retry_after.total_seconds()
+                    espera = max(espera, float(retry_after))
+                    logger.warning(f"No se pudo actualizar el progreso: {e}")
+                
+                if self._cerrado and self._pendiente is None:
+                    return
+                await asyncio.sleep(espera)
+                if self._pendiente is not None:
+                    self._hay_cambio.set()
+            
+            if self._cerrado and self._pendiente is None:
+                return
@@ -0,0 +1,176 @@
+# admision.py
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RECHAZO_USUARIO = 'usuario'
+RECHAZO_COLA = 'cola'
+
+# Usuario de las generaciones internas (precalentamiento): ocupan cupo igual que un usuario de Telegram
+USUARIO_SISTEMA = 0
+
+class RechazoAdmision(Exception):
+    """La solicitud no entra: el usuario ya tiene el máximo en curso o la cola está llena"""
+    
+    def __init__(self, motivo: str, mensaje: str):
+        super().__init__(mensaje)
+        self.motivo = motivo
+
+class Turno:
+    """Lugar de una solicitud: admitida (ocupa un cupo de generación) o esperando en la cola"""
+    
+    def __init__(self, usuario_id: int):
+        self.usuario_id = usuario_id
+        self.admitido = False
+        self.inicio: Optional[float] = None
+        self.cambio = asyncio.Event()
+
+class ControlAdmision:
+    """
+    Admisión de reportes en el event loop del bot: cupo global de generaciones simultáneas,
+    límite de solicitudes en curso por usuario y cola FIFO acotada para el resto.
+    """
+    
+    def __init__(
+        self,
+        max_concurrentes: int = None,
+        max_por_usuario: int = None,
+        max_cola: int = None,
+        duracion_inicial: float = None
+    ):
+        self.max_concurrentes = max_concurrentes or Config.ADMISION_MAX_CONCURRENTES
+        self.max_por_usuario = max_por_usuario or Config.ADMISION_MAX_POR_USUARIO
+        self.max_cola = Config.ADMISION_MAX_COLA if max_cola is None else max_cola
+        # Promedio móvil de la duración de un reporte, para estimar la espera en cola
+        self.duracion_media = duracion_inicial or Config.ADMISION_DURACION_INICIAL
+        
+        self._activos = 0
+        self._cola: deque = deque()
+        self._por_usuario: Dict[int, int] = {}
+        
+        self.admitidos = 0
+        self.encolados = 0
+        self.rechazados = {RECHAZO_USUARIO: 0, RECHAZO_COLA: 0}
+    
+    @property
+    def activos(self) -> int:
+        return self._activos
+    
+    @property
+    def en_cola(self) -> int:
+        return len(self._cola)
+    
+    def solicitar(self, usuario_id: int) -> Turno:
+        """Reserva un turno; si no hay cupo queda en la cola. Lanza RechazoAdmision si no entra"""
+        if self._por_usuario.get(usuario_id, 0) >= self.max_por_usuario:
+            self.rechazados[RECHAZO_USUARIO] += 1
+            raise RechazoAdmision(
+                RECHAZO_USUARIO,
+                f"Ya tienes {self.max_por_usuario} reporte(s) en curso"
+            )
+        
+        turno = Turno(usuario_id)
+        if self._activos < self.max_concurrentes and not self._cola:
+            self._admitir(turno)
+        elif len(self._cola) < self.max_cola:
+            self._cola.append(turno)
+            self.encolados += 1
+            logger.info(f"Usuario {usuario_id} en cola (posición {len(self._cola)})")
+        else:
+            self.rechazados[RECHAZO_COLA] += 1
+            raise RechazoAdmision(RECHAZO_COLA, f"Hay {len(self._cola)} solicitudes esperando")
+        
+        self._por_usuario[usuario_id] = self._por_usuario.get(usuario_id, 0) + 1
+        return turno
+    
+    def _admitir(self, turno: Turno):
+        self._activos += 1
+        self.admitidos += 1
+        turno.admitido = True
+        turno.inicio = time.monotonic()
+        turno.cambio.set()
+    
+    def posicion(self, turno: Turno) -> int:
+        """Posición en la cola (1 = el siguiente); 0 si ya fue admitido"""
+        if turno.admitido:
+            return 0
+        try:
+            return self._cola.index(turno) + 1
+        except ValueError:
+            return 0
+    
+    def espera_estimada(self, posicion: int) -> float:
+        """Segundos aproximados hasta ser admitido: rondas completas de cupos por duración media"""
+        if posicion <= 0:
+            return 0.0
+        return math.ceil(posicion / self.max_concurrentes) * self.duracion_media
+    
+    async def esperar(self, turno: Turno, al_avanzar: Callable[[int, float], Awaitable] = None):
+        """Espera a que el turno sea admitido, avisando cada cambio de posición"""
+        while not turno.admitido:
+            # Limpiar antes del aviso: un liberar() durante el await del callback deja el evento puesto
+            turno.cambio.clear()
+            if al_avanzar is not None:
+                posicion = self.posicion(turno)
+                try:
+                    await al_avanzar(posicion, self.espera_estimada(posicion))
+                except Exception as e:
+                    logger.warning(f"No se pudo avisar la posición en cola: {e}")
+            if turno.admitido:
+                break
+            await turno.cambio.wait()
+    
+    def liberar(self, turno: Turno):
+        """Devuelve el cupo o saca el turno de la cola (también si la espera se canceló)"""
+        if turno.admitido:
+            self._activos -= 1
+            duracion = time.monotonic() - turno.inicio
+            self.duracion_media = 0.8 * self.duracion_media + 0.2 * duracion
+            turno.admitido = False
+        elif turno in self._cola:
+            self._cola.remove(turno)
+        else:
+            # Ya liberado
+            return
+        
+        restantes = self._por_usuario.get(turno.usuario_id, 0) - 1
+        if restantes > 0:
+            self._por_usuario[turno.usuario_id] = restantes
+        else:
+            self._por_usuario.pop(turno.usuario_id, None)
+        
+        while self._cola and self._activos < self.max_concurrentes:
+            self._admitir(self._cola.popleft())
+        
+        # Los que siguen esperando avanzaron un lugar
+        for pendiente in self._cola:
+            pendiente.cambio.set()
+    
+    def estadisticas(self) -> dict:
+        return {
+            'activos': self._activos,
+            'max_concurrentes': self.max_concurrentes,
+            'en_cola': len(self._cola),
+            'max_cola': self.max_cola,
+            'admitidos': self.admitidos,
+            'encolados': self.encolados,
+            'rechazados': dict(self.rechazados),
+            'duracion_media': self.duracion_media,
+        }
+
+_control_admision = None
+
+def obtener_control_admision() -> ControlAdmision:
+    global _control_admision
+    
+    if _control_admision is None:
+        _control_admision = ControlAdmision()
+    
+    return _control_admision
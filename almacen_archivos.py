@@ -0,0 +1,222 @@
+# almacen_archivos.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from cache_reportes import obtener_cache_reportes
+from config import Config
+from indice_json import SUFIJO_TEMPORAL, escritura_atomica
+
+logger = logging.getLogger(__name__)
+
+class AlmacenArchivos:
+    """
+    Ciclo de vida de los reportes en DOWNLOAD_DIR: tope de tamaño total y de antigüedad con
+    desalojo LRU. El último uso de un archivo es el mayor entre su atime y su mtime; servir un
+    reporte desde cache lo marca (tocar), así los más pedidos se conservan en disco.
+    
+    Solo se administran los archivos del primer nivel que no empiezan con punto: los índices
+    de cache y SNAPSHOTS_DIR quedan fuera. Un reporte, su zip y sus partes se desalojan juntos.
+    """
+    
+    def __init__(
+        self,
+        directorio: str = None,
+        max_bytes: int = None,
+        max_edad: float = None,
+        proteccion: float = None
+    ):
+        # Sin valores explícitos se lee Config en cada uso, así rige un Config.valores_temporales posterior
+        self._directorio = directorio
+        self._max_bytes = max_bytes
+        self._max_edad = max_edad
+        self._proteccion = proteccion
+        self._en_uso: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.desalojados = 0
+        self.bytes_liberados = 0
+    
+    @property
+    def directorio(self) -> str:
+        return os.path.abspath(self._directorio or Config.DOWNLOAD_DIR)
+    
+    @property
+    def max_bytes(self) -> int:
+        return int(Config.ARCHIVOS_MAX_MB * 1024 * 1024) if self._max_bytes is None else self._max_bytes
+    
+    @property
+    def max_edad(self) -> float:
+        return Config.ARCHIVOS_MAX_DIAS * 24 * 3600 if self._max_edad is None else self._max_edad
+    
+    @property
+    def proteccion(self) -> float:
+        # Los archivos usados hace menos de `proteccion` segundos no se desalojan: cubre los que otro
+        # proceso del pool acaba de escribir o está subiendo, cuyas reservas no se ven desde aquí
+        return Config.ARCHIVOS_PROTECCION if self._proteccion is None else self._proteccion
+    
+    @contextmanager
+    def escritura_atomica(self, ruta: str) -> Iterator[str]:
+        """
+        Entrega una ruta temporal junto al destino; si el bloque termina sin error se publica con
+        os.replace, así nadie ve (ni sube) un archivo a medio escribir
+        """
+        with escritura_atomica(ruta) as temporal:
+            yield temporal
+    
+    def tocar(self, *rutas: str):
+        """Marca el uso de los archivos (solo el atime: el mtime decide si un zip está al día)"""
+        ahora = time.time()
+        for ruta in rutas:
+            try:
+                os.utime(ruta, (ahora, os.stat(ruta).st_mtime))
+            except OSError:
+                continue
+    
+    @contextmanager
+    def en_uso(self, *rutas: str):
+        """Reserva los archivos mientras dura el bloque (p. ej. una subida a Telegram)"""
+        rutas = [os.path.abspath(ruta) for ruta in rutas]
+        with self._lock:
+            for ruta in rutas:
+                self._en_uso[ruta] = self._en_uso.get(ruta, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for ruta in rutas:
+                    restantes = self._en_uso.get(ruta, 0) - 1
+                    if restantes > 0:
+                        self._en_uso[ruta] = restantes
+                    else:
+                        self._en_uso.pop(ruta, None)
+            self.tocar(*rutas)
+    
+    def _listar(self) -> Tuple[Dict[str, Tuple[int, float]], List[Tuple[str, float]]]:
+        """Archivos administrados {ruta: (bytes, último uso)} y temporales [(ruta, mtime)]"""
+        archivos, temporales = {}, []
+        try:
+            entradas = list(os.scandir(self.directorio))
+        except FileNotFoundError:
+            return archivos, temporales
+        
+        for entrada in entradas:
+            try:
+                if not entrada.is_file(follow_symlinks=False):
+                    continue
+                estado = entrada.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            
+            if entrada.name.endswith(SUFIJO_TEMPORAL):
+                temporales.append((entrada.path, estado.st_mtime))
+            elif not entrada.name.startswith('.'):
+                archivos[entrada.path] = (estado.st_size, max(estado.st_atime, estado.st_mtime))
+        return archivos, temporales
+    
+    def _agrupar(self, archivos: Dict[str, Tuple[int, float]]) -> List[List[str]]:
+        """Reúne cada reporte con su zip y, según el índice de CacheReportes, con sus partes"""
+        grupo_de: Dict[str, str] = {}
+        for rutas in obtener_cache_reportes().archivos_por_entrada():
+            presentes = [os.path.abspath(ruta) for ruta in rutas if os.path.abspath(ruta) in archivos]
+            for ruta in presentes:
+                grupo_de.setdefault(ruta, presentes[0])
+        
+        for ruta in archivos:
+            pareja = ruta[:-len('.zip')] if ruta.endswith('.zip') else f"{ruta}.zip"
+            grupo = grupo_de.get(ruta) or grupo_de.get(pareja) or ruta
+            grupo_de[ruta] = grupo
+            if pareja in archivos:
+                grupo_de.setdefault(pareja, grupo)
+        
+        grupos: Dict[str, List[str]] = {}
+        for ruta, grupo in grupo_de.items():
+            grupos.setdefault(grupo, []).append(ruta)
+        return list(grupos.values())
+    
+    def limpiar(self) -> Dict[str, int]:
+        """
+        Borra los temporales huérfanos, los reportes sin uso hace más de max_edad y, si el total
+        aún supera max_bytes, los menos usados recientemente hasta quedar bajo el tope.
+        """
+        resultado = {'eliminados': 0, 'bytes_liberados': 0}
+        try:
+            ahora = time.time()
+            archivos, temporales = self._listar()
+            
+            for ruta, mtime in temporales:
+                if ahora - mtime > max(self.proteccion, 3600):
+                    self._eliminar(ruta)
+            
+            with self._lock:
+                reservados = set(self._en_uso)
+            
+            grupos = []
+            for rutas in self._agrupar(archivos):
+                ultimo_uso = max(archivos[ruta][1] for ruta in rutas)
+                protegido = ahora - ultimo_uso < self.proteccion or any(ruta in reservados for ruta in rutas)
+                grupos.append((ultimo_uso, sum(archivos[ruta][0] for ruta in rutas), rutas, protegido))
+            
+            total = sum(tamano for tamano, _ in archivos.values())
+            for ultimo_uso, tamano, rutas, protegido in sorted(grupos, key=lambda grupo: grupo[0]):
+                if protegido:
+                    continue
+                vencido = self.max_edad > 0 and ahora - ultimo_uso > self.max_edad
+                excedido = self.max_bytes > 0 and total > self.max_bytes
+                if not (vencido or excedido):
+                    continue
+                
+                for ruta in rutas:
+                    if self._eliminar(ruta):
+                        resultado['eliminados'] += 1
+                        resultado['bytes_liberados'] += archivos[ruta][0]
+                        total -= archivos[ruta][0]
+            
+            if resultado['eliminados']:
+                self.desalojados += resultado['eliminados']
+                self.bytes_liberados += resultado['bytes_liberados']
+                logger.info(
+                    f"Descargas: {resultado['eliminados']} archivos desalojados "
+                    f"({resultado['bytes_liberados'] / 1024 / 1024:.1f} MB), quedan {total / 1024 / 1024:.1f} MB"
+                )
+            if self.max_bytes > 0 and total > self.max_bytes:
+                logger.warning(f"Descargas sobre el tope ({total / 1024 / 1024:.1f} MB) por archivos en uso o usados recientemente")
+        except Exception as e:
+            logger.warning(f"No se pudo limpiar el directorio de descargas: {e}")
+        
+        return resultado
+    
+    def _eliminar(self, ruta: str) -> bool:
+        try:
+            os.remove(ruta)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {ruta}: {e}")
+            return False
+    
+    def estadisticas(self) -> Dict[str, int]:
+        archivos, _ = self._listar()
+        with self._lock:
+            en_uso = len(self._en_uso)
+        return {
+            'archivos': len(archivos),
+            'bytes': sum(tamano for tamano, _ in archivos.values()),
+            'max_bytes': self.max_bytes,
+            'en_uso': en_uso,
+            'desalojados': self.desalojados,
+            'bytes_liberados': self.bytes_liberados,
+        }
+
+_almacen_archivos = None
+
+def obtener_almacen_archivos() -> AlmacenArchivos:
+    global _almacen_archivos
+    
+    if _almacen_archivos is None:
+        _almacen_archivos = AlmacenArchivos()
+    
+    return _almacen_archivos
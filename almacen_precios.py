@@ -0,0 +1,377 @@
+# almacen_precios.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from itertools import repeat
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Estados de una captura según su antigüedad
+CAPTURA_FRESCA = 'fresca'          # se sirve tal cual
+CAPTURA_UTILIZABLE = 'utilizable'  # se sirve y se refresca en segundo plano
+CAPTURA_VENCIDA = 'vencida'        # no se sirve: hay que consultar el SP
+
+# Salida del SP normalizada; los nombres son los que reconoce identificar_columnas_sp
+COLUMNAS_ALMACEN = ['plu_num', 'plu_id', 'plu_descripcion', 'pr_pvp', 'IDCategoria']
+CLAVES_COLUMNAS = ['plu_num', 'plu_id', 'descripcion', 'pvp', 'categoria_id']
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS capturas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave TEXT NOT NULL,
+    cdn_id INTEGER NOT NULL,
+    canal_param TEXT NOT NULL,
+    canales TEXT NOT NULL,
+    categorias TEXT NOT NULL,
+    capturado_en REAL NOT NULL,
+    registros INTEGER NOT NULL DEFAULT 0,
+    completa INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_capturas_clave ON capturas (clave, completa);
+CREATE TABLE IF NOT EXISTS precios (
+    captura_id INTEGER NOT NULL,
+    orden INTEGER NOT NULL,
+    plu_num,
+    plu_id TEXT,
+    plu_descripcion TEXT,
+    pr_pvp REAL,
+    IDCategoria TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_precios_captura ON precios (captura_id, orden);
+CREATE TABLE IF NOT EXISTS refrescos (
+    clave TEXT PRIMARY KEY,
+    iniciado_en REAL NOT NULL,
+    pid INTEGER NOT NULL
+);
+"""
+
+class AlmacenPrecios:
+    """
+    Copia local (SQLite) de la salida del stored procedure por (cadena, canales, categorías).
+    Cada captura guarda cuándo se consultó; una sola consulta al SP por clave a la vez,
+    coordinada con un registro en la tabla refrescos que comparten hilos y procesos.
+    """
+    
+    def __init__(
+        self,
+        ruta: str = None,
+        fresco: float = None,
+        max_antiguedad: float = None,
+        refresco_max: float = None
+    ):
+        self.ruta = ruta or Config.ALMACEN_RUTA
+        self.fresco = Config.ALMACEN_FRESCO if fresco is None else fresco
+        self.max_antiguedad = Config.ALMACEN_MAX_ANTIGUEDAD if max_antiguedad is None else max_antiguedad
+        self.refresco_max = Config.ALMACEN_REFRESCO_MAX if refresco_max is None else refresco_max
+        self._inicializado = False
+        self._lock = threading.Lock()
+    
+    @property
+    def habilitado(self) -> bool:
+        return Config.ALMACEN_HABILITADO and self.max_antiguedad > 0
+    
+    @staticmethod
+    def clave(
+        cdn_id: int,
+        canal_param: str,
+        canal_ids: Optional[List[str]],
+        categoria_ids: Iterable[str]
+    ) -> str:
+        canales = ','.join(sorted(str(c).strip().upper() for c in canal_ids)) if canal_ids else 'default'
+        categorias = ','.join(sorted(str(c).strip().upper() for c in categoria_ids))
+        huella_categorias = hashlib.sha1(categorias.encode('utf-8')).hexdigest()
+        return f"{cdn_id}|{canal_param}|{canales}|{huella_categorias}"
+    
+    def _conectar(self) -> sqlite3.Connection:
+        """Conexión en modo autocommit; las transacciones se abren explícitamente"""
+        if not self._inicializado:
+            with self._lock:
+                if not self._inicializado:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+                    with closing(sqlite3.connect(self.ruta, timeout=30, isolation_level=None)) as conexion:
+                        # WAL: los reportes pueden leer mientras otro worker escribe una captura
+                        conexion.execute('PRAGMA journal_mode=WAL')
+                        conexion.executescript(ESQUEMA)
+                    self._inicializado = True
+        
+        return sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+    
+    def captura(self, clave: str) -> Optional[Dict]:
+        """Última captura completa de la clave o None"""
+        try:
+            with closing(self._conectar()) as conexion:
+                fila = conexion.execute(
+                    "SELECT id, capturado_en, registros FROM capturas "
+                    "WHERE clave = ? AND completa = 1 ORDER BY capturado_en DESC LIMIT 1",
+                    (clave,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el almacén de precios: {e}")
+            return None
+        
+        if fila is None:
+            return None
+        
+        return {'id': fila[0], 'capturado_en': fila[1], 'registros': fila[2]}
+    
+    def estado_captura(self, captura: Optional[Dict]) -> str:
+        if captura is None:
+            return CAPTURA_VENCIDA
+        
+        antiguedad = time.time() - captura['capturado_en']
+        if antiguedad < self.fresco:
+            return CAPTURA_FRESCA
+        if antiguedad < self.max_antiguedad:
+            return CAPTURA_UTILIZABLE
+        return CAPTURA_VENCIDA
+    
+    def iterar_lotes(self, captura_id: int, tamano_lote: int = None) -> Iterator[pd.DataFrame]:
+        """Entrega la captura en lotes, en el mismo orden en que llegó del SP"""
+        if tamano_lote is None or tamano_lote <= 0:
+            tamano_lote = Config.SP_TAMANO_LOTE if Config.SP_TAMANO_LOTE > 0 else None
+        
+        with closing(self._conectar()) as conexion:
+            consulta = (
+                f"SELECT {', '.join(COLUMNAS_ALMACEN)} FROM precios "
+                f"WHERE captura_id = ? ORDER BY orden"
+            )
+            if tamano_lote is None:
+                yield pd.read_sql_query(consulta, conexion, params=(captura_id,))
+                return
+            
+            yield from pd.read_sql_query(consulta, conexion, params=(captura_id,), chunksize=tamano_lote)
+    
+    def tomar_refresco(self, clave: str) -> bool:
+        """Reserva la consulta al SP de la clave; False si otro hilo o proceso ya la tiene"""
+        try:
+            with closing(self._conectar()) as conexion:
+                conexion.execute('BEGIN IMMEDIATE')
+                try:
+                    fila = conexion.execute(
+                        "SELECT iniciado_en FROM refrescos WHERE clave = ?", (clave,)
+                    ).fetchone()
+                    
+                    # Una reserva más antigua que refresco_max se considera abandonada
+                    if fila is not None and time.time() - fila[0] < self.refresco_max:
+                        conexion.execute('ROLLBACK')
+                        return False
+                    
+                    conexion.execute(
+                        "INSERT OR REPLACE INTO refrescos (clave, iniciado_en, pid) VALUES (?, ?, ?)",
+                        (clave, time.time(), os.getpid())
+                    )
+                    conexion.execute('COMMIT')
+                    return True
+                except Exception:
+                    conexion.execute('ROLLBACK')
+                    raise
+        except Exception as e:
+            logger.warning(f"No se pudo reservar el refresco del almacén: {e}")
+            return False
+    
+    def liberar_refresco(self, clave: str):
+        try:
+            with closing(self._conectar()) as conexion:
+                conexion.execute("DELETE FROM refrescos WHERE clave = ?", (clave,))
+        except Exception as e:
+            logger.warning(f"No se pudo liberar el refresco del almacén: {e}")
+    
+    def refresco_en_curso(self, clave: str) -> bool:
+        try:
+            with closing(self._conectar()) as conexion:
+                fila = conexion.execute(
+                    "SELECT iniciado_en FROM refrescos WHERE clave = ?", (clave,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el refresco en curso: {e}")
+            return False
+        
+        return fila is not None and time.time() - fila[0] < self.refresco_max
+    
+    def esperar_refresco(self, clave: str, tiempo_espera: float = None) -> bool:
+        """Espera a que termine la consulta en curso de la clave; False si no terminó a tiempo"""
+        limite = time.monotonic() + (Config.QUERY_TIMEOUT if tiempo_espera is None else tiempo_espera)
+        
+        while time.monotonic() < limite:
+            if not self.refresco_en_curso(clave):
+                return True
+            time.sleep(0.5)
+        
+        return False
+    
+    def registrar_lotes(
+        self,
+        clave: str,
+        lotes: Iterable[pd.DataFrame],
+        mapear_columnas: Callable[[pd.DataFrame], Optional[Dict[str, str]]],
+        cdn_id: int = None,
+        canal_param: str = '',
+        canales: str = '',
+        categorias: str = '',
+        reservado: bool = False
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Reentrega los lotes del SP mientras los guarda como una nueva captura. La captura
+        solo queda visible (y reemplaza a la anterior) si se consumieron todos los lotes.
+        Si otro worker ya está refrescando la clave se guarda igual; gana la que empezó después.
+        """
+        reservado = reservado or self.tomar_refresco(clave)
+        conexion = None
+        captura_id = None
+        completa = False
+        registros = 0
+        
+        try:
+            for lote in lotes:
+                if conexion is None:
+                    columnas_sp = mapear_columnas(lote)
+                    if columnas_sp is None:
+                        # Sin columnas reconocibles no se guarda nada; los lotes siguen de largo
+                        yield lote
+                        yield from lotes
+                        return
+                    columnas_origen = [columnas_sp.get(clave_col, columnas_sp['plu_id']) for clave_col in CLAVES_COLUMNAS]
+                    conexion = self._conectar()
+                    captura_id = conexion.execute(
+                        "INSERT INTO capturas (clave, cdn_id, canal_param, canales, categorias, capturado_en) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (clave, cdn_id, canal_param, canales, categorias, time.time())
+                    ).lastrowid
+                
+                filas = zip(
+                    repeat(captura_id),
+                    range(registros, registros + len(lote)),
+                    *(lote[columna].tolist() for columna in columnas_origen)
+                )
+                conexion.execute('BEGIN')
+                conexion.executemany(
+                    f"INSERT INTO precios (captura_id, orden, {', '.join(COLUMNAS_ALMACEN)}) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    filas
+                )
+                conexion.execute('COMMIT')
+                registros += len(lote)
+                
+                yield lote
+            
+            if conexion is not None and registros > 0:
+                completa = self._publicar_captura(conexion, clave, captura_id, registros)
+        finally:
+            if conexion is not None:
+                if not completa:
+                    self._descartar_captura(conexion, captura_id)
+                conexion.close()
+            if reservado:
+                self.liberar_refresco(clave)
+    
+    def _publicar_captura(self, conexion: sqlite3.Connection, clave: str, captura_id: int, registros: int) -> bool:
+        """
+        Marca la captura como completa y descarta las anteriores de la clave: las completas y las
+        incompletas abandonadas (más antiguas que refresco_max). Las de otro worker aún en curso no
+        se tocan. Si ya se publicó una captura que empezó después, esta se descarta.
+        """
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            posterior = conexion.execute(
+                "SELECT 1 FROM capturas WHERE clave = ? AND completa = 1 AND id > ? LIMIT 1",
+                (clave, captura_id)
+            ).fetchone()
+            if posterior is not None:
+                conexion.execute('ROLLBACK')
+                logger.info(f"Captura {captura_id} descartada: ya hay una más reciente de {clave}")
+                return False
+            
+            actualizadas = conexion.execute(
+                "UPDATE capturas SET completa = 1, registros = ? WHERE id = ?", (registros, captura_id)
+            ).rowcount
+            if actualizadas == 0:
+                # Otro proceso la dio por abandonada y la borró: sus precios quedan para _descartar_captura
+                conexion.execute('ROLLBACK')
+                logger.warning(f"Captura {captura_id} eliminada antes de publicarse ({clave})")
+                return False
+            
+            anteriores = (
+                "SELECT id FROM capturas WHERE clave = ? AND id < ? AND (completa = 1 OR capturado_en < ?)"
+            )
+            parametros = (clave, captura_id, time.time() - self.refresco_max)
+            conexion.execute(f"DELETE FROM precios WHERE captura_id IN ({anteriores})", parametros)
+            conexion.execute(f"DELETE FROM capturas WHERE id IN ({anteriores})", parametros)
+            conexion.execute('COMMIT')
+        except Exception:
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+            raise
+        
+        logger.info(f"Almacén de precios actualizado: {clave} ({registros} registros)")
+        return True
+    
+    def _descartar_captura(self, conexion: sqlite3.Connection, captura_id: int):
+        try:
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+            conexion.execute("DELETE FROM precios WHERE captura_id = ?", (captura_id,))
+            conexion.execute("DELETE FROM capturas WHERE id = ?", (captura_id,))
+        except Exception as e:
+            logger.warning(f"No se pudo descartar la captura incompleta {captura_id}: {e}")
+    
+    def refrescar_en_segundo_plano(
+        self,
+        clave: str,
+        obtener_lotes: Callable[[], Iterable[pd.DataFrame]],
+        mapear_columnas: Callable[[pd.DataFrame], Optional[Dict[str, str]]],
+        **datos_captura
+    ) -> bool:
+        """Lanza un hilo que vuelve a consultar el SP; no hace nada si ya hay un refresco en curso"""
+        if not self.tomar_refresco(clave):
+            return False
+        
+        def refrescar():
+            try:
+                origen = obtener_lotes()
+            except Exception as e:
+                self.liberar_refresco(clave)
+                logger.error(f"Error al refrescar el almacén de precios ({clave}): {e}")
+                return
+            
+            # registrar_lotes libera la reserva al terminar, también si falla
+            try:
+                for _ in self.registrar_lotes(clave, origen, mapear_columnas, reservado=True, **datos_captura):
+                    pass
+            except Exception as e:
+                logger.error(f"Error al refrescar el almacén de precios ({clave}): {e}")
+        
+        threading.Thread(target=refrescar, name=f"refresco-{clave.split('|', 1)[0]}", daemon=True).start()
+        logger.info(f"Refresco en segundo plano iniciado: {clave}")
+        return True
+    
+    def estadisticas(self) -> Dict[str, int]:
+        try:
+            with closing(self._conectar()) as conexion:
+                capturas, registros = conexion.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(registros), 0) FROM capturas WHERE completa = 1"
+                ).fetchone()
+                refrescos = conexion.execute("SELECT COUNT(*) FROM refrescos").fetchone()[0]
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el almacén de precios: {e}")
+            return {}
+        
+        return {'capturas': capturas, 'registros': registros, 'refrescos_en_curso': refrescos}
+
+_almacen_precios = None
+
+def obtener_almacen_precios() -> AlmacenPrecios:
+    global _almacen_precios
+    
+    if _almacen_precios is None:
+        _almacen_precios = AlmacenPrecios()
+    
+    return _almacen_precios
@@ -0,0 +1,342 @@
+# backends_db.py
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional
+
+from config import Config
+from credenciales_manager import obtener_connection_string
+
+logger = logging.getLogger(__name__)
+
+ESTADO_CATEGORIA_ACTIVA = '71039503-85CF-E511-80C6-000D3A3261F3'
+
+# Llamada al SP de precios tal como la emite ConsultasDB (con o sin esquema/corchetes)
+PATRON_SP_PRECIOS = re.compile(r'\{\s*CALL\s+(\[?config\]?\.)?\[?USP_administracionPrecios_listadoDePrecios\]?', re.IGNORECASE)
+
+class BackendDB(ABC):
+    """Origen de conexiones DB-API para ConsultasDB: fábrica del pool, consulta de salud y errores"""
+    nombre = ''
+    consulta_salud = 'SELECT 1'
+    
+    @property
+    def configurado(self) -> bool:
+        return True
+    
+    @property
+    @abstractmethod
+    def Error(self):
+        """Clase base de las excepciones del driver"""
+    
+    @property
+    @abstractmethod
+    def ErrorProgramacion(self):
+        """Excepción del driver para SQL inválido u objetos inexistentes"""
+    
+    @abstractmethod
+    def conectar(self) -> Any:
+        """Abre una conexión DB-API nueva (la usa el pool como fábrica)"""
+
+class BackendSQLServer(BackendDB):
+    """SQL Server de producción vía pyodbc y las credenciales encriptadas"""
+    nombre = 'sqlserver'
+    
+    def __init__(self):
+        self._connection_string = None
+    
+    @property
+    def connection_string(self) -> Optional[str]:
+        if self._connection_string is None:
+            self._connection_string = obtener_connection_string()
+        return self._connection_string
+    
+    @property
+    def configurado(self) -> bool:
+        return self.connection_string is not None
+    
+    @property
+    def Error(self):
+        import pyodbc
+        return pyodbc.Error
+    
+    @property
+    def ErrorProgramacion(self):
+        import pyodbc
+        return pyodbc.ProgrammingError
+    
+    def conectar(self) -> Any:
+        import pyodbc
+        return pyodbc.connect(self.connection_string)
+
+class CursorLocal:
+    """Cursor sobre SQLite que resuelve la llamada al SP de precios con una implementación en Python"""
+    
+    def __init__(self, conexion: 'ConexionLocal'):
+        self._conexion = conexion
+        self._cursor = conexion.sqlite.cursor()
+        self._tipos = None
+        # Cupo de SP del backend tomado por el result set en curso; se devuelve al agotarlo o cerrarlo
+        self._cupo = None
+    
+    @property
+    def description(self):
+        if self._cursor.description is None:
+            return None
+        if self._tipos is None:
+            return self._cursor.description
+        # pyodbc informa el tipo Python de cada columna; SQLite no, así que se replica para el SP
+        return tuple(
+            (columna[0], self._tipos.get(columna[0], str), None, None, None, None, True)
+            for columna in self._cursor.description
+        )
+    
+    def _liberar_cupo(self):
+        if self._cupo is not None:
+            self._cupo.release()
+            self._cupo = None
+    
+    def execute(self, sql: str, parametros=()):
+        self._tipos = None
+        self._liberar_cupo()
+        if PATRON_SP_PRECIOS.search(sql):
+            self._cupo = self._conexion.backend.ejecutar_listado_precios(self._conexion, self._cursor, *parametros)
+            self._tipos = BackendLocal.TIPOS_SP
+        else:
+            self._cursor.execute(sql, parametros)
+        return self
+    
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is None:
+            self._liberar_cupo()
+        return fila
+    
+    def fetchmany(self, tamano: int = None):
+        self._conexion.backend.esperar(Config.BACKEND_LOCAL_LATENCIA_LOTE, self._conexion)
+        filas = self._cursor.fetchmany(tamano or self._cursor.arraysize)
+        if not filas:
+            self._liberar_cupo()
+        return filas
+    
+    def fetchall(self):
+        try:
+            return self._cursor.fetchall()
+        finally:
+            self._liberar_cupo()
+    
+    def nextset(self) -> bool:
+        return False
+    
+    def close(self):
+        self._liberar_cupo()
+        self._cursor.close()
+
+class ConexionLocal:
+    """Conexión DB-API mínima (la parte que usa ConsultasDB y pandas) sobre una conexión SQLite"""
+    
+    def __init__(self, backend: 'BackendLocal', sqlite: sqlite3.Connection):
+        self.backend = backend
+        self.sqlite = sqlite
+        self.timeout = 0
+    
+    def cursor(self) -> CursorLocal:
+        return CursorLocal(self)
+    
+    def rollback(self):
+        self.sqlite.rollback()
+    
+    def commit(self):
+        self.sqlite.commit()
+    
+    def close(self):
+        self.sqlite.close()
+
+class BackendLocal(BackendDB):
+    """
+    Sustituto local de SQL Server para pruebas de carga sin credenciales: una base SQLite
+    sembrada con datos sintéticos por cadena, la tabla Categoria con el mismo esquema que
+    consulta ConsultasDB y el contrato del SP listadoDePrecios implementado en Python.
+    La latencia de conexión, de ejecución del SP y por lote se inyecta con Config.
+    """
+    nombre = 'local'
+    TIPOS_SP = {
+        'cdn_id': int, 'plu_id': int, 'plu_num_plu': int,
+        'pr_pvp': float, 'pr_valor_neto': float,
+    }
+    
+    def __init__(self, ruta: str = None):
+        self.ruta = ruta or Config.BACKEND_LOCAL_RUTA
+        self._sembrado = False
+        self._lock = threading.Lock()
+        concurrencia = Config.BACKEND_LOCAL_CONCURRENCIA
+        # Cupo de SP simultáneos, para simular un servidor saturado (0 = sin límite)
+        self._cupo_sp = threading.BoundedSemaphore(concurrencia) if concurrencia > 0 else None
+    
+    @property
+    def Error(self):
+        return sqlite3.Error
+    
+    @property
+    def ErrorProgramacion(self):
+        return sqlite3.ProgrammingError
+    
+    def _parametros_semilla(self) -> dict:
+        return {
+            'plus': Config.BACKEND_LOCAL_PLUS,
+            'categorias': Config.BACKEND_LOCAL_CATEGORIAS,
+            'semilla': Config.BACKEND_LOCAL_SEMILLA,
+        }
+    
+    def _sembrar(self):
+        """Crea y llena la base si no existe o si cambiaron los parámetros de volumen"""
+        from cadenas_config import CADENAS_MAPPING, obtener_categorias_excluidas
+        from datos_sinteticos import generar_categorias, generar_resultado_sp
+        from db_consultas import CANALES_POR_DEFECTO
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        parametros = json.dumps(self._parametros_semilla(), sort_keys=True)
+        
+        conexion = sqlite3.connect(self.ruta, timeout=60, isolation_level=None)
+        try:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('BEGIN IMMEDIATE')
+            conexion.execute("CREATE TABLE IF NOT EXISTS semilla (parametros TEXT)")
+            fila = conexion.execute("SELECT parametros FROM semilla").fetchone()
+            if fila is not None and fila[0] == parametros:
+                conexion.execute('COMMIT')
+                return
+            
+            logger.info(f"Sembrando base local de precios ({parametros})...")
+            inicio = time.perf_counter()
+            # Sentencias sueltas: executescript haría COMMIT y soltaría el BEGIN IMMEDIATE
+            conexion.execute("DROP TABLE IF EXISTS Categoria")
+            conexion.execute("DROP TABLE IF EXISTS listado_precios")
+            conexion.execute("DELETE FROM semilla")
+            conexion.execute(
+                "CREATE TABLE Categoria (IDCategoria TEXT, cat_abreviatura TEXT, cat_descripcion TEXT, "
+                "cdn_id INTEGER, IDStatus TEXT)"
+            )
+            conexion.execute(
+                "CREATE TABLE listado_precios (orden INTEGER, cdn_id INTEGER, IDCanal TEXT, plu_id INTEGER, "
+                "plu_num_plu INTEGER, plu_descripcion TEXT, IDCategoria TEXT, cat_descripcion TEXT, "
+                "pr_pvp REAL, pr_valor_neto REAL)"
+            )
+            
+            for cdn_id in sorted(set(CADENAS_MAPPING.values())):
+                semilla = Config.BACKEND_LOCAL_SEMILLA + cdn_id
+                categorias_df = generar_categorias(Config.BACKEND_LOCAL_CATEGORIAS, semilla)
+                df_sp = generar_resultado_sp(
+                    Config.BACKEND_LOCAL_PLUS, categorias_df, cdn_id=cdn_id, semilla=semilla,
+                    canales=CANALES_POR_DEFECTO
+                )
+                
+                categorias = [
+                    (fila.IDCategoria, fila.cat_abreviatura, fila.cat_descripcion, cdn_id, ESTADO_CATEGORIA_ACTIVA)
+                    for fila in categorias_df.itertuples()
+                ]
+                # Las excluidas existen en la base; ConsultasDB las filtra como en producción
+                categorias += [
+                    (cat_id, 'EXC', f"EXCLUIDA {numero}", cdn_id, ESTADO_CATEGORIA_ACTIVA)
+                    for numero, cat_id in enumerate(obtener_categorias_excluidas(cdn_id))
+                ]
+                conexion.executemany("INSERT INTO Categoria VALUES (?, ?, ?, ?, ?)", categorias)
+                
+                columnas = [df_sp[columna].tolist() for columna in df_sp.columns]
+                conexion.executemany(
+                    "INSERT INTO listado_precios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    zip(range(len(df_sp)), *columnas)
+                )
+            
+            conexion.execute("CREATE INDEX idx_listado_cdn ON listado_precios (cdn_id, orden)")
+            conexion.execute("INSERT INTO semilla VALUES (?)", (parametros,))
+            conexion.execute('COMMIT')
+            logger.info(f"Base local sembrada en {time.perf_counter() - inicio:.1f}s: {self.ruta}")
+        except Exception:
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+            raise
+        finally:
+            conexion.close()
+    
+    def esperar(self, segundos: float, conexion: ConexionLocal):
+        """Latencia inyectada; si supera el timeout de la conexión se comporta como un timeout del servidor"""
+        if segundos <= 0:
+            return
+        if conexion.timeout and segundos > conexion.timeout:
+            time.sleep(conexion.timeout)
+            raise sqlite3.OperationalError(f"Query timeout expired ({conexion.timeout}s)")
+        time.sleep(segundos)
+    
+    def conectar(self) -> ConexionLocal:
+        if not self._sembrado:
+            with self._lock:
+                if not self._sembrado:
+                    self._sembrar()
+                    self._sembrado = True
+        
+        time.sleep(max(Config.BACKEND_LOCAL_LATENCIA_CONEXION, 0))
+        return ConexionLocal(self, sqlite3.connect(self.ruta, timeout=60, check_same_thread=False))
+    
+    def ejecutar_listado_precios(
+        self,
+        conexion: ConexionLocal,
+        cursor: sqlite3.Cursor,
+        cdn_id: int,
+        categorias_str: str,
+        canal_param: str,
+        canal_ids_str: str
+    ):
+        """
+        Contrato de [config].[USP_administracionPrecios_listadoDePrecios]: precios de la cadena
+        para las categorías (IDs separados por coma) y, con canal_param 'Canal', los canales pedidos.
+        Devuelve el cupo de SP tomado (None sin límite): como en el servidor, el SP lo ocupa hasta
+        que el cliente termina de leer, así que el cursor lo libera al agotar el result set o cerrarse.
+        """
+        categorias = [c.strip().upper() for c in str(categorias_str).split(',') if c.strip()]
+        canales = [c.strip().upper() for c in str(canal_ids_str).split(',') if c.strip()]
+        
+        consulta = (
+            "SELECT cdn_id, IDCanal, plu_id, plu_num_plu, plu_descripcion, IDCategoria, cat_descripcion, "
+            "pr_pvp, pr_valor_neto FROM listado_precios "
+            "WHERE cdn_id = ? AND IDCategoria IN (SELECT value FROM json_each(?))"
+        )
+        parametros: List[Any] = [cdn_id, json.dumps(categorias)]
+        if str(canal_param).lower() == 'canal' and canales:
+            consulta += " AND IDCanal IN (SELECT value FROM json_each(?))"
+            parametros.append(json.dumps(canales))
+        consulta += " ORDER BY orden"
+        
+        if self._cupo_sp is not None:
+            self._cupo_sp.acquire()
+        try:
+            self.esperar(Config.BACKEND_LOCAL_LATENCIA, conexion)
+            cursor.execute(consulta, parametros)
+        except BaseException:
+            if self._cupo_sp is not None:
+                self._cupo_sp.release()
+            raise
+        return self._cupo_sp
+
+BACKENDS = {
+    BackendSQLServer.nombre: BackendSQLServer,
+    BackendLocal.nombre: BackendLocal,
+}
+
+_backend = None
+
+def obtener_backend() -> BackendDB:
+    """Backend configurado en Config.DB_BACKEND ('sqlserver' o 'local'), compartido por proceso"""
+    global _backend
+    
+    if _backend is None:
+        if Config.DB_BACKEND not in BACKENDS:
+            raise ValueError(f"DB_BACKEND no soportado: {Config.DB_BACKEND}")
+        _backend = BACKENDS[Config.DB_BACKEND]()
+        logger.info(f"Backend de base de datos: {_backend.nombre}")
+    
+    return _backend
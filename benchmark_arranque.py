@@ -0,0 +1,206 @@
+# benchmark_arranque.py
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+VERSION_RESULTADOS = 1
+MODULOS_PESADOS = ['pandas', 'numpy', 'openpyxl', 'pyodbc']
+ETAPAS = ['import_bot', 'listo_para_atender', 'verificacion_bd', 'proceso_total']
+
+def _medir_en_proceso() -> Dict:
+    """
+    Se ejecuta en un intérprete nuevo: importa bot, corre main() hasta el punto en que empezaría
+    el polling (se intercepta run_polling) y luego mide la verificación de BD en segundo plano
+    """
+    inicio = time.perf_counter()
+    import bot
+    import_bot = time.perf_counter() - inicio
+    pesados_tras_import = [modulo for modulo in MODULOS_PESADOS if modulo in sys.modules]
+    
+    from telegram.ext import Application
+    listo = {}
+    
+    def run_polling(self, *args, **kwargs):
+        listo['segundos'] = time.perf_counter() - inicio
+    
+    Application.run_polling = run_polling
+    bot.main()
+    if 'segundos' not in listo:
+        raise RuntimeError("main() terminó antes de iniciar el polling (revisa token y credenciales)")
+    
+    from verificacion_bd import VerificacionBD
+    verificacion = VerificacionBD()
+    conectado = asyncio.run(verificacion.verificar())
+    
+    return {
+        'import_bot': import_bot,
+        'listo_para_atender': listo['segundos'],
+        'verificacion_bd': verificacion.duracion,
+        'bd_conectada': conectado,
+        'pesados_tras_import': pesados_tras_import,
+    }
+
+def _entorno_medicion(directorio: str, backend: str) -> Dict[str, str]:
+    """Entorno aislado: datos en un directorio temporal, sin servidor de métricas ni token real"""
+    entorno = dict(os.environ)
+    entorno.update({
+        'DB_BACKEND': backend,
+        'DOWNLOAD_DIR': os.path.join(directorio, 'descargas'),
+        'ALMACEN_RUTA': os.path.join(directorio, 'almacen_precios.db'),
+        'BACKEND_LOCAL_RUTA': os.path.join(directorio, 'sqlserver_local.db'),
+        'METRICAS_HABILITADAS': 'false',
+        'PRECALENTAR_CADENAS': '',
+        'LOG_LEVEL': 'WARNING',
+    })
+    entorno.setdefault('TELEGRAM_BOT_TOKEN', '123456:benchmark-arranque')
+    return entorno
+
+def ejecutar_benchmark(repeticiones: int = 5, backend: str = 'local') -> Dict:
+    """Cada repetición corre en un proceso nuevo: el arranque en frío es lo que se mide"""
+    directorio = tempfile.mkdtemp(prefix='benchmark_arranque_')
+    entorno = _entorno_medicion(directorio, backend)
+    ruta_script = os.path.abspath(__file__)
+    
+    # Corrida de calentamiento sin registrar: con el backend local crea la base SQLite de pruebas
+    corridas = []
+    for numero in range(-1, repeticiones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, ruta_script, '--medir-proceso'],
+            cwd=os.path.dirname(ruta_script),
+            env=entorno,
+            capture_output=True,
+            text=True
+        )
+        proceso_total = time.perf_counter() - inicio
+        if proceso.returncode != 0:
+            raise RuntimeError(f"La medición {numero + 1} falló:\n{proceso.stderr[-2000:]}")
+        if numero < 0:
+            continue
+        
+        corrida = json.loads(proceso.stdout.strip().splitlines()[-1])
+        corrida['proceso_total'] = proceso_total
+        corridas.append(corrida)
+        logger.info(
+            f"Corrida {numero + 1}: import {corrida['import_bot']:.3f}s, "
+            f"listo {corrida['listo_para_atender']:.3f}s, BD {corrida['verificacion_bd']:.3f}s"
+        )
+    
+    etapas = {
+        etapa: {
+            'segundos': statistics.median(corrida[etapa] for corrida in corridas),
+            'minimo': min(corrida[etapa] for corrida in corridas),
+        }
+        for etapa in ETAPAS
+    }
+    
+    return {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'backend': backend,
+            'repeticiones': repeticiones,
+        },
+        'etapas': etapas,
+        'pesados_tras_import': sorted({modulo for corrida in corridas for modulo in corrida['pesados_tras_import']}),
+        'bd_conectada': all(corrida['bd_conectada'] for corrida in corridas),
+        'corridas': corridas,
+    }
+
+def comparar_resultados(actual: Dict, anterior: Dict, umbral: float) -> List[Dict]:
+    """Compara la mediana de cada etapa; una regresión es un aumento mayor que umbral"""
+    comparacion = []
+    for etapa, medicion in actual['etapas'].items():
+        previa = anterior.get('etapas', {}).get(etapa)
+        if previa is None:
+            continue
+        razon = medicion['segundos'] / previa['segundos'] if previa['segundos'] > 0 else None
+        comparacion.append({
+            'etapa': etapa,
+            'anterior': previa['segundos'],
+            'actual': medicion['segundos'],
+            'razon': razon,
+            'regresion': razon is not None and razon > 1 + umbral,
+        })
+    return comparacion
+
+def _imprimir_resultados(resultados: Dict):
+    print(f"\nArranque del bot ({resultados['entorno']['repeticiones']} corridas, backend {resultados['entorno']['backend']}):")
+    for etapa, medicion in resultados['etapas'].items():
+        print(f"  {etapa:<24}{medicion['segundos']:>10.3f} s   (mín {medicion['minimo']:.3f} s)")
+    pesados = ', '.join(resultados['pesados_tras_import']) or 'ninguno'
+    print(f"  Módulos pesados cargados al importar bot: {pesados}")
+    if not resultados['bd_conectada']:
+        print("  AVISO: la verificación de BD no logró conectar")
+
+def _imprimir_comparacion(comparacion: List[Dict]):
+    print(f"\n{'etapa':<24}{'anterior':>10}{'actual':>10}{'razón':>8}")
+    for fila in comparacion:
+        razon = f"{fila['razon']:.2f}" if fila['razon'] is not None else '-'
+        marca = '  REGRESIÓN' if fila['regresion'] else ''
+        print(f"{fila['etapa']:<24}{fila['anterior']:>10.3f}{fila['actual']:>10.3f}{razon:>8}{marca}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque del bot")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Arranques en frío (se reporta la mediana)")
+    parser.add_argument('--backend', default='local', help="DB_BACKEND de la medición (local no requiere credenciales)")
+    parser.add_argument('--salida', default=None, help="Archivo JSON de resultados")
+    parser.add_argument('--comparar', default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--umbral', type=float, default=0.2, help="Aumento relativo que cuenta como regresión")
+    parser.add_argument('--permitir-pesados', action='store_true', help="No fallar si importar bot carga pandas/openpyxl/pyodbc")
+    parser.add_argument('--medir-proceso', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.medir_proceso:
+        logging.basicConfig(level=logging.ERROR)
+        print(json.dumps(_medir_en_proceso()))
+        return 0
+    
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    
+    try:
+        resultados = ejecutar_benchmark(repeticiones=max(args.repeticiones, 1), backend=args.backend)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 2
+    
+    _imprimir_resultados(resultados)
+    
+    codigo = 0
+    if resultados['pesados_tras_import'] and not args.permitir_pesados:
+        logger.error(f"Importar bot carga módulos pesados: {resultados['pesados_tras_import']}")
+        codigo = 1
+    
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        comparacion = comparar_resultados(resultados, anterior, args.umbral)
+        resultados['comparacion'] = {'contra': os.path.abspath(args.comparar), 'umbral': args.umbral, 'etapas': comparacion}
+        _imprimir_comparacion(comparacion)
+        if any(fila['regresion'] for fila in comparacion):
+            codigo = 1
+    
+    ruta_salida = args.salida or f"benchmark_arranque_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(ruta_salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados: {os.path.abspath(ruta_salida)}")
+    
+    return codigo
+
+if __name__ == '__main__':
+    sys.exit(main())
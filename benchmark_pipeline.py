@@ -0,0 +1,341 @@
+# benchmark_pipeline.py
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backends_db import BackendDB
+from cadenas_config import obtener_cdn_id, validar_cadena
+from config import Config
+from datos_sinteticos import generar_categorias, generar_resultado_sp, iterar_lotes, perturbar_precios
+from db_consultas import ConsultasDB
+from delta_precios import calcular_delta
+from exportadores import formatos_disponibles
+
+logger = logging.getLogger(__name__)
+
+ESCALAS_POR_DEFECTO = ['1000x10', '5000x50', '20000x150']
+VERSION_RESULTADOS = 1
+
+class BackendSintetico(BackendDB):
+    """Backend de ConsultasSinteticas: nunca abre conexiones, así no se leen credenciales"""
+    nombre = 'sintetico'
+    
+    @property
+    def Error(self):
+        return sqlite3.Error
+    
+    @property
+    def ErrorProgramacion(self):
+        return sqlite3.ProgrammingError
+    
+    def conectar(self) -> Any:
+        raise RuntimeError("El benchmark sintético no abre conexiones a la base de datos")
+
+class ConsultasSinteticas(ConsultasDB):
+    """ConsultasDB alimentada con datos sintéticos: no usa credenciales ni SQL Server"""
+    
+    def __init__(self, categorias_df: pd.DataFrame, df_sp: pd.DataFrame, directorio: str):
+        super().__init__(backend=BackendSintetico())
+        self.categorias_df = categorias_df
+        self.df_sp = df_sp
+        self.directorio = directorio
+    
+    def conectar(self) -> bool:
+        return True
+    
+    def desconectar(self):
+        pass
+    
+    def obtener_categorias_por_cadena(self, cdn_id: int) -> Optional[pd.DataFrame]:
+        return self.categorias_df
+    
+    def iterar_stored_procedure_precios(self, cdn_id, categorias_df, canal_param='Canal', canal_ids=None, tamano_lote=None):
+        return iterar_lotes(self.df_sp, Config.SP_TAMANO_LOTE if tamano_lote is None else tamano_lote)
+    
+    def escribir_matriz(self, df_final, nombre_cadena, ruta_salida=None, *args, **kwargs):
+        return super().escribir_matriz(df_final, nombre_cadena, ruta_salida or self.directorio, *args, **kwargs)
+
+def _medir(funcion: Callable[[], object], repeticiones: int, memoria: bool) -> Dict:
+    """Mediana y mínimo de varias ejecuciones; el pico de memoria se mide en una ejecución aparte"""
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+    
+    medicion = {
+        'segundos': round(statistics.median(duraciones), 4),
+        'minimo': round(min(duraciones), 4),
+        'repeticiones': repeticiones,
+    }
+    
+    # tracemalloc encarece la ejecución: no se mezcla con la medición de tiempos.
+    # Solo ve memoria reservada por Python/numpy (no la de Arrow al escribir Parquet)
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        medicion['pico_mb'] = round(pico / (1024 * 1024), 2)
+    
+    return medicion
+
+def _parsear_escala(escala: str):
+    try:
+        plus, categorias = escala.lower().split('x')
+        return int(plus), int(categorias)
+    except ValueError:
+        raise ValueError(f"Escala no válida: {escala} (formato PLUSxCATEGORIAS, p. ej. 5000x50)")
+
+def ejecutar_escenario(
+    escala: str,
+    nombre_cadena: str,
+    formatos: List[str],
+    repeticiones: int = 1,
+    memoria: bool = True,
+    directorio: str = None,
+    semilla: int = 0
+) -> Dict:
+    n_plus, n_categorias = _parsear_escala(escala)
+    cdn_id = obtener_cdn_id(nombre_cadena)
+    
+    inicio = time.perf_counter()
+    categorias_df = generar_categorias(n_categorias, semilla)
+    df_sp = generar_resultado_sp(n_plus, categorias_df, cdn_id=cdn_id, semilla=semilla)
+    generacion = time.perf_counter() - inicio
+    logger.info(f"Escenario {escala}: {len(df_sp)} filas sintéticas en {generacion:.2f}s")
+    
+    consultas = ConsultasSinteticas(categorias_df, df_sp, directorio)
+    
+    def acumular():
+        return consultas.acumular_lotes_precios(iterar_lotes(df_sp, Config.SP_TAMANO_LOTE), cdn_id)
+    
+    acumulador = acumular()
+    df_final = acumulador.construir(categorias_df)
+    matriz_anterior = (
+        consultas.acumular_lotes_precios(iterar_lotes(perturbar_precios(df_sp, semilla=semilla + 1), 0), cdn_id)
+        .construir(categorias_df)
+    )
+    
+    def construir_matriz():
+        # construir no modifica lo acumulado: se puede repetir sobre el mismo acumulador
+        return acumulador.construir(categorias_df)
+    
+    def escribir(formato: str):
+        def funcion():
+            ruta = consultas.escribir_matriz(df_final, nombre_cadena, formato=formato)
+            etapas[f'exportar_{formato}']['tamano_bytes'] = os.path.getsize(ruta)
+            os.remove(ruta)
+        return funcion
+    
+    def generar_archivo_excel():
+        ruta = consultas.generar_archivo_excel(df_sp, categorias_df, nombre_cadena, cdn_id, directorio)
+        os.remove(ruta)
+    
+    def pipeline():
+        resultado = consultas.proceso_completo(nombre_cadena, forzar=True)
+        if resultado is None:
+            raise RuntimeError(f"El pipeline no generó reporte para {escala}")
+        os.remove(resultado.ruta)
+    
+    etapas = {}
+    pasos = [
+        ('identificar_columnas_sp', lambda: consultas.identificar_columnas_sp(df_sp)),
+        ('acumulacion', acumular),
+        ('matriz', construir_matriz),
+        ('delta', lambda: calcular_delta(matriz_anterior, df_final)),
+    ]
+    pasos += [(f'exportar_{formato}', escribir(formato)) for formato in formatos]
+    pasos += [
+        ('generar_archivo_excel', generar_archivo_excel),
+        ('pipeline', pipeline),
+    ]
+    
+    for etapa, funcion in pasos:
+        etapas[etapa] = {}
+        etapas[etapa].update(_medir(funcion, repeticiones, memoria))
+        logger.info(f"  {escala} {etapa}: {etapas[etapa]['segundos']:.3f}s")
+    
+    return {
+        'escala': escala,
+        'plus': n_plus,
+        'categorias': n_categorias,
+        'filas_sp': len(df_sp),
+        'filas_matriz': len(df_final),
+        'columnas_matriz': len(df_final.columns),
+        'generacion_segundos': round(generacion, 4),
+        'etapas': etapas,
+    }
+
+def _entorno() -> Dict:
+    versiones = {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__}
+    for modulo in ('openpyxl', 'pyarrow'):
+        try:
+            versiones[modulo] = __import__(modulo).__version__
+        except ImportError:
+            versiones[modulo] = None
+    versiones['plataforma'] = platform.platform()
+    versiones['procesador'] = platform.processor() or platform.machine()
+    return versiones
+
+def ejecutar_benchmark(
+    escalas: List[str] = None,
+    nombre_cadena: str = 'JUAN VALDEZ',
+    formatos: List[str] = None,
+    repeticiones: int = 1,
+    memoria: bool = True,
+    semilla: int = 0
+) -> Dict:
+    if not validar_cadena(nombre_cadena):
+        raise ValueError(f"Cadena no válida: {nombre_cadena}")
+    
+    escalas = escalas or ESCALAS_POR_DEFECTO
+    formatos = formatos or formatos_disponibles()
+    
+    # Todo lo que escribe el pipeline queda en el directorio temporal; sin caches entre corridas.
+    # Config se restaura al terminar, también si el benchmark falla
+    with tempfile.TemporaryDirectory(prefix='benchmark_precios_') as directorio, Config.valores_temporales(
+        DOWNLOAD_DIR=directorio,
+        SNAPSHOTS_DIR=os.path.join(directorio, 'snapshots'),
+        REPORTE_CACHE_TTL=0,
+        CATEGORIAS_CACHE_TTL=0,
+        ALMACEN_HABILITADO=False
+    ):
+        escenarios = [
+            ejecutar_escenario(escala, nombre_cadena, formatos, repeticiones, memoria, directorio, semilla)
+            for escala in escalas
+        ]
+    
+    return {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': _entorno(),
+        'parametros': {
+            'cadena': nombre_cadena,
+            'formatos': formatos,
+            'repeticiones': repeticiones,
+            'semilla': semilla,
+            'sp_tamano_lote': Config.SP_TAMANO_LOTE,
+            'excel_streaming': Config.EXCEL_STREAMING,
+        },
+        'escenarios': escenarios,
+    }
+
+def comparar_resultados(actual: Dict, anterior: Dict, umbral: float = 0.2, minimo_segundos: float = 0.05) -> List[Dict]:
+    """
+    Compara etapa por etapa los escenarios con la misma escala. Es regresión si la etapa
+    tarda más de (1 + umbral) veces lo anterior y la diferencia supera minimo_segundos.
+    """
+    anteriores = {escenario['escala']: escenario for escenario in anterior.get('escenarios', [])}
+    comparacion = []
+    
+    for escenario in actual['escenarios']:
+        base = anteriores.get(escenario['escala'])
+        if base is None:
+            continue
+        
+        for etapa, medicion in escenario['etapas'].items():
+            medicion_base = base['etapas'].get(etapa)
+            if medicion_base is None:
+                continue
+            
+            antes, ahora = medicion_base['segundos'], medicion['segundos']
+            razon = ahora / antes if antes > 0 else None
+            comparacion.append({
+                'escala': escenario['escala'],
+                'etapa': etapa,
+                'anterior': antes,
+                'actual': ahora,
+                'razon': round(razon, 3) if razon is not None else None,
+                'pico_mb_anterior': medicion_base.get('pico_mb'),
+                'pico_mb_actual': medicion.get('pico_mb'),
+                'regresion': razon is not None and razon > 1 + umbral and ahora - antes > minimo_segundos,
+            })
+    
+    return comparacion
+
+def _imprimir_resultados(resultados: Dict):
+    for escenario in resultados['escenarios']:
+        print(
+            f"\n{escenario['escala']}: {escenario['filas_sp']} filas SP -> "
+            f"{escenario['filas_matriz']} x {escenario['columnas_matriz']}"
+        )
+        for etapa, medicion in escenario['etapas'].items():
+            pico = f"{medicion['pico_mb']:>9.1f} MB" if 'pico_mb' in medicion else ''
+            print(f"  {etapa:<24}{medicion['segundos']:>10.3f} s{pico}")
+
+def _imprimir_comparacion(comparacion: List[Dict]):
+    print(f"\n{'escala':<12}{'etapa':<24}{'anterior':>10}{'actual':>10}{'razón':>8}")
+    for fila in comparacion:
+        razon = f"{fila['razon']:.2f}" if fila['razon'] is not None else '-'
+        marca = '  REGRESIÓN' if fila['regresion'] else ''
+        print(
+            f"{fila['escala']:<12}{fila['etapa']:<24}{fila['anterior']:>10.3f}"
+            f"{fila['actual']:>10.3f}{razon:>8}{marca}"
+        )
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de reportes con datos sintéticos")
+    parser.add_argument('--escalas', nargs='+', default=None, help="PLUSxCATEGORIAS, p. ej. 1000x10 50000x300")
+    parser.add_argument('--cadena', default='JUAN VALDEZ', help="Cadena (define las categorías excluidas)")
+    parser.add_argument('--formatos', nargs='+', default=None, help="Formatos a exportar (por defecto, todos)")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Ejecuciones por etapa (se reporta la mediana)")
+    parser.add_argument('--sin-memoria', action='store_true', help="No medir el pico de memoria")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=None, help="Archivo JSON de resultados")
+    parser.add_argument('--comparar', default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--umbral', type=float, default=0.2, help="Aumento relativo que cuenta como regresión")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    
+    try:
+        resultados = ejecutar_benchmark(
+            escalas=args.escalas,
+            nombre_cadena=args.cadena,
+            formatos=args.formatos,
+            repeticiones=max(args.repeticiones, 1),
+            memoria=not args.sin_memoria,
+            semilla=args.semilla
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    
+    _imprimir_resultados(resultados)
+    
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        comparacion = comparar_resultados(resultados, anterior, args.umbral)
+        resultados['comparacion'] = {'contra': os.path.abspath(args.comparar), 'umbral': args.umbral, 'etapas': comparacion}
+        _imprimir_comparacion(comparacion)
+        if any(fila['regresion'] for fila in comparacion):
+            codigo = 1
+    
+    ruta_salida = args.salida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(ruta_salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados: {os.path.abspath(ruta_salida)}")
+    
+    return codigo
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,10 @@
 import os
+import asyncio
 import logging
+from datetime import datetime
 from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -12,8 +15,20 @@ from telegram.ext import (
     filters
 )
 from cadenas_config import CADENAS_LISTA, obtener_cdn_id, validar_cadena
-from db_consultas import ConsultasDB
+from ejecutor_reportes import obtener_ejecutor_reportes
+from exportadores import formatos_disponibles, obtener_exportador
+from entrega import ArchivoEntrega, LIMITE_TELEGRAM_BYTES
+from cache_envios import CacheEnvios, obtener_cache_envios
+from almacen_archivos import obtener_almacen_archivos
+from cache_categorias import obtener_cache_categorias
+from resultado_reporte import ResultadoReporte
+from precalentamiento import registrar_precalentamiento, texto_estado_precalentamiento
 from credenciales_manager import obtener_credenciales_manager
+from actualizador_progreso import ActualizadorProgreso
+from admision import RECHAZO_USUARIO, RechazoAdmision, obtener_control_admision
+from metricas import detener_servidor_metricas, iniciar_servidor_metricas, obtener_metricas
+from verificacion_bd import obtener_verificacion_bd
+from config import Config
 
 # Cargar variables de entorno desde .env
 from dotenv import load_dotenv
@@ -27,6 +42,9 @@ logger = logging.getLogger(__name__)
 
 SELECCIONANDO_CADENA = 1
 
+# Los handlers solo atienden mensajes (comandos) y botones; el resto de updates ni se pide a Telegram
+ACTUALIZACIONES_PERMITIDAS = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
     logger.info(f"Usuario {user.id} ({user.username}) inicio el bot")
@@ -43,6 +61,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         f"Por favor, selecciona la cadena que deseas consultar:"
     )
     
+    aviso_bd = obtener_verificacion_bd().aviso_usuario()
+    if aviso_bd:
+        mensaje_inicio = f"{aviso_bd}\n\n{mensaje_inicio}"
+    
     if update.callback_query:
         await update.callback_query.message.reply_text(mensaje_inicio)
     else:
@@ -108,7 +130,11 @@ async def seleccionar_cadena(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer("Procesando solicitud...")
     
-    cadena_seleccionada = query.data.replace("cadena_", "")
+    # "refrescar_" fuerza la regeneración aunque exista un reporte reciente en cache;
+    # "cambios_" entrega solo los precios que cambiaron desde el snapshot del día anterior
+    forzar = query.data.startswith("refrescar_")
+    delta = query.data.startswith("cambios_")
+    cadena_seleccionada = query.data.split("_", 1)[1]
     
     if not validar_cadena(cadena_seleccionada):
         await query.edit_message_text(
@@ -123,152 +149,308 @@ async def seleccionar_cadena(update: Update, context: ContextTypes.DEFAULT_TYPE)
     cdn_id = obtener_cdn_id(cadena_seleccionada)
     logger.info(f"Usuario {update.effective_user.id} seleccionó: {cadena_seleccionada} (cdn_id: {cdn_id})")
     
-    mensaje_inicial = (
-        f"PROCESANDO SOLICITUD\n\n"
-        f"Cadena: {cadena_seleccionada}\n"
-        f"ID: {cdn_id}\n\n"
-        f"Este proceso puede tomar entre 30 segundos y 2 minutos\n\n"
-        f"Iniciando proceso..."
-    )
+    admision = obtener_control_admision()
+    try:
+        turno = admision.solicitar(update.effective_user.id)
+    except RechazoAdmision as e:
+        logger.info(f"Solicitud de {update.effective_user.id} no admitida ({e.motivo}): {e}")
+        obtener_metricas().registrar_rechazo(e.motivo)
+        if e.motivo == RECHAZO_USUARIO:
+            detalle = "Espera a que termine tu reporte en curso antes de pedir otro."
+        else:
+            detalle = "El sistema está atendiendo el máximo de solicitudes. Intenta nuevamente en unos minutos."
+        await query.message.reply_text(
+            f"SOLICITUD NO ADMITIDA\n\n{e}.\n\n{detalle}",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("Volver al menú", callback_data="volver_menu")
+            ]])
+        )
+        return SELECCIONANDO_CADENA
+    
+    try:
+        if not turno.admitido:
+            async def avisar_posicion(posicion: int, espera: float):
+                await query.edit_message_text(
+                    f"SOLICITUD EN COLA\n\n"
+                    f"Cadena: {cadena_seleccionada}\n\n"
+                    f"Posición en la cola: {posicion}\n"
+                    f"Espera estimada: {max(round(espera / 60), 1)} min\n\n"
+                    f"El reporte comenzará automáticamente."
+                )
+            
+            await admision.esperar(turno, avisar_posicion)
+        
+        formato = context.user_data.get('formato')
+        resultado = await generar_reporte(query, cadena_seleccionada, forzar, delta, formato)
+        
+        if resultado:
+            await enviar_archivo_excel(query, resultado)
+            return SELECCIONANDO_CADENA
+        else:
+            await query.message.reply_text(
+                "ERROR AL GENERAR REPORTE\n\n"
+                "No se pudo generar el reporte. Posibles causas:\n\n"
+                "- Error de conexión a la base de datos\n"
+                "- No hay datos disponibles para esta cadena\n"
+                "- Problema al ejecutar las consultas\n"
+                "- Timeout en la consulta\n\n"
+                "Por favor, intenta nuevamente o selecciona otra cadena.",
+                reply_markup=InlineKeyboardMarkup([
+                    [
+                        InlineKeyboardButton("Reintentar", callback_data=f"cadena_{cadena_seleccionada}"),
+                        InlineKeyboardButton("Menú", callback_data="volver_menu")
+                    ],
+                    [InlineKeyboardButton("Cancelar", callback_data="cancelar")]
+                ])
+            )
+            return SELECCIONANDO_CADENA
+    finally:
+        admision.liberar(turno)
+
+def _texto_progreso(nombre_cadena: str, estado: dict, descripcion_formato: str = 'Excel') -> str:
+    """Texto del mensaje de progreso: etapas terminadas, la etapa en curso con su avance y nada más"""
+    lineas = [f"PROCESANDO SOLICITUD\n\nCadena: {nombre_cadena}\n"]
     
-    await query.edit_message_text(mensaje_inicial)
+    if 'categorias' not in estado:
+        lineas.append("Consultando categorías...")
+        return "\n".join(lineas)
+    lineas.append(f"Categorías consultadas ({estado['categorias']['total']} encontradas)")
     
-    archivo_generado = await generar_reporte(query, cadena_seleccionada)
+    if 'precios' in estado:
+        lineas.append(f"Datos de precios obtenidos ({estado['precios']['registros']:,} registros)")
+    else:
+        obtenidas = estado.get('filas_obtenidas', {}).get('registros', 0)
+        lineas.append(f"Obteniendo datos de precios... ({obtenidas:,} registros)" if obtenidas else "Obteniendo datos de precios...")
+        return "\n".join(lineas)
     
-    if archivo_generado:
-        await enviar_archivo_excel(query, archivo_generado, cadena_seleccionada)
-        return SELECCIONANDO_CADENA
+    if 'categorias_procesadas' in estado:
+        matriz = estado['categorias_procesadas']
+        lineas.append(f"Matriz armada ({matriz['productos']:,} productos x {matriz['categorias']} categorías)")
     else:
-        await query.message.reply_text(
-            "ERROR AL GENERAR REPORTE\n\n"
-            "No se pudo generar el reporte. Posibles causas:\n\n"
-            "- Error de conexión a la base de datos\n"
-            "- No hay datos disponibles para esta cadena\n"
-            "- Problema al ejecutar las consultas\n"
-            "- Timeout en la consulta\n\n"
-            "Por favor, intenta nuevamente o selecciona otra cadena.",
-            reply_markup=InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("Reintentar", callback_data=f"cadena_{cadena_seleccionada}"),
-                    InlineKeyboardButton("Menú", callback_data="volver_menu")
-                ],
-                [InlineKeyboardButton("Cancelar", callback_data="cancelar")]
-            ])
+        lineas.append("Armando matriz de precios...")
+        return "\n".join(lineas)
+    
+    escritura = estado.get('filas_escritas')
+    if escritura and escritura['total']:
+        porcentaje = 100 * escritura['escritas'] // escritura['total']
+        lineas.append(
+            f"Generando archivo {descripcion_formato}... {porcentaje}% "
+            f"({escritura['escritas']:,}/{escritura['total']:,} filas)"
         )
-        return SELECCIONANDO_CADENA
+    else:
+        lineas.append(f"Generando archivo {descripcion_formato}...")
+    return "\n".join(lineas)
 
-async def generar_reporte(query, nombre_cadena: str) -> Optional[str]:
+async def generar_reporte(
+    query,
+    nombre_cadena: str,
+    forzar: bool = False,
+    delta: bool = False,
+    formato: Optional[str] = None
+) -> Optional[ResultadoReporte]:
+    # Pandas y openpyxl se cargan con el primer reporte (o con la verificación de BD), no al arrancar
+    from db_consultas import procesar_cadena_simple
+    
+    actualizador = None
     try:
-        await query.edit_message_text(
-            f"PROCESANDO SOLICITUD\n\n"
-            f"Cadena: {nombre_cadena}\n\n"
-            f"Consultando categorías...\n"
-            f"Obteniendo datos de precios...\n"
-            f"Generando archivo Excel..."
-        )
-        
-        consultas = ConsultasDB()
-        if consultas.connection_string is None:
-            logger.error("No se pudo obtener el connection string")
-            return None
-        
-        if not consultas.conectar():
-            logger.error("No se pudo conectar a la base de datos")
-            return None
-        
-        cdn_id = obtener_cdn_id(nombre_cadena)
-        
-        categorias_df = consultas.obtener_categorias_por_cadena(cdn_id)
-        if categorias_df is None or len(categorias_df) == 0:
-            logger.error(f"No se encontraron categorías para {nombre_cadena}")
-            consultas.desconectar()
-            return None
+        descripcion_formato = obtener_exportador(formato).descripcion
         
-        await query.edit_message_text(
-            f"PROCESANDO SOLICITUD\n\n"
-            f"Cadena: {nombre_cadena}\n\n"
-            f"Categorías consultadas ({len(categorias_df)} encontradas)\n"
-            f"Obteniendo datos de precios...\n"
-            f"Generando archivo Excel..."
-        )
+        # Las ediciones van por el actualizador: se agrupan según PROGRESO_INTERVALO y no bloquean el reporte
+        actualizador = ActualizadorProgreso(query.edit_message_text)
+        actualizador.publicar(_texto_progreso(nombre_cadena, {}, descripcion_formato))
+        estado = {}
         
-        df_precios = consultas.ejecutar_stored_procedure_precios(cdn_id, categorias_df)
-        if df_precios is None or df_precios.empty:
-            logger.error(f"No se obtuvieron datos de precios para {nombre_cadena}")
-            consultas.desconectar()
-            return None
+        def al_evento(paso: str, datos: dict):
+            # Puede llegar desde el hilo del worker o desde el lector de la cola del Manager
+            estado[paso] = datos
+            actualizador.publicar_desde_hilo(_texto_progreso(nombre_cadena, dict(estado), descripcion_formato))
         
-        await query.edit_message_text(
-            f"PROCESANDO SOLICITUD\n\n"
-            f"Cadena: {nombre_cadena}\n\n"
-            f"Categorías consultadas ({len(categorias_df)} encontradas)\n"
-            f"Datos de precios obtenidos ({len(df_precios)} registros)\n"
-            f"Generando archivo Excel..."
-        )
+        ejecutor = obtener_ejecutor_reportes()
+        async with ejecutor.canal_progreso(al_evento) as progreso:
+            resultado = await ejecutor.ejecutar(
+                procesar_cadena_simple,
+                nombre_cadena,
+                progreso=progreso,
+                forzar=forzar,
+                delta=delta,
+                formato=formato,
+                para_envio=True
+            )
         
-        archivo_generado = consultas.generar_archivo_excel(df_precios, categorias_df, nombre_cadena, cdn_id)
-        consultas.desconectar()
+        if not ejecutor.admite_callbacks:
+            # Generado en otro proceso: sus métricas quedaron allá
+            obtener_metricas().registrar_generacion(nombre_cadena, resultado)
         
-        if archivo_generado:
-            await query.edit_message_text(
+        if resultado:
+            actualizador.cerrar(
                 f"PROCESANDO SOLICITUD\n\n"
                 f"Cadena: {nombre_cadena}\n\n"
-                f"Categorías consultadas ({len(categorias_df)})\n"
-                f"Datos de precios obtenidos ({len(df_precios)} registros)\n"
-                f"Archivo Excel generado\n\n"
+                f"{'Reporte reciente encontrado' if resultado.desde_cache else f'Archivo {descripcion_formato} generado'}\n\n"
                 f"Enviando archivo..."
             )
-            return archivo_generado
+            return resultado
+        
+        logger.error(f"No se pudo generar el reporte para {nombre_cadena}")
             
     except Exception as e:
         logger.error(f"Error al generar reporte: {e}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
+        # proceso_completo no lanza excepciones: falló el pool, no el pipeline que ya registra sus fallos
+        obtener_metricas().registrar_fallo(nombre_cadena, 'generacion')
     
+    if actualizador is not None:
+        actualizador.cerrar()
     return None
 
-async def enviar_archivo_excel(query, ruta_archivo: str, nombre_cadena: str):
+async def _enviar_documento(query, resultado: ResultadoReporte, archivo_entrega: ArchivoEntrega, **kwargs) -> int:
+    """
+    Envía un archivo del reporte; si el mismo contenido ya se subió antes con el mismo nombre se
+    reenvía por su file_id sin volver a subir los bytes. Devuelve los bytes subidos (0 si se reutilizó).
+    """
+    cache = obtener_cache_envios()
+    clave = CacheEnvios.clave(
+        resultado.hash_contenido, resultado.formato, archivo_entrega.comprimido,
+        archivo_entrega.parte, archivo_entrega.partes, archivo_entrega.nombre_archivo
+    )
+    
+    file_id = cache.obtener(clave)
+    if file_id is not None:
+        try:
+            await query.message.reply_document(document=file_id, **kwargs)
+            logger.info(f"Archivo reenviado por file_id sin subirlo: {archivo_entrega.nombre_archivo}")
+            return 0
+        except BadRequest as e:
+            logger.warning(f"Telegram rechazó el file_id cacheado, se sube el archivo: {e}")
+            cache.descartar(clave)
+    
+    with open(archivo_entrega.ruta, 'rb') as archivo:
+        mensaje = await query.message.reply_document(
+            document=archivo, filename=archivo_entrega.nombre_archivo, **kwargs
+        )
+    
+    if mensaje is not None and mensaje.document is not None:
+        cache.guardar(clave, mensaje.document.file_id, resultado.nombre_cadena, resultado.tipo)
+    return archivo_entrega.tamano_bytes
+
+async def enviar_archivo_excel(query, resultado: ResultadoReporte):
     try:
-        tamano_archivo = os.path.getsize(ruta_archivo) / 1024
-        nombre_archivo = os.path.basename(ruta_archivo)
+        ruta_archivo = resultado.ruta
+        nombre_archivo = resultado.nombre_archivo
+        nombre_cadena = resultado.nombre_cadena
         
-        import pandas as pd
-        try:
-            df_full = pd.read_excel(ruta_archivo, sheet_name='Precios')
-            total_filas = len(df_full)
-            total_columnas = len(df_full.columns)
-        except Exception as e:
-            logger.warning(f"Error al leer archivo para info: {e}")
-            total_columnas = "N/A"
-            total_filas = "N/A"
+        if resultado.desde_cache:
+            generado = datetime.fromtimestamp(resultado.generado_en).strftime('%H:%M')
+            linea_origen = f"Generado: {generado} (reporte reciente reutilizado)\n"
+        else:
+            linea_origen = f"Tiempo de generación: {resultado.tiempos.get('total', 0):.1f} s\n"
+        
+        if resultado.origen_datos == 'almacen' and resultado.datos_capturados_en:
+            capturado = datetime.fromtimestamp(resultado.datos_capturados_en).strftime('%H:%M')
+            linea_origen += f"Precios consultados: {capturado} (copia local)\n"
         
-        with open(ruta_archivo, 'rb') as archivo:
-            await query.message.reply_document(
-                document=archivo,
-                filename=nombre_archivo,
+        if resultado.formato == 'xlsx':
+            caracteristicas = (
+                f"Características:\n"
+                f"- Filtros automáticos activados\n"
+                f"- Encabezados formateados\n"
+                f"- Columnas auto-ajustadas\n\n"
+            )
+        else:
+            caracteristicas = (
+                f"Formato: {resultado.formato.upper()} sin estilos, "
+                f"listo para procesamiento automático\n\n"
+            )
+        
+        if resultado.tipo == 'cambios':
+            base = datetime.fromtimestamp(resultado.base_cambios).strftime('%d/%m/%Y %H:%M')
+            titulo = "REPORTE DE CAMBIOS DE PRECIOS"
+            linea_registros = f"Cambios: {resultado.filas} (desde {base})\n"
+        else:
+            titulo = "REPORTE GENERADO EXITOSAMENTE"
+            linea_registros = f"Registros: {resultado.filas} productos\n"
+        
+        # Archivos preparados por entrega.py (zip o partes); si faltan se envía el reporte tal cual
+        archivos = [ArchivoEntrega(**datos) for datos in resultado.entrega]
+        if not archivos or not all(os.path.exists(archivo.ruta) for archivo in archivos):
+            archivos = [ArchivoEntrega(ruta_archivo, resultado.tamano_bytes)]
+        
+        if any(archivo.tamano_bytes > LIMITE_TELEGRAM_BYTES for archivo in archivos):
+            logger.error(f"{nombre_archivo} supera el límite de Telegram y no se pudo dividir")
+            obtener_metricas().registrar_fallo(nombre_cadena, 'envio')
+            await query.message.reply_text(
+                "ERROR\n\n"
+                f"El reporte de {nombre_cadena} supera el tamaño máximo que permite Telegram (50 MB).\n"
+                "Contacta al administrador del sistema.",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("Volver al menú", callback_data="volver_menu")
+                ]])
+            )
+            return
+        
+        bytes_envio = sum(archivo.tamano_bytes for archivo in archivos)
+        bytes_subidos = 0
+        if len(archivos) > 1:
+            linea_envio = f"Envío: {len(archivos)} partes por grupos de categorías, {bytes_envio / 1024:.2f} KB\n"
+        elif archivos[0].comprimido:
+            linea_envio = f"Envío: {bytes_envio / 1024:.2f} KB (comprimido en ZIP)\n"
+        else:
+            linea_envio = ""
+        
+        metricas = obtener_metricas()
+        # Reservados mientras se suben: la limpieza del directorio de descargas no los toca
+        reserva = obtener_almacen_archivos().en_uso(*(archivo.ruta for archivo in archivos))
+        with reserva, metricas.medir(nombre_cadena, 'envio'):
+            # Las partes van primero; la última lleva el resumen y los botones
+            for archivo_entrega in archivos[:-1]:
+                bytes_subidos += await _enviar_documento(
+                    query,
+                    resultado,
+                    archivo_entrega,
+                    caption=(
+                        f"Cadena: {nombre_cadena}\n"
+                        f"Parte {archivo_entrega.parte} de {archivo_entrega.partes} "
+                        f"({archivo_entrega.tamano_bytes / 1024:.2f} KB)"
+                    )
+                )
+            
+            ultimo = archivos[-1]
+            linea_parte = f"Parte {ultimo.parte} de {ultimo.partes}\n" if ultimo.partes > 1 else ""
+            bytes_subidos += await _enviar_documento(
+                query,
+                resultado,
+                ultimo,
                 caption=(
-                    f"REPORTE GENERADO EXITOSAMENTE\n\n"
+                    f"{titulo}\n\n"
                     f"Cadena: {nombre_cadena}\n"
                     f"Archivo: {nombre_archivo}\n"
-                    f"Tamaño: {tamano_archivo:.2f} KB\n"
-                    f"Registros: {total_filas} productos\n"
-                    f"Columnas: {total_columnas}\n\n"
-                    f"Características:\n"
-                    f"- Filtros automáticos activados\n"
-                    f"- Encabezados formateados\n"
-                    f"- Columnas auto-ajustadas\n\n"
+                    f"{linea_parte}"
+                    f"Tamaño: {resultado.tamano_kb:.2f} KB\n"
+                    f"{linea_envio}"
+                    f"{linea_registros}"
+                    f"Columnas: {resultado.columnas}\n"
+                    f"{linea_origen}\n"
+                    f"{caracteristicas}"
                     f"¿Deseas generar otro reporte?"
                 ),
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("Nuevo reporte", callback_data="start_nuevo"),
-                    InlineKeyboardButton("Finalizar", callback_data="finalizar_todo")
-                ]])
+                reply_markup=InlineKeyboardMarkup([
+                    [
+                        InlineKeyboardButton("Nuevo reporte", callback_data="start_nuevo"),
+                        InlineKeyboardButton("Finalizar", callback_data="finalizar_todo")
+                    ],
+                    [
+                        InlineKeyboardButton("Actualizar datos", callback_data=f"refrescar_{nombre_cadena}"),
+                        InlineKeyboardButton("Ver cambios", callback_data=f"cambios_{nombre_cadena}")
+                    ]
+                ])
             )
         
+        metricas.registrar_reporte(resultado, bytes_subidos)
         logger.info(f"Archivo enviado exitosamente: {nombre_archivo}")
         
     except Exception as e:
         logger.error(f"Error al enviar archivo: {e}")
+        obtener_metricas().registrar_fallo(resultado.nombre_cadena, 'envio')
         await query.message.reply_text(
             "ERROR\n\n"
             "No se pudo enviar el archivo. Por favor, intenta nuevamente.",
@@ -382,29 +564,106 @@ async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 async def ayuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    exportadores = [obtener_exportador(formato) for formato in formatos_disponibles()]
+    formato_actual = context.user_data.get('formato', Config.FORMATO_REPORTE)
+    lineas_formatos = "".join(
+        f"- {exportador.descripcion} ({exportador.extension}){' (actual)' if exportador.formato == formato_actual else ''}\n"
+        for exportador in exportadores
+    )
     mensaje_ayuda = (
         "AYUDA - SISTEMA DE CONSULTA DE PRECIOS\n\n"
         "Comandos disponibles:\n"
         "/start - Iniciar el proceso de consulta\n"
-        "/ayuda o /help - Mostrar esta ayuda\n\n"
+        "/ayuda o /help - Mostrar esta ayuda\n"
+        "/estado - Ver la última actualización programada de reportes\n"
+        "/formato - Elegir el formato del archivo (Excel, CSV o Parquet)\n\n"
         "¿Cómo funciona?\n"
         "1. Selecciona una cadena del menú\n"
         "2. El sistema consulta automáticamente:\n"
         "   - Categorías disponibles\n"
         "   - Precios actuales de todos los productos\n"
         "   - Información detallada por sucursal\n"
-        "3. Recibes un archivo Excel listo para usar\n\n"
+        "3. Recibes el archivo en el formato elegido, listo para usar\n\n"
         f"Cadenas disponibles: {len(CADENAS_LISTA)}\n\n"
         "Tiempo de respuesta: 30-120 segundos\n\n"
-        "Formato del archivo:\n"
-        "- Archivo Excel (.xlsx)\n"
-        "- Organizado por categorías\n"
-        "- Incluye precios y disponibilidad\n\n"
+        "Formatos del archivo (se elige con /formato):\n"
+        f"{lineas_formatos}\n"
+        "En todos los formatos el reporte está organizado por categorías\n"
+        "e incluye precios y disponibilidad\n\n"
         "¿Necesitas ayuda adicional?\n"
         "Contacta al administrador del sistema."
     )
     await update.message.reply_text(mensaje_ayuda)
 
+async def estado(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    job = context.application.bot_data.get('job_precalentamiento')
+    admision = obtener_control_admision().estadisticas()
+    descargas = obtener_almacen_archivos().estadisticas()
+    tope_descargas = f" de {descargas['max_bytes'] / 1024 / 1024:.0f} MB" if descargas['max_bytes'] > 0 else ""
+    categorias = obtener_cache_categorias().estadisticas()
+    await update.message.reply_text(
+        "ESTADO DEL SISTEMA\n\n"
+        f"Reportes en curso: {admision['activos']}/{admision['max_concurrentes']}\n"
+        f"Solicitudes en cola: {admision['en_cola']}/{admision['max_cola']}\n"
+        f"Descargas en disco: {descargas['archivos']} archivos, "
+        f"{descargas['bytes'] / 1024 / 1024:.1f} MB{tope_descargas}\n"
+        f"Cache de categorías: {categorias['entradas']} cadenas, "
+        f"{categorias['aciertos']} aciertos / {categorias['fallos']} fallos\n"
+        f"{obtener_verificacion_bd().texto_estado()}\n\n"
+        + texto_estado_precalentamiento(job)
+    )
+
+async def elegir_formato(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    actual = context.user_data.get('formato', Config.FORMATO_REPORTE)
+    keyboard = [[
+        InlineKeyboardButton(
+            f"{'> ' if formato == actual else ''}{obtener_exportador(formato).descripcion}",
+            callback_data=f"formato_{formato}"
+        )
+        for formato in formatos_disponibles()
+    ]]
+    
+    await update.message.reply_text(
+        "FORMATO DEL REPORTE\n\n"
+        f"Formato actual: {obtener_exportador(actual).descripcion}\n\n"
+        "- Excel: con estilos y filtros, para revisión manual\n"
+        "- CSV / Parquet: sin estilos, más rápidos y livianos para procesos automáticos",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def seleccionar_formato(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    formato = query.data.split("_", 1)[1]
+    
+    if formato not in formatos_disponibles():
+        await query.answer("Formato no disponible")
+        return
+    
+    context.user_data['formato'] = formato
+    descripcion = obtener_exportador(formato).descripcion
+    await query.answer(f"Formato: {descripcion}")
+    await query.edit_message_text(
+        f"FORMATO DEL REPORTE\n\n"
+        f"Los próximos reportes se generarán en formato {descripcion}.\n\n"
+        f"Usa /start para generar un reporte."
+    )
+
+async def limpiar_descargas(context: ContextTypes.DEFAULT_TYPE):
+    """Desaloja periódicamente lo vencido aunque no se generen reportes nuevos"""
+    await asyncio.to_thread(obtener_almacen_archivos().limpiar)
+
+async def iniciar_recursos(application: Application):
+    # La verificación de BD corre en segundo plano: el bot atiende mientras tanto
+    obtener_verificacion_bd().iniciar()
+
+async def cerrar_recursos(application: Application):
+    from db_consultas import cerrar_pool_conexiones
+    
+    obtener_verificacion_bd().detener()
+    obtener_ejecutor_reportes().cerrar(esperar=False)
+    cerrar_pool_conexiones()
+    detener_servidor_metricas()
+
 def main():
     logger.info("Iniciando bot...")
     
@@ -429,36 +688,52 @@ def main():
     
     logger.info("Token encontrado en .env")
     
-    logger.info("Verificando credenciales encriptadas...")
-    
-    cred_manager = obtener_credenciales_manager()
-    if not cred_manager.cargar_credenciales():
-        logger.error("No se pudieron cargar las credenciales encriptadas")
-        logger.error("Verifica que existan los archivos secret.key y credenciales.enc")
-        return
-    
-    if not cred_manager.validar_credenciales():
-        logger.error("Las credenciales no son válidas")
-        return
-    
-    logger.info("Credenciales validadas correctamente")
-    logger.info("Verificando conexión a la base de datos...")
-    
-    consultas_test = ConsultasDB()
-    if not consultas_test.conectar():
-        logger.error("No se pudo conectar a la base de datos")
+    # Un valor mal escrito (p. ej. MODO_SERVIDOR) no debe caer en silencio a un valor por defecto
+    if not Config.validar():
+        logger.error("Configuración no válida: corrige las variables de entorno indicadas")
         return
     
-    consultas_test.desconectar()
-    logger.info("Conexión a BD verificada correctamente")
-    
-    application = Application.builder().token(token).build()
+    if Config.DB_BACKEND == 'local':
+        logger.warning("DB_BACKEND=local: se usa la base SQLite de pruebas en lugar de SQL Server")
+    else:
+        logger.info("Verificando credenciales encriptadas...")
+        
+        cred_manager = obtener_credenciales_manager()
+        if not cred_manager.cargar_credenciales():
+            logger.error("No se pudieron cargar las credenciales encriptadas")
+            logger.error("Verifica que existan los archivos secret.key y credenciales.enc")
+            return
+        
+        if not cred_manager.validar_credenciales():
+            logger.error("Las credenciales no son válidas")
+            return
+        
+        logger.info("Credenciales validadas correctamente")
+    
+    iniciar_servidor_metricas()
+    
+    # concurrent_updates: un reporte en curso no bloquea /start, /ayuda ni cancelar
+    application = (
+        Application.builder()
+        .token(token)
+        .base_url(f"{Config.TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{Config.TELEGRAM_API_URL}/file/bot")
+        .concurrent_updates(True)
+        .post_init(iniciar_recursos)
+        .post_shutdown(cerrar_recursos)
+        .build()
+    )
     
+    # Con concurrent_updates dos updates del mismo usuario pueden correr a la vez sobre la
+    # conversación; aquí no hay carrera que importe: hay un solo estado (SELECCIONANDO_CADENA) y
+    # cada handler vuelve a él o a END, así que lo peor es que un reporte en curso reabra una
+    # conversación finalizada mientras tanto. Los reportes duplicados los frena ControlAdmision
+    # (ADMISION_MAX_POR_USUARIO), no el estado de la conversación.
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start)],
         states={
             SELECCIONANDO_CADENA: [
-                CallbackQueryHandler(seleccionar_cadena, pattern='^cadena_'),
+                CallbackQueryHandler(seleccionar_cadena, pattern='^(cadena|refrescar|cambios)_'),
                 CallbackQueryHandler(volver_menu, pattern='^volver_menu$'),
                 CallbackQueryHandler(cancelar, pattern='^cancelar$'),
                 CallbackQueryHandler(start_nuevo, pattern='^start_nuevo$'),
@@ -475,6 +750,17 @@ def main():
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler('ayuda', ayuda))
     application.add_handler(CommandHandler('help', ayuda))
+    application.add_handler(CommandHandler('estado', estado))
+    application.add_handler(CommandHandler('formato', elegir_formato))
+    application.add_handler(CallbackQueryHandler(seleccionar_formato, pattern='^formato_'))
+    
+    application.bot_data['job_precalentamiento'] = registrar_precalentamiento(application)
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            limpiar_descargas, interval=Config.ARCHIVOS_INTERVALO_LIMPIEZA, first=10, name='limpiar_descargas'
+        )
+    else:
+        logger.warning("JobQueue no disponible: el directorio de descargas solo se limpia al generar reportes")
     
     logger.info("="*70)
     logger.info("BOT DE CONSULTA DE PRECIOS INICIADO")
@@ -482,10 +768,30 @@ def main():
     logger.info(f"Cadenas configuradas: {len(CADENAS_LISTA)}")
     logger.info(f"Token de Telegram: {'*' * 20}{token[-8:]}")
     logger.info(f"Sistema de credenciales: Encriptado")
-    logger.info(f"Conexión BD: Activa")
+    logger.info(f"Conexión BD: verificación en segundo plano")
+    logger.info(f"Pool de reportes: {Config.REPORT_POOL} ({Config.REPORT_WORKERS} workers)")
+    logger.info(f"Recepción de updates: {Config.MODO_SERVIDOR}")
     logger.info("="*70)
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Ambos modos atienden SIGINT/SIGTERM: dejan de recibir updates, esperan los handlers en curso
+    # (reportes incluidos) y luego corren post_shutdown
+    if Config.MODO_SERVIDOR == 'webhook':
+        url_webhook = f"{Config.WEBHOOK_URL.rstrip('/')}/{Config.WEBHOOK_RUTA}"
+        logger.info(
+            f"Webhook escuchando en {Config.WEBHOOK_ESCUCHAR}:{Config.WEBHOOK_PUERTO}/{Config.WEBHOOK_RUTA} "
+            f"(registrado como {url_webhook})"
+        )
+        application.run_webhook(
+            listen=Config.WEBHOOK_ESCUCHAR,
+            port=Config.WEBHOOK_PUERTO,
+            url_path=Config.WEBHOOK_RUTA,
+            webhook_url=url_webhook,
+            secret_token=Config.WEBHOOK_SECRETO,
+            max_connections=Config.WEBHOOK_MAX_CONEXIONES,
+            allowed_updates=ACTUALIZACIONES_PERMITIDAS
+        )
+    else:
+        application.run_polling(allowed_updates=ACTUALIZACIONES_PERMITIDAS)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
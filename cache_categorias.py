@@ -0,0 +1,75 @@
+# cache_categorias.py
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class CacheCategorias:
+    """Cache en memoria, con TTL, de las categorías activas (ya filtradas) por cdn_id"""
+    
+    def __init__(self, ttl: float = None):
+        self.ttl = Config.CATEGORIAS_CACHE_TTL if ttl is None else ttl
+        self._entradas: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+    
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0
+    
+    def obtener(self, cdn_id: int) -> Optional['pd.DataFrame']:
+        """Devuelve una copia de las categorías cacheadas o None si no hay entrada vigente"""
+        with self._lock:
+            entrada = self._entradas.get(cdn_id)
+            
+            if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+                self.aciertos += 1
+                return entrada[1].copy()
+            
+            if entrada is not None:
+                del self._entradas[cdn_id]
+            
+            self.fallos += 1
+            return None
+    
+    def guardar(self, cdn_id: int, categorias_df: 'pd.DataFrame'):
+        if not self.habilitado:
+            return
+        
+        with self._lock:
+            self._entradas[cdn_id] = (time.monotonic(), categorias_df.copy())
+    
+    def invalidar(self, cdn_id: Optional[int] = None):
+        """Invalida una cadena, o todo el cache si no se indica cdn_id"""
+        with self._lock:
+            if cdn_id is None:
+                self._entradas.clear()
+                logger.info("Cache de categorías invalidado por completo")
+            elif self._entradas.pop(cdn_id, None) is not None:
+                logger.info(f"Cache de categorías invalidado para cdn_id: {cdn_id}")
+    
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+_cache_categorias = None
+
+def obtener_cache_categorias() -> CacheCategorias:
+    global _cache_categorias
+    
+    if _cache_categorias is None:
+        _cache_categorias = CacheCategorias()
+    
+    return _cache_categorias
@@ -0,0 +1,134 @@
+# cache_envios.py
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+from indice_json import IndiceJSON
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_INDICE = '.cache_envios.json'
+
+class CacheEnvios:
+    """
+    file_id de Telegram por contenido enviado: un reporte con el mismo hash de contenido
+    (y el mismo formato, compresión, parte y nombre de archivo) se reenvía por file_id sin volver a subirlo.
+    Se persiste como JSON junto a los reportes, igual que el índice de CacheReportes.
+    """
+    
+    def __init__(self, ruta_indice: str = None, ttl: float = None):
+        # Sin valores explícitos se lee Config en cada uso, así rige un Config.valores_temporales posterior
+        self._ruta_indice = ruta_indice
+        self._ttl = ttl
+        self._indices: Dict[str, IndiceJSON] = {}
+        self._lock_indices = threading.Lock()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+    
+    @property
+    def ruta_indice(self) -> str:
+        return self._ruta_indice or os.path.join(Config.DOWNLOAD_DIR, NOMBRE_INDICE)
+    
+    @property
+    def ttl(self) -> float:
+        return Config.ENVIOS_CACHE_TTL if self._ttl is None else self._ttl
+    
+    @property
+    def _indice(self) -> IndiceJSON:
+        ruta = self.ruta_indice
+        with self._lock_indices:
+            if ruta not in self._indices:
+                self._indices[ruta] = IndiceJSON(ruta, 'índice de envíos cacheados')
+            return self._indices[ruta]
+    
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0
+    
+    @staticmethod
+    def clave(
+        hash_contenido: str,
+        formato: str,
+        comprimido: bool = False,
+        parte: int = 1,
+        partes: int = 1,
+        nombre_archivo: str = None
+    ) -> str:
+        # Un file_id se reenvía con el nombre de su primera subida: el nombre (con la fecha) es parte de la clave
+        clave = f"{hash_contenido}|{formato}|{'zip' if comprimido else 'plano'}|{parte}/{partes}"
+        return f"{clave}|{nombre_archivo}" if nombre_archivo else clave
+    
+    def obtener(self, clave: str) -> Optional[str]:
+        """file_id vigente para el contenido, o None si hay que subir el archivo"""
+        if not self.habilitado:
+            return None
+        
+        entrada = self._indice.leer().get(clave)
+        if entrada is not None and time.time() - entrada['enviado_en'] < self.ttl:
+            with self._lock:
+                self.aciertos += 1
+            return entrada['file_id']
+        
+        if entrada is not None:
+            with self._indice.modificar() as entradas:
+                # Solo si nadie la renovó mientras tanto
+                actual = entradas.get(clave)
+                if actual is not None and actual['enviado_en'] == entrada['enviado_en']:
+                    del entradas[clave]
+        
+        with self._lock:
+            self.fallos += 1
+        return None
+    
+    def guardar(self, clave: str, file_id: str, nombre_cadena: str, tipo: str):
+        """
+        Registra el file_id devuelto por Telegram. Las entradas de la misma cadena y tipo de
+        reporte con otro contenido se descartan: los precios cambiaron y no se volverán a pedir.
+        """
+        if not self.habilitado:
+            return
+        
+        hash_contenido = clave.split('|', 1)[0]
+        with self._indice.modificar() as entradas:
+            reemplazadas = [
+                clave_existente for clave_existente, entrada in entradas.items()
+                if entrada.get('cadena') == nombre_cadena and entrada.get('tipo') == tipo
+                and not clave_existente.startswith(f"{hash_contenido}|")
+            ]
+            for clave_existente in reemplazadas:
+                del entradas[clave_existente]
+            entradas[clave] = {
+                'file_id': file_id,
+                'enviado_en': time.time(),
+                'cadena': nombre_cadena,
+                'tipo': tipo,
+            }
+    
+    def descartar(self, clave: str):
+        """Olvida un file_id que Telegram ya no acepta"""
+        if clave not in self._indice.leer():
+            return
+        with self._indice.modificar() as entradas:
+            entradas.pop(clave, None)
+    
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entradas': len(self._indice),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+_cache_envios = None
+
+def obtener_cache_envios() -> CacheEnvios:
+    global _cache_envios
+    
+    if _cache_envios is None:
+        _cache_envios = CacheEnvios()
+    
+    return _cache_envios
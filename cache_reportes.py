@@ -0,0 +1,146 @@
+# cache_reportes.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from config import Config
+from indice_json import IndiceJSON
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_INDICE = '.cache_reportes.json'
+
+class CacheReportes:
+    """
+    Índice de reportes ya generados por (cadena, canales, categorías, variante, formato) con ventana de frescura.
+    Se persiste como JSON junto a los reportes para compartirlo entre workers, procesos y reinicios.
+    """
+    
+    def __init__(self, ruta_indice: str = None, ttl: float = None):
+        # Sin valores explícitos se lee Config en cada uso, así rige un Config.valores_temporales posterior
+        self._ruta_indice = ruta_indice
+        self._ttl = ttl
+        self._indices: Dict[str, IndiceJSON] = {}
+        self._lock_indices = threading.Lock()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+    
+    @property
+    def ruta_indice(self) -> str:
+        return self._ruta_indice or os.path.join(Config.DOWNLOAD_DIR, NOMBRE_INDICE)
+    
+    @property
+    def ttl(self) -> float:
+        return Config.REPORTE_CACHE_TTL if self._ttl is None else self._ttl
+    
+    @property
+    def _indice(self) -> IndiceJSON:
+        ruta = self.ruta_indice
+        with self._lock_indices:
+            if ruta not in self._indices:
+                self._indices[ruta] = IndiceJSON(ruta, 'índice de reportes cacheados')
+            return self._indices[ruta]
+    
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0
+    
+    @staticmethod
+    def clave(
+        cdn_id: int,
+        canal_param: str,
+        canal_ids: Optional[List[str]],
+        categoria_ids: Iterable[str],
+        variante: str = 'completo',
+        formato: str = 'xlsx'
+    ) -> str:
+        canales = ','.join(sorted(str(c).strip().upper() for c in canal_ids)) if canal_ids else 'default'
+        categorias = ','.join(sorted(str(c).strip().upper() for c in categoria_ids))
+        huella_categorias = hashlib.sha1(categorias.encode('utf-8')).hexdigest()
+        return f"{cdn_id}|{canal_param}|{canales}|{huella_categorias}|{variante}|{formato}"
+    
+    def _es_vigente(self, entrada: Dict) -> bool:
+        vigencia = entrada.get('vigencia') or self.ttl
+        return time.time() - entrada['generado_en'] < vigencia and os.path.exists(entrada['ruta'])
+    
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """Devuelve la entrada vigente ({'ruta', 'generado_en', ...}) o None"""
+        entrada = self._indice.leer().get(clave)
+        
+        if entrada is not None and self._es_vigente(entrada):
+            with self._lock:
+                self.aciertos += 1
+            return dict(entrada)
+        
+        if entrada is not None:
+            with self._indice.modificar() as entradas:
+                # Solo si nadie la regeneró mientras tanto
+                actual = entradas.get(clave)
+                if actual is not None and actual['generado_en'] == entrada['generado_en']:
+                    del entradas[clave]
+        
+        with self._lock:
+            self.fallos += 1
+        return None
+    
+    def guardar(self, clave: str, ruta: str, vigencia: float = None, **metadatos):
+        """Registra un reporte generado; vigencia permite una ventana distinta a la del TTL general"""
+        if not self.habilitado:
+            return
+        
+        with self._indice.modificar() as entradas:
+            entradas[clave] = {
+                'ruta': os.path.abspath(ruta),
+                'generado_en': time.time(),
+                'vigencia': vigencia,
+                **metadatos
+            }
+    
+    def actualizar(self, clave: str, ruta: str, **metadatos):
+        """Agrega metadatos a la entrada del reporte en ruta sin renovar su vigencia (si sigue indexada)"""
+        if not self.habilitado:
+            return
+        
+        with self._indice.modificar() as entradas:
+            entrada = entradas.get(clave)
+            if entrada is not None and entrada['ruta'] == os.path.abspath(ruta):
+                entrada.update(metadatos)
+    
+    def invalidar(self, cdn_id: Optional[int] = None):
+        """Invalida los reportes de una cadena, o todos si no se indica cdn_id"""
+        with self._indice.modificar() as entradas:
+            if cdn_id is None:
+                entradas.clear()
+            else:
+                prefijo = f"{cdn_id}|"
+                for clave in [clave for clave in entradas if clave.startswith(prefijo)]:
+                    del entradas[clave]
+    
+    def archivos_por_entrada(self) -> List[List[str]]:
+        """Rutas de cada reporte indexado junto con las de sus archivos de envío (zip o partes)"""
+        return [
+            [entrada['ruta']] + [archivo['ruta'] for archivo in entrada.get('entrega') or []]
+            for entrada in self._indice.leer().values()
+        ]
+    
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entradas': len(self._indice),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+_cache_reportes = None
+
+def obtener_cache_reportes() -> CacheReportes:
+    global _cache_reportes
+    
+    if _cache_reportes is None:
+        _cache_reportes = CacheReportes()
+    
+    return _cache_reportes
@@ -0,0 +1,342 @@
+# cliente_telegram_falso.py
+import argparse
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from email.parser import BytesParser
+from email.policy import default as politica_email
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PRUEBA = '123456:prueba-local'
+USUARIO_PRUEBA = {'id': 1001, 'is_bot': False, 'first_name': 'Prueba', 'username': 'prueba'}
+CHAT_PRUEBA = {'id': 1001, 'type': 'private', 'first_name': 'Prueba'}
+BOT_FALSO = {'id': 123456, 'is_bot': True, 'first_name': 'Bot de prueba', 'username': 'bot_prueba_bot'}
+
+class APITelegramFalsa:
+    """
+    Bot API mínima en memoria: responde lo que el bot necesita (getMe, setWebhook, sendMessage,
+    editMessageText, sendDocument, ...) y registra cada llamada para verificarla después
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', puerto: int = 8081):
+        self.llamadas: List[Dict] = []
+        self._condicion = threading.Condition()
+        self._mensajes = 0
+        api = self
+        
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                metodo = self.path.rstrip('/').rsplit('/', 1)[-1]
+                parametros = _leer_parametros(self.headers.get('Content-Type', ''), cuerpo)
+                respuesta = json.dumps({'ok': True, 'result': api.registrar(metodo, parametros)}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(respuesta)))
+                self.end_headers()
+                self.wfile.write(respuesta)
+            
+            do_GET = do_POST
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self.url = f"http://{host}:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, name='api-telegram-falsa', daemon=True).start()
+    
+    def registrar(self, metodo: str, parametros: Dict):
+        with self._condicion:
+            self.llamadas.append({'metodo': metodo, 'parametros': parametros})
+            resultado = self._resultado(metodo, parametros)
+            self._condicion.notify_all()
+        return resultado
+    
+    def _resultado(self, metodo: str, parametros: Dict):
+        if metodo == 'getMe':
+            return BOT_FALSO
+        if metodo == 'getWebhookInfo':
+            return {'url': '', 'has_custom_certificate': False, 'pending_update_count': 0}
+        if metodo in ('sendMessage', 'editMessageText', 'sendDocument'):
+            self._mensajes += 1
+            mensaje = {
+                'message_id': parametros.get('message_id') or 1000 + self._mensajes,
+                'date': int(time.time()),
+                'chat': CHAT_PRUEBA,
+                'from': BOT_FALSO,
+            }
+            if metodo == 'sendDocument':
+                documento = parametros.get('document')
+                mensaje['document'] = {
+                    'file_id': documento if isinstance(documento, str) else f"archivo-{self._mensajes}",
+                    'file_unique_id': f"unico-{self._mensajes}",
+                    'file_name': documento.get('archivo') if isinstance(documento, dict) else None,
+                }
+                mensaje['caption'] = parametros.get('caption')
+            else:
+                mensaje['text'] = parametros.get('text', '')
+            return mensaje
+        return True
+    
+    def esperar(self, metodo: str, condicion: Callable[[Dict], bool] = None, desde: int = 0, timeout: float = 60) -> Optional[Dict]:
+        """Primera llamada a `metodo` desde la posición `desde` que cumple la condición"""
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                for llamada in self.llamadas[desde:]:
+                    if llamada['metodo'] == metodo and (condicion is None or condicion(llamada['parametros'])):
+                        return llamada
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._condicion.wait(restante)
+    
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+def _decodificar(valor: str):
+    try:
+        return json.loads(valor)
+    except ValueError:
+        return valor
+
+def _leer_parametros(tipo_contenido: str, cuerpo: bytes) -> Dict:
+    """Parámetros de la llamada: formulario, JSON o multipart (los archivos se registran por nombre y tamaño)"""
+    if tipo_contenido.startswith('multipart/form-data'):
+        mensaje = BytesParser(policy=politica_email).parsebytes(
+            f"Content-Type: {tipo_contenido}\r\n\r\n".encode('utf-8') + cuerpo
+        )
+        parametros = {}
+        for parte in mensaje.iter_parts():
+            nombre = parte.get_param('name', header='content-disposition')
+            contenido = parte.get_payload(decode=True) or b''
+            if parte.get_filename():
+                parametros[nombre] = {'archivo': parte.get_filename(), 'bytes': len(contenido)}
+            else:
+                parametros[nombre] = _decodificar(contenido.decode('utf-8'))
+        return parametros
+    
+    if tipo_contenido.startswith('application/json'):
+        return json.loads(cuerpo or b'{}')
+    
+    return {clave: _decodificar(valores[-1]) for clave, valores in parse_qs(cuerpo.decode('utf-8')).items()}
+
+def publicar_update(url_webhook: str, secreto: Optional[str], update: Dict) -> int:
+    """POST de un update como lo hace Telegram; devuelve el código HTTP"""
+    solicitud = urllib.request.Request(
+        url_webhook,
+        data=json.dumps(update).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    if secreto is not None:
+        solicitud.add_header('X-Telegram-Bot-Api-Secret-Token', secreto)
+    try:
+        with urllib.request.urlopen(solicitud, timeout=10) as respuesta:
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def update_comando(update_id: int, texto: str) -> Dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': CHAT_PRUEBA,
+            'from': USUARIO_PRUEBA,
+            'text': texto,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(texto.split()[0])}],
+        },
+    }
+
+def update_boton(update_id: int, datos: str, message_id: int) -> Dict:
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': f"consulta-{update_id}",
+            'from': USUARIO_PRUEBA,
+            'chat_instance': 'instancia-prueba',
+            'data': datos,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': CHAT_PRUEBA,
+                'from': BOT_FALSO,
+                'text': 'SELECCIÓN DE CADENA',
+            },
+        },
+    }
+
+def _iniciar_bot(api: APITelegramFalsa, puerto_webhook: int, secreto: str, directorio: str):
+    """Levanta bot.py en modo webhook contra la API falsa, con el backend local y datos en `directorio`"""
+    entorno = dict(os.environ)
+    entorno.update({
+        'TELEGRAM_BOT_TOKEN': TOKEN_PRUEBA,
+        'TELEGRAM_API_URL': api.url,
+        'MODO_SERVIDOR': 'webhook',
+        'WEBHOOK_URL': f"http://127.0.0.1:{puerto_webhook}",
+        'WEBHOOK_ESCUCHAR': '127.0.0.1',
+        'WEBHOOK_PUERTO': str(puerto_webhook),
+        'WEBHOOK_SECRETO': secreto,
+        'METRICAS_HABILITADAS': 'false',
+        'PRECALENTAR_CADENAS': '',
+        'PROGRESO_INTERVALO': '0.2',
+        'DOWNLOAD_DIR': os.path.join(directorio, 'descargas'),
+        'ALMACEN_RUTA': os.path.join(directorio, 'almacen_precios.db'),
+        'BACKEND_LOCAL_RUTA': os.path.join(directorio, 'sqlserver_local.db'),
+    })
+    entorno.setdefault('DB_BACKEND', 'local')
+    entorno.setdefault('BACKEND_LOCAL_PLUS', '500')
+    entorno.setdefault('BACKEND_LOCAL_CATEGORIAS', '10')
+    
+    ruta_log = os.path.join(directorio, 'bot.log')
+    log = open(ruta_log, 'w', encoding='utf-8')
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')],
+        env=entorno,
+        stdout=log,
+        stderr=subprocess.STDOUT
+    )
+    return proceso, ruta_log
+
+def ejecutar_prueba(
+    cadena: str,
+    puerto_api: int = 0,
+    puerto_webhook: int = 8443,
+    url_webhook: Optional[str] = None,
+    secreto: Optional[str] = None,
+    timeout: float = 180
+) -> bool:
+    """
+    Recorre el flujo completo por webhook: registro del webhook, rechazo sin secreto, /start,
+    botón de cadena con envío del reporte, segundo pedido reenviado por file_id y apagado con SIGTERM.
+    Sin url_webhook levanta bot.py; con url_webhook publica contra un bot ya iniciado
+    (con TELEGRAM_API_URL apuntando a esta API falsa).
+    """
+    api = APITelegramFalsa(puerto=puerto_api)
+    proceso, ruta_log = None, None
+    fallas = []
+    
+    def comprobar(condicion: bool, descripcion: str):
+        logger.info(f"{'OK   ' if condicion else 'FALLA'} {descripcion}")
+        if not condicion:
+            fallas.append(descripcion)
+        return condicion
+    
+    try:
+        if url_webhook is None:
+            secreto = secreto or secrets.token_urlsafe(24)
+            proceso, ruta_log = _iniciar_bot(api, puerto_webhook, secreto, tempfile.mkdtemp(prefix='webhook_prueba_'))
+            url_webhook = f"http://127.0.0.1:{puerto_webhook}/telegram"
+            logger.info(f"API falsa en {api.url}; bot iniciado (log: {ruta_log})")
+            
+            registro = api.esperar('setWebhook', timeout=timeout)
+            if not comprobar(registro is not None, "el bot registra el webhook"):
+                return False
+            parametros = registro['parametros']
+            comprobar(parametros.get('url') == url_webhook, f"URL registrada: {parametros.get('url')}")
+            comprobar(parametros.get('secret_token') == secreto, "secret_token registrado")
+            comprobar(
+                parametros.get('allowed_updates') == ['message', 'callback_query'],
+                f"allowed_updates: {parametros.get('allowed_updates')}"
+            )
+            # El servidor HTTP del webhook arranca justo después del registro
+            time.sleep(1)
+        
+        comprobar(publicar_update(url_webhook, None, update_comando(1, '/start')) == 403, "update sin secreto rechazado")
+        comprobar(publicar_update(url_webhook, 'otro', update_comando(2, '/start')) == 403, "update con secreto incorrecto rechazado")
+        
+        desde = len(api.llamadas)
+        comprobar(publicar_update(url_webhook, secreto, update_comando(3, '/start')) == 200, "update /start aceptado")
+        menu = api.esperar(
+            'sendMessage', lambda p: 'SELECCIÓN DE CADENA' in str(p.get('text', '')), desde=desde, timeout=30
+        )
+        if not comprobar(menu is not None, "menú de cadenas enviado"):
+            return False
+        
+        for numero, update_id in enumerate((4, 5), 1):
+            # Como un usuario real: el ConversationHandler fija el estado y la admisión libera el
+            # cupo cuando el handler anterior termina, no cuando llega su último mensaje
+            time.sleep(1)
+            desde = len(api.llamadas)
+            inicio = time.monotonic()
+            comprobar(
+                publicar_update(url_webhook, secreto, update_boton(update_id, f"cadena_{cadena}", 1000)) == 200,
+                f"botón cadena_{cadena} aceptado (pedido {numero})"
+            )
+            envio = api.esperar('sendDocument', desde=desde, timeout=timeout)
+            if not comprobar(envio is not None, f"reporte enviado (pedido {numero}, {time.monotonic() - inicio:.1f} s)"):
+                return False
+            documento = envio['parametros'].get('document')
+            if numero == 1:
+                comprobar(isinstance(documento, dict) and documento.get('bytes', 0) > 0, f"archivo subido: {documento}")
+            else:
+                comprobar(isinstance(documento, str), f"mismo contenido reenviado por file_id: {documento}")
+        
+        if proceso is not None:
+            inicio = time.monotonic()
+            proceso.send_signal(signal.SIGTERM)
+            try:
+                codigo = proceso.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                codigo = None
+            comprobar(codigo == 0, f"apagado ordenado con SIGTERM (código {codigo}, {time.monotonic() - inicio:.1f} s)")
+        
+        return not fallas
+        
+    finally:
+        if proceso is not None and proceso.poll() is None:
+            proceso.kill()
+            proceso.wait()
+        api.cerrar()
+        llamadas = {}
+        for llamada in api.llamadas:
+            llamadas[llamada['metodo']] = llamadas.get(llamada['metodo'], 0) + 1
+        logger.info(f"Llamadas a la API falsa: {llamadas}")
+        if fallas and ruta_log:
+            with open(ruta_log, 'r', encoding='utf-8') as f:
+                logger.info("Últimas líneas del log del bot:\n" + ''.join(f.readlines()[-30:]))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba local del modo webhook con un cliente de Telegram falso")
+    parser.add_argument('--cadena', default='JUAN VALDEZ', help="Cadena a pedir con el botón")
+    parser.add_argument('--puerto-api', type=int, default=0, help="Puerto de la API falsa (0 = libre)")
+    parser.add_argument('--puerto-webhook', type=int, default=8443, help="Puerto del webhook del bot levantado")
+    parser.add_argument('--url-webhook', default=None, help="Publicar contra un bot ya iniciado en esta URL")
+    parser.add_argument('--secreto', default=None, help="WEBHOOK_SECRETO (obligatorio con --url-webhook)")
+    parser.add_argument('--timeout', type=float, default=180, help="Segundos máximos por paso")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    
+    if args.url_webhook and not args.secreto:
+        parser.error("--secreto es obligatorio con --url-webhook")
+    
+    exito = ejecutar_prueba(
+        args.cadena,
+        puerto_api=args.puerto_api,
+        puerto_webhook=args.puerto_webhook,
+        url_webhook=args.url_webhook,
+        secreto=args.secreto,
+        timeout=args.timeout
+    )
+    logger.info("PRUEBA EXITOSA" if exito else "PRUEBA FALLIDA")
+    return 0 if exito else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,6 @@
 import os
+import re
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +11,120 @@ class Config:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     QUERY_TIMEOUT = int(os.getenv('QUERY_TIMEOUT', '120'))
     
+    # Segundos entre reintentos de la verificación de BD en segundo plano al arrancar el bot
+    BD_REINTENTO_SEGUNDOS = int(os.getenv('BD_REINTENTO_SEGUNDOS', '30'))
+    
+    # Ejecución de reportes fuera del event loop ('thread' o 'process')
+    REPORT_POOL = os.getenv('REPORT_POOL', 'thread')
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '4'))
+    
+    # Modo lote (lote_reportes.py): por defecto en procesos para paralelizar pandas/openpyxl
+    LOTE_POOL = os.getenv('LOTE_POOL', 'process')
+    LOTE_WORKERS = int(os.getenv('LOTE_WORKERS', '4'))
+    
+    # Pool de conexiones a SQL Server
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '5'))
+    DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    
+    # Cache de categorías activas por cadena (segundos, 0 desactiva)
+    CATEGORIAS_CACHE_TTL = int(os.getenv('CATEGORIAS_CACHE_TTL', '3600'))
+    
+    # Ventana de frescura de reportes ya generados (segundos, 0 desactiva)
+    REPORTE_CACHE_TTL = int(os.getenv('REPORTE_CACHE_TTL', '600'))
+    
+    # Precalentamiento programado de reportes (cron de 5 campos en ZONA_HORARIA)
+    PRECALENTAR_CADENAS = [c.strip() for c in os.getenv('PRECALENTAR_CADENAS', '').split(',') if c.strip()]
+    PRECALENTAR_CRON = os.getenv('PRECALENTAR_CRON', '30 6 * * 1-5')
+    PRECALENTAR_VIGENCIA = int(os.getenv('PRECALENTAR_VIGENCIA', '14400'))
+    ZONA_HORARIA = os.getenv('ZONA_HORARIA', 'America/Guayaquil')
+    
+    # Snapshots diarios de la matriz por cadena para reportes de cambios (días que se conservan)
+    SNAPSHOTS_DIR = os.getenv('SNAPSHOTS_DIR', os.path.join(DOWNLOAD_DIR, 'snapshots'))
+    SNAPSHOTS_DIAS = int(os.getenv('SNAPSHOTS_DIAS', '7'))
+    
+    # Copia local de la salida del SP: se sirve tal cual hasta ALMACEN_FRESCO segundos,
+    # hasta ALMACEN_MAX_ANTIGUEDAD se sirve y se refresca en segundo plano, después se consulta el SP
+    ALMACEN_HABILITADO = os.getenv('ALMACEN_HABILITADO', 'true').lower() in ('1', 'true', 'si', 'yes')
+    ALMACEN_RUTA = os.getenv('ALMACEN_RUTA', './datos/almacen_precios.db')
+    ALMACEN_FRESCO = int(os.getenv('ALMACEN_FRESCO', '300'))
+    ALMACEN_MAX_ANTIGUEDAD = int(os.getenv('ALMACEN_MAX_ANTIGUEDAD', '3600'))
+    ALMACEN_REFRESCO_MAX = int(os.getenv('ALMACEN_REFRESCO_MAX', '900'))
+    
+    # Origen de datos: 'sqlserver' (producción) o 'local' (SQLite con datos sintéticos para pruebas de carga)
+    DB_BACKEND = os.getenv('DB_BACKEND', 'sqlserver').lower()
+    BACKEND_LOCAL_RUTA = os.getenv('BACKEND_LOCAL_RUTA', './datos/sqlserver_local.db')
+    BACKEND_LOCAL_PLUS = int(os.getenv('BACKEND_LOCAL_PLUS', '5000'))
+    BACKEND_LOCAL_CATEGORIAS = int(os.getenv('BACKEND_LOCAL_CATEGORIAS', '50'))
+    BACKEND_LOCAL_SEMILLA = int(os.getenv('BACKEND_LOCAL_SEMILLA', '0'))
+    # Latencias inyectadas en segundos: al conectar, al ejecutar el SP y por cada fetchmany
+    BACKEND_LOCAL_LATENCIA_CONEXION = float(os.getenv('BACKEND_LOCAL_LATENCIA_CONEXION', '0'))
+    BACKEND_LOCAL_LATENCIA = float(os.getenv('BACKEND_LOCAL_LATENCIA', '0'))
+    BACKEND_LOCAL_LATENCIA_LOTE = float(os.getenv('BACKEND_LOCAL_LATENCIA_LOTE', '0'))
+    # SP simultáneos que acepta el servidor simulado (0 = sin límite)
+    BACKEND_LOCAL_CONCURRENCIA = int(os.getenv('BACKEND_LOCAL_CONCURRENCIA', '0'))
+    
+    # Filas por fetchmany al leer el stored procedure (0 = fetchall)
+    SP_TAMANO_LOTE = int(os.getenv('SP_TAMANO_LOTE', '5000'))
+    
+    # Excel en modo streaming (write-only con estilos con nombre) o clásico (pandas + formato por celda)
+    EXCEL_STREAMING = os.getenv('EXCEL_STREAMING', 'true').lower() in ('1', 'true', 'si', 'yes')
+    
+    # Ancho de columnas según contenido; por sobre el máximo de columnas solo se usan anchos mínimos
+    EXCEL_AUTOANCHO = os.getenv('EXCEL_AUTOANCHO', 'true').lower() in ('1', 'true', 'si', 'yes')
+    EXCEL_AUTOANCHO_MAX_COLUMNAS = int(os.getenv('EXCEL_AUTOANCHO_MAX_COLUMNAS', '300'))
+    
+    # Formato por defecto de los reportes: xlsx (con estilos), csv o parquet (sin estilos, para ETL)
+    FORMATO_REPORTE = os.getenv('FORMATO_REPORTE', 'xlsx').lower()
+    CSV_SEPARADOR = os.getenv('CSV_SEPARADOR', ',')
+    CSV_CODIFICACION = os.getenv('CSV_CODIFICACION', 'utf-8')
+    
+    # Admisión de reportes en el bot: generaciones simultáneas, solicitudes en curso por usuario
+    # y cola de espera; la duración inicial solo se usa para estimar la espera hasta medir reportes reales
+    ADMISION_MAX_CONCURRENTES = int(os.getenv('ADMISION_MAX_CONCURRENTES', str(REPORT_WORKERS)))
+    ADMISION_MAX_POR_USUARIO = int(os.getenv('ADMISION_MAX_POR_USUARIO', '1'))
+    ADMISION_MAX_COLA = int(os.getenv('ADMISION_MAX_COLA', '20'))
+    ADMISION_DURACION_INICIAL = float(os.getenv('ADMISION_DURACION_INICIAL', '60'))
+    
+    # Envío a Telegram (límite de 50 MB para bots): se comprime desde ENTREGA_COMPRIMIR_DESDE_MB si
+    # ahorra al menos ENTREGA_AHORRO_MINIMO, y sobre ENTREGA_LIMITE_MB el reporte se divide en partes
+    ENTREGA_LIMITE_MB = float(os.getenv('ENTREGA_LIMITE_MB', '49'))
+    ENTREGA_COMPRIMIR_DESDE_MB = float(os.getenv('ENTREGA_COMPRIMIR_DESDE_MB', '5'))
+    ENTREGA_AHORRO_MINIMO = float(os.getenv('ENTREGA_AHORRO_MINIMO', '0.15'))
+    
+    # Directorio de descargas: tope de tamaño total (MB) y días sin uso antes de desalojar (0 = sin límite);
+    # los archivos usados hace menos de ARCHIVOS_PROTECCION segundos no se desalojan
+    ARCHIVOS_MAX_MB = float(os.getenv('ARCHIVOS_MAX_MB', '2048'))
+    ARCHIVOS_MAX_DIAS = float(os.getenv('ARCHIVOS_MAX_DIAS', '7'))
+    ARCHIVOS_PROTECCION = int(os.getenv('ARCHIVOS_PROTECCION', '900'))
+    ARCHIVOS_INTERVALO_LIMPIEZA = int(os.getenv('ARCHIVOS_INTERVALO_LIMPIEZA', '1800'))
+    
+    # Vigencia en segundos de los file_id de Telegram reutilizados para contenido ya enviado (0 = no reutilizar)
+    ENVIOS_CACHE_TTL = int(os.getenv('ENVIOS_CACHE_TTL', str(30 * 24 * 3600)))
+    
+    # Segundos mínimos entre ediciones del mensaje de progreso (límite de ediciones de Telegram)
+    PROGRESO_INTERVALO = float(os.getenv('PROGRESO_INTERVALO', '2'))
+    
+    # Recepción de updates: 'polling' o 'webhook' (servidor HTTP local, normalmente detrás de un proxy con TLS)
+    MODO_SERVIDOR = os.getenv('MODO_SERVIDOR', 'polling').lower()
+    # URL pública que se registra en Telegram; se le agrega WEBHOOK_RUTA
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_ESCUCHAR = os.getenv('WEBHOOK_ESCUCHAR', '127.0.0.1')
+    WEBHOOK_PUERTO = int(os.getenv('WEBHOOK_PUERTO', '8443'))
+    WEBHOOK_RUTA = os.getenv('WEBHOOK_RUTA', 'telegram').strip('/')
+    # Telegram lo envía en X-Telegram-Bot-Api-Secret-Token; los POST sin él se rechazan con 403
+    WEBHOOK_SECRETO = os.getenv('WEBHOOK_SECRETO', '')
+    WEBHOOK_MAX_CONEXIONES = int(os.getenv('WEBHOOK_MAX_CONEXIONES', '40'))
+    
+    # API de bots: la oficial, un Bot API server propio o la falsa de cliente_telegram_falso.py
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+    
+    # Endpoint de métricas estilo Prometheus (/metrics); puerto 0 lo desactiva
+    METRICAS_HABILITADAS = os.getenv('METRICAS_HABILITADAS', 'true').lower() in ('1', 'true', 'si', 'yes')
+    METRICAS_HOST = os.getenv('METRICAS_HOST', '127.0.0.1')
+    METRICAS_PUERTO = int(os.getenv('METRICAS_PUERTO', '9108'))
+    
     @classmethod
     def validar(cls):
         errores = []
@@ -16,8 +132,61 @@ class Config:
         if not cls.TELEGRAM_BOT_TOKEN:
             errores.append("TELEGRAM_BOT_TOKEN no está configurado en .env")
         
+        if cls.REPORT_POOL not in ('thread', 'process'):
+            errores.append("REPORT_POOL debe ser 'thread' o 'process'")
+        
+        if cls.REPORT_WORKERS < 1:
+            errores.append("REPORT_WORKERS debe ser mayor o igual a 1")
+        
+        if cls.ADMISION_MAX_CONCURRENTES < 1 or cls.ADMISION_MAX_POR_USUARIO < 1 or cls.ADMISION_MAX_COLA < 0:
+            errores.append("ADMISION_MAX_CONCURRENTES y ADMISION_MAX_POR_USUARIO deben ser >= 1 y ADMISION_MAX_COLA >= 0")
+        
+        if cls.DB_POOL_MIN < 0 or cls.DB_POOL_MAX < 1 or cls.DB_POOL_MIN > cls.DB_POOL_MAX:
+            errores.append("DB_POOL_MIN y DB_POOL_MAX no son válidos (0 <= MIN <= MAX, MAX >= 1)")
+        
+        if cls.DB_BACKEND not in ('sqlserver', 'local'):
+            errores.append("DB_BACKEND debe ser 'sqlserver' o 'local'")
+        
+        if cls.FORMATO_REPORTE not in ('xlsx', 'csv', 'parquet'):
+            errores.append("FORMATO_REPORTE debe ser 'xlsx', 'csv' o 'parquet'")
+        
+        if cls.MODO_SERVIDOR not in ('polling', 'webhook'):
+            errores.append("MODO_SERVIDOR debe ser 'polling' o 'webhook'")
+        
+        if cls.MODO_SERVIDOR == 'webhook':
+            errores.extend(cls.errores_webhook())
+        
+        if cls.ALMACEN_FRESCO > cls.ALMACEN_MAX_ANTIGUEDAD:
+            errores.append("ALMACEN_FRESCO no puede ser mayor que ALMACEN_MAX_ANTIGUEDAD")
+        
         if errores:
             print("\n".join(errores))
             return False
         
-        return True
\ No newline at end of file
+        return True
+    
+    @classmethod
+    def errores_webhook(cls) -> list:
+        errores = []
+        
+        if not cls.WEBHOOK_URL:
+            errores.append("WEBHOOK_URL es obligatorio con MODO_SERVIDOR=webhook")
+        
+        # Telegram acepta de 1 a 256 caracteres A-Z, a-z, 0-9, _ y -
+        if not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', cls.WEBHOOK_SECRETO):
+            errores.append("WEBHOOK_SECRETO es obligatorio con MODO_SERVIDOR=webhook (1-256 caracteres A-Z, a-z, 0-9, _ o -)")
+        
+        return errores
+    
+    @classmethod
+    @contextmanager
+    def valores_temporales(cls, **valores):
+        """Sobrescribe atributos de Config dentro del bloque y restaura los originales al salir"""
+        originales = {nombre: getattr(cls, nombre) for nombre in valores}
+        try:
+            for nombre, valor in valores.items():
+                setattr(cls, nombre, valor)
+            yield cls
+        finally:
+            for nombre, valor in originales.items():
+                setattr(cls, nombre, valor)
@@ -0,0 +1,115 @@
+# datos_sinteticos.py
+import uuid
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cadenas_config import obtener_categorias_excluidas
+
+# Columnas con los nombres del resultado real del SP; identificar_columnas_sp las reconoce
+COLUMNAS_SP = [
+    'cdn_id', 'IDCanal', 'plu_id', 'plu_num_plu', 'plu_descripcion',
+    'IDCategoria', 'cat_descripcion', 'pr_pvp', 'pr_valor_neto',
+]
+
+NOMBRES_PRODUCTO = [
+    'HAMBURGUESA', 'PAPAS', 'GASEOSA', 'HELADO', 'CAFE', 'ENSALADA', 'POLLO', 'COMBO',
+    'JUGO', 'POSTRE', 'SANDUCHE', 'AGUA', 'TE', 'WRAP', 'SOPA', 'ALITAS',
+]
+
+def _guid(rng: np.random.Generator) -> str:
+    return str(uuid.UUID(bytes=rng.bytes(16))).upper()
+
+def generar_categorias(n_categorias: int, semilla: int = 0) -> pd.DataFrame:
+    """Categorías activas con el formato de la consulta de categorías (IDCategoria GUID)"""
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'IDCategoria': [_guid(rng) for _ in range(n_categorias)],
+        'cat_abreviatura': [f"C{numero:03d}" for numero in range(1, n_categorias + 1)],
+        'cat_descripcion': [f"CATEGORIA {numero:03d}" for numero in range(1, n_categorias + 1)],
+    }).sort_values('cat_descripcion', ignore_index=True)
+
+def generar_resultado_sp(
+    n_plus: int,
+    categorias_df: pd.DataFrame,
+    cdn_id: int = 12,
+    densidad: float = 0.3,
+    duplicados: float = 0.05,
+    invalidos: float = 0.01,
+    proporcion_excluidas: float = 0.02,
+    semilla: int = 0,
+    canales: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    DataFrame con la forma del resultado del SP de precios: una fila por (PLU, categoría)
+    con precio, más filas repetidas por PLU (otro canal u otro precio), precios nulos o
+    negativos y filas de las categorías excluidas de la cadena, en orden aleatorio.
+    Sin canales se usan 6 GUID aleatorios.
+    """
+    rng = np.random.default_rng(semilla)
+    
+    excluidas = obtener_categorias_excluidas(cdn_id)
+    cat_ids = np.array(list(categorias_df['IDCategoria']) + excluidas, dtype=object)
+    cat_descripciones = np.array(
+        list(categorias_df['cat_descripcion']) + [f"EXCLUIDA {numero}" for numero in range(len(excluidas))],
+        dtype=object
+    )
+    
+    # Celdas PLU x categoría con precio; las excluidas aparecen con menor frecuencia
+    probabilidades = np.full(len(cat_ids), densidad)
+    probabilidades[len(categorias_df):] = proporcion_excluidas
+    filas, columnas = np.nonzero(rng.random((n_plus, len(cat_ids))) < probabilidades)
+    
+    plu_nums = np.arange(1, n_plus + 1) * 10 + rng.integers(0, 10, n_plus)
+    precios_base = np.round(rng.uniform(0.5, 25.0, n_plus), 2)
+    precios = np.round(precios_base[filas] * rng.choice([0.9, 1.0, 1.0, 1.1, 1.25], len(filas)), 2)
+    
+    # Filas repetidas del mismo PLU y categoría, a veces con otro precio
+    repetidas = rng.random(len(filas)) < duplicados
+    filas = np.concatenate([filas, filas[repetidas]])
+    columnas = np.concatenate([columnas, columnas[repetidas]])
+    precios = np.concatenate([precios, np.round(precios[repetidas] * rng.choice([1.0, 1.05], int(repetidas.sum())), 2)])
+    
+    # Precios nulos o negativos que la matriz debe dejar en 0
+    marcas = rng.random(len(precios))
+    precios = np.where(marcas < invalidos / 2, np.nan, precios)
+    precios = np.where((marcas >= invalidos / 2) & (marcas < invalidos), -precios, precios)
+    
+    orden = rng.permutation(len(filas))
+    filas, columnas, precios = filas[orden], columnas[orden], precios[orden]
+    
+    nombres = np.array(NOMBRES_PRODUCTO, dtype=object)[plu_nums % len(NOMBRES_PRODUCTO)]
+    descripciones = pd.Series(nombres).str.cat(pd.Series(plu_nums).astype(str), sep=' ').to_numpy()
+    if canales is None:
+        canales = [_guid(rng) for _ in range(6)]
+    canales = np.array(canales, dtype=object)
+    
+    return pd.DataFrame({
+        'cdn_id': np.full(len(filas), cdn_id),
+        'IDCanal': canales[rng.integers(0, len(canales), len(filas))],
+        'plu_id': 100000 + filas,
+        'plu_num_plu': plu_nums[filas],
+        'plu_descripcion': descripciones[filas],
+        'IDCategoria': cat_ids[columnas],
+        'cat_descripcion': cat_descripciones[columnas],
+        'pr_pvp': precios,
+        'pr_valor_neto': np.round(precios / 1.15, 4),
+    }, columns=COLUMNAS_SP)
+
+def iterar_lotes(df: pd.DataFrame, tamano_lote: int) -> Iterator[pd.DataFrame]:
+    """Parte el resultado en lotes como los entrega fetchmany"""
+    if tamano_lote <= 0:
+        yield df
+        return
+    
+    for inicio in range(0, len(df), tamano_lote):
+        yield df.iloc[inicio:inicio + tamano_lote].reset_index(drop=True)
+
+def perturbar_precios(df_sp: pd.DataFrame, proporcion: float = 0.02, semilla: int = 1) -> pd.DataFrame:
+    """Copia del resultado con una parte de los precios cambiados y algunas filas quitadas (para deltas)"""
+    rng = np.random.default_rng(semilla)
+    df = df_sp.copy()
+    cambiar = rng.random(len(df)) < proporcion
+    df.loc[cambiar, 'pr_pvp'] = np.round(df.loc[cambiar, 'pr_pvp'] * 1.1, 2)
+    return df[rng.random(len(df)) >= proporcion / 2].reset_index(drop=True)
\ No newline at end of file
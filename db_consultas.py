@@ -1,33 +1,102 @@
 # db_consultas.py
-import pyodbc
 import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import logging
 import warnings
+import threading
+import time
+import decimal
 from datetime import datetime
 import os
 
 from cadenas_config import obtener_cdn_id, validar_cadena, obtener_categorias_excluidas
-from credenciales_manager import obtener_connection_string
+from backends_db import BackendDB, obtener_backend
+from config import Config
+from pool_conexiones import PoolConexiones
+from cache_categorias import obtener_cache_categorias
+from cache_reportes import CacheReportes, obtener_cache_reportes
+from almacen_archivos import obtener_almacen_archivos
+from exportadores import obtener_exportador
+from entrega import preparar_entrega
+from resultado_reporte import ResultadoReporte, calcular_hash_matriz
+from matriz_precios import AcumuladorMatriz
+from delta_precios import calcular_delta, cargar_snapshot_base, clave_snapshot, guardar_snapshot
+from almacen_precios import AlmacenPrecios, CAPTURA_FRESCA, CAPTURA_VENCIDA, obtener_almacen_precios
+from metricas import obtener_metricas
 
 warnings.filterwarnings('ignore')
 logger = logging.getLogger(__name__)
 
+SP_LISTADO_PRECIOS = "{CALL [config].[USP_administracionPrecios_listadoDePrecios] (?, ?, ?, ?)}"
+
+CANALES_POR_DEFECTO = [
+    "A457436C-84DE-E711-80D0-000D3A019254",
+    "9B4010B1-C839-E811-80D1-000D3A019254",
+    "0D049503-85CF-E511-80C6-000D3A3261F3",
+    "0E049503-85CF-E511-80C6-000D3A3261F3",
+    "0F049503-85CF-E511-80C6-000D3A3261F3",
+    "10049503-85CF-E511-80C6-000D3A3261F3"
+]
+
+_pool_conexiones = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def obtener_pool_conexiones(backend: BackendDB) -> PoolConexiones:
+    """Pool compartido por proceso; se crea con el primer backend recibido"""
+    global _pool_conexiones, _pool_pid
+    
+    with _pool_lock:
+        # Un worker creado con fork no debe reutilizar los sockets heredados del proceso padre
+        if _pool_conexiones is None or _pool_pid != os.getpid():
+            _pool_pid = os.getpid()
+            _pool_conexiones = PoolConexiones(
+                backend.conectar,
+                minimo=Config.DB_POOL_MIN,
+                maximo=Config.DB_POOL_MAX,
+                tiempo_inactividad=Config.DB_POOL_IDLE_TIMEOUT,
+                tiempo_espera=Config.DB_POOL_TIMEOUT,
+                consulta_salud=backend.consulta_salud
+            )
+            logger.info(
+                f"Pool de conexiones creado (backend={backend.nombre}, "
+                f"min={Config.DB_POOL_MIN}, max={Config.DB_POOL_MAX})"
+            )
+    
+    return _pool_conexiones
+
+def estadisticas_pool_conexiones() -> Optional[Dict[str, int]]:
+    """Estadísticas del pool de este proceso; None si todavía no se creó"""
+    with _pool_lock:
+        pool = _pool_conexiones if _pool_pid == os.getpid() else None
+    return pool.estadisticas() if pool is not None else None
+
+def cerrar_pool_conexiones():
+    global _pool_conexiones
+    
+    with _pool_lock:
+        if _pool_conexiones is not None:
+            _pool_conexiones.cerrar()
+            _pool_conexiones = None
+
 class ConsultasDB:
-    def __init__(self):
-        self.connection_string = obtener_connection_string()
+    def __init__(self, backend: BackendDB = None):
+        self.backend = backend or obtener_backend()
         self.conexion = None
-        if self.connection_string is None:
+        if not self.backend.configurado:
             logger.error("No se pudo obtener el connection string")
     
     def conectar(self) -> bool:
-        if self.connection_string is None:
+        if not self.backend.configurado:
             logger.error("Connection string no disponible")
             return False
         
+        if self.conexion is not None:
+            return True
+        
         try:
-            logger.info("Conectando a la base de datos...")
-            self.conexion = pyodbc.connect(self.connection_string)
+            logger.info("Obteniendo conexión del pool...")
+            self.conexion = obtener_pool_conexiones(self.backend).obtener()
             logger.info("Conexión exitosa a la base de datos")
             return True
         except Exception as e:
@@ -37,12 +106,31 @@ class ConsultasDB:
     def desconectar(self):
         if self.conexion:
             try:
-                self.conexion.close()
-                logger.info("Conexión cerrada")
+                obtener_pool_conexiones(self.backend).liberar(self.conexion)
+                logger.info("Conexión devuelta al pool")
             except Exception as e:
-                logger.warning(f"Error al cerrar conexión: {e}")
+                logger.warning(f"Error al devolver conexión al pool: {e}")
+            finally:
+                self.conexion = None
+    
+    def _aplicar_timeout(self):
+        # El timeout es por conexión (pyodbc y backend local): se fija antes de cada sentencia porque vienen del pool
+        try:
+            self.conexion.timeout = Config.QUERY_TIMEOUT
+        except Exception as e:
+            logger.warning(f"No se pudo aplicar el timeout de consulta: {e}")
     
     def obtener_categorias_por_cadena(self, cdn_id: int) -> Optional[pd.DataFrame]:
+        cache = obtener_cache_categorias()
+        if cache.habilitado:
+            categorias_cacheadas = cache.obtener(cdn_id)
+            if categorias_cacheadas is not None:
+                logger.info(f"Categorías obtenidas del cache para cdn_id: {cdn_id} ({len(categorias_cacheadas)})")
+                return categorias_cacheadas
+        
+        if not self.conectar():
+            return None
+        
         try:
             # Obtener categorías excluidas para esta cadena
             categorias_excluidas = obtener_categorias_excluidas(cdn_id)
@@ -56,6 +144,7 @@ class ConsultasDB:
             """
             
             logger.info(f"Ejecutando consulta de categorías para cdn_id: {cdn_id}")
+            self._aplicar_timeout()
             df = pd.read_sql(query, self.conexion, params=(cdn_id,))
             
             if df.empty:
@@ -69,6 +158,7 @@ class ConsultasDB:
                 df = df_filtrado
             
             logger.info(f"Se encontraron {len(df)} categorías (después de filtrar excluidas)")
+            cache.guardar(cdn_id, df)
             return df
             
         except Exception as e:
@@ -105,66 +195,121 @@ class ConsultasDB:
         logger.info(f"Columnas identificadas: {columnas_identificadas}")
         return columnas_identificadas
     
-    def ejecutar_stored_procedure_precios(
+    def _abrir_cursor_stored_procedure(
         self,
         cdn_id: int,
         categorias_df: pd.DataFrame,
         canal_param: str = 'Canal',
         canal_ids: Optional[List[str]] = None
-    ) -> Optional[pd.DataFrame]:
-        cursor = None
+    ):
+        """Ejecuta el SP y devuelve el cursor posicionado en el primer result set con columnas"""
+        # Convertir categorías a lista de IDs
+        categorias = categorias_df['IDCategoria'].tolist()
+        categorias_str = ','.join(categorias)
+        
+        # Configurar canal_ids por defecto si no se proporcionan
+        canales = CANALES_POR_DEFECTO if canal_ids is None else canal_ids
+        canal_ids_str = ','.join(canales)
+        
+        # Parámetros enlazados: el driver invoca el SP por RPC y SQL Server reutiliza su plan
+        parametros = (cdn_id, categorias_str, canal_param, canal_ids_str)
+        
+        logger.info(
+            f"Ejecutando stored procedure para cdn_id: {cdn_id} "
+            f"({len(categorias)} categorías, {len(canales)} canales, timeout {Config.QUERY_TIMEOUT}s)"
+        )
+        logger.debug(f"Parámetros del stored procedure: {parametros}")
+        
+        self._aplicar_timeout()
+        cursor = self.conexion.cursor()
         try:
-            # Convertir categorías a lista de IDs
-            categorias = categorias_df['IDCategoria'].tolist()
-            categorias_str = ','.join(categorias)
-
-            
-            # Configurar canal_ids por defecto si no se proporcionan
-            if canal_ids is None:
-                canal_ids_str = (
-    "A457436C-84DE-E711-80D0-000D3A019254,"
-    "9B4010B1-C839-E811-80D1-000D3A019254,"
-    "0D049503-85CF-E511-80C6-000D3A3261F3,"
-    "0E049503-85CF-E511-80C6-000D3A3261F3,"
-    "0F049503-85CF-E511-80C6-000D3A3261F3,"
-    "10049503-85CF-E511-80C6-000D3A3261F3"
-)
-            else:
-                canal_ids_str = ','.join([f"'{canal}'" for canal in canal_ids])
-            
-            # Construir query del stored procedure
-            query = f"""
-            EXEC [config].[USP_administracionPrecios_listadoDePrecios] 
-                {cdn_id}, 
-                '{categorias_str}', 
-                '{canal_param}', 
-                '{canal_ids_str}'
-            """
-            
-            logger.info(f"Ejecutando stored procedure para cdn_id: {cdn_id}")
-            logger.info(f"Query: {query[:200]}...")  # Log parcial para debugging
-            
-            cursor = self.conexion.cursor()
-            cursor.execute(query)
+            cursor.execute(SP_LISTADO_PRECIOS, parametros)
             
             # Manejar múltiples result sets si es necesario
             try:
-                while cursor.description is None:
-                    cursor.nextset()
-            except pyodbc.ProgrammingError:
+                while cursor.description is None and cursor.nextset():
+                    pass
+            except self.backend.ErrorProgramacion:
                 pass
+        except Exception:
+            cursor.close()
+            raise
+        
+        if cursor.description is None:
+            logger.warning("El stored procedure no devolvió resultados")
+            cursor.close()
+            return None
+        
+        return cursor
+    
+    @staticmethod
+    def _lote_a_dataframe(filas: list, columnas: List[str], tipos: list) -> pd.DataFrame:
+        """Pasa un lote de filas a buffers por columna, tipando las numéricas según cursor.description"""
+        buffers = list(zip(*filas)) if filas else [() for _ in columnas]
+        datos = {}
+        
+        for posicion, (buffer, tipo) in enumerate(zip(buffers, tipos)):
+            serie = pd.Series(buffer, dtype=object)
+            if tipo in (int, float, decimal.Decimal):
+                serie = pd.to_numeric(serie, errors='coerce')
+            datos[posicion] = serie
+        
+        lote = pd.DataFrame(datos)
+        lote.columns = columnas
+        return lote
+    
+    def iterar_stored_procedure_precios(
+        self,
+        cdn_id: int,
+        categorias_df: pd.DataFrame,
+        canal_param: str = 'Canal',
+        canal_ids: Optional[List[str]] = None,
+        tamano_lote: int = None
+    ) -> Iterator[pd.DataFrame]:
+        """Entrega el resultado del SP en lotes de fetchmany; tamano_lote <= 0 lee todo de una vez"""
+        if tamano_lote is None:
+            tamano_lote = Config.SP_TAMANO_LOTE
+        
+        try:
+            cursor = self._abrir_cursor_stored_procedure(cdn_id, categorias_df, canal_param, canal_ids)
+            if cursor is None:
+                return
             
-            if cursor.description is None:
-                logger.warning("El stored procedure no devolvió resultados")
+            try:
+                columnas = [col[0] for col in cursor.description]
+                tipos = [col[1] for col in cursor.description]
+                
+                if tamano_lote <= 0:
+                    yield self._lote_a_dataframe(cursor.fetchall(), columnas, tipos)
+                    return
+                
+                while True:
+                    filas = cursor.fetchmany(tamano_lote)
+                    if not filas:
+                        break
+                    yield self._lote_a_dataframe(filas, columnas, tipos)
+            finally:
                 cursor.close()
+                
+        except self.backend.Error as e:
+            logger.error(f"Error SQL al ejecutar stored procedure:")
+            logger.error(f"Código de error: {e.args[0] if e.args else 'N/A'}")
+            logger.error(f"Mensaje: {e.args[1] if len(e.args) > 1 else str(e)}")
+            raise
+    
+    def ejecutar_stored_procedure_precios(
+        self,
+        cdn_id: int,
+        categorias_df: pd.DataFrame,
+        canal_param: str = 'Canal',
+        canal_ids: Optional[List[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        try:
+            lotes = list(self.iterar_stored_procedure_precios(cdn_id, categorias_df, canal_param, canal_ids))
+            if not lotes:
                 return None
             
-            # Obtener datos
-            columnas = [col[0] for col in cursor.description]
-            datos = cursor.fetchall()
-            cursor.close()
-            
-            df = pd.DataFrame.from_records(datos, columns=columnas)
+            df = pd.concat(lotes, ignore_index=True) if len(lotes) > 1 else lotes[0]
             
             if df.empty:
                 logger.warning("El stored procedure no devolvió datos")
@@ -175,12 +320,7 @@ class ConsultasDB:
             
             return df
             
-        except pyodbc.Error as e:
-            logger.error(f"Error SQL al ejecutar stored procedure:")
-            logger.error(f"Código de error: {e.args[0] if e.args else 'N/A'}")
-            logger.error(f"Mensaje: {e.args[1] if len(e.args) > 1 else str(e)}")
-            if cursor:
-                cursor.close()
+        except self.backend.Error:
             return None
             
         except Exception as e:
@@ -188,28 +328,118 @@ class ConsultasDB:
             logger.error(f"Detalles: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-            if cursor:
-                cursor.close()
             return None
     
+    def _mapear_columnas_sp(self, df: pd.DataFrame) -> Optional[Dict[str, str]]:
+        # Identificar columnas del SP
+        columnas_sp = self.identificar_columnas_sp(df)
+        
+        # Verificar que tenemos las columnas necesarias
+        columnas_necesarias = ['plu_id', 'descripcion', 'pvp', 'categoria_id']
+        columnas_faltantes = [col for col in columnas_necesarias if col not in columnas_sp]
+        
+        if columnas_faltantes:
+            logger.error(f"Faltan columnas necesarias: {columnas_faltantes}")
+            logger.error(f"Columnas disponibles: {list(df.columns)}")
+            return None
+        
+        logger.info(f"Columnas mapeadas:")
+        logger.info(f"  PLU_NUM: {columnas_sp.get('plu_num', columnas_sp['plu_id'])}")
+        logger.info(f"  PLU_ID: {columnas_sp['plu_id']}")
+        logger.info(f"  DESCRIPCION: {columnas_sp['descripcion']}")
+        logger.info(f"  PVP: {columnas_sp['pvp']}")
+        logger.info(f"  CATEGORIA_ID: {columnas_sp['categoria_id']}")
+        
+        return columnas_sp
+    
+    def acumular_lotes_precios(
+        self,
+        lotes: Iterable[pd.DataFrame],
+        cdn_id: int = None,
+        progreso: Optional[Callable[[str, Dict], None]] = None
+    ) -> Optional[AcumuladorMatriz]:
+        """Consume los lotes del SP reduciendo cada uno al primer precio por (PLU, categoría)"""
+        acumulador = None
+        
+        for lote in lotes:
+            if acumulador is None:
+                columnas_sp = self._mapear_columnas_sp(lote)
+                if columnas_sp is None:
+                    if hasattr(lotes, 'close'):
+                        lotes.close()
+                    return None
+                acumulador = AcumuladorMatriz(columnas_sp, cdn_id)
+            
+            acumulador.agregar(lote)
+            self._notificar_progreso(progreso, 'filas_obtenidas', registros=acumulador.registros, lotes=acumulador.lotes)
+        
+        return acumulador
+    
+    def construir_matriz_precios(
+        self,
+        df: pd.DataFrame,
+        categorias_df: pd.DataFrame,
+        cdn_id: int = None
+    ) -> Optional[pd.DataFrame]:
+        """Construye la matriz PLU x categoría con un único pivot sobre los datos del SP"""
+        acumulador = self.acumular_lotes_precios([df], cdn_id)
+        if acumulador is None:
+            return None
+        
+        return acumulador.construir(categorias_df)
+    
     def generar_archivo_excel(
         self,
         df: pd.DataFrame,
         categorias_df: pd.DataFrame,
         nombre_cadena: str,
         cdn_id: int = None,
-        ruta_salida: str = None
+        ruta_salida: str = None,
+        formato: str = None
     ) -> Optional[str]:
         try:
-            import os
-            from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-            from openpyxl.utils import get_column_letter
-            import numpy as np
+            logger.info(f"Datos recibidos del SP: {len(df)} filas, {len(df.columns)} columnas")
+            logger.info(f"Columnas disponibles: {list(df.columns)}")
+            
+            # Construir matriz de precios (PLU x categoría)
+            df_final = self.construir_matriz_precios(df, categorias_df, cdn_id)
+            if df_final is None:
+                return None
+            
+            return self.escribir_matriz(df_final, nombre_cadena, ruta_salida, formato=formato)
             
-            # Si no se proporciona ruta, usar directorio actual del script
+        except Exception as e:
+            logger.error(f"Error al generar archivo Excel: {e}")
+            import traceback
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return None
+    
+    def escribir_matriz_excel(
+        self,
+        df_final: pd.DataFrame,
+        nombre_cadena: str,
+        ruta_salida: str = None,
+        prefijo: str = 'Precios_Plu'
+    ) -> Optional[str]:
+        return self.escribir_matriz(df_final, nombre_cadena, ruta_salida, prefijo, formato='xlsx')
+    
+    def escribir_matriz(
+        self,
+        df_final: pd.DataFrame,
+        nombre_cadena: str,
+        ruta_salida: str = None,
+        prefijo: str = 'Precios_Plu',
+        formato: str = None,
+        progreso: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[str]:
+        """Escribe la matriz con el exportador del formato pedido (xlsx, csv, parquet)"""
+        try:
+            exportador = obtener_exportador(formato)
+            
+            # Si no se proporciona ruta, usar el directorio de descargas administrado
+            almacen_archivos = obtener_almacen_archivos()
             if ruta_salida is None:
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                ruta_salida = os.path.join(script_dir, "descargas")
+                ruta_salida = almacen_archivos.directorio
             
             # Convertir a ruta absoluta para evitar problemas
             ruta_salida = os.path.abspath(ruta_salida)
@@ -220,300 +450,334 @@ class ConsultasDB:
             # Generar nombre de archivo con timestamp único para evitar conflictos
             fecha = datetime.now()
             timestamp = fecha.strftime("%Y%m%d_%H%M%S")
-            nombre_archivo = f"Precios_Plu_{nombre_cadena.replace(' ', '_')}_{timestamp}.xlsx"
+            nombre_archivo = f"{prefijo}_{nombre_cadena.replace(' ', '_')}_{timestamp}{exportador.extension}"
             ruta_completa = os.path.join(ruta_salida, nombre_archivo)
             
-            logger.info(f"Generando archivo Excel: {nombre_archivo}")
-            logger.info(f"Datos recibidos del SP: {len(df)} filas, {len(df.columns)} columnas")
-            logger.info(f"Columnas disponibles: {list(df.columns)}")
-            
-            # Identificar columnas del SP
-            columnas_sp = self.identificar_columnas_sp(df)
+            logger.info(f"Generando archivo {exportador.descripcion}: {nombre_archivo}")
             
-            # Verificar que tenemos las columnas necesarias
-            columnas_necesarias = ['plu_id', 'descripcion', 'pvp', 'categoria_id']
-            columnas_faltantes = [col for col in columnas_necesarias if col not in columnas_sp]
+            # Se escribe en un temporal y se publica con os.replace: un archivo del mismo nombre
+            # que se esté subiendo conserva su contenido hasta cerrarse
+            with almacen_archivos.escritura_atomica(ruta_completa) as ruta_temporal:
+                exportador.escribir(df_final, ruta_temporal, progreso=progreso)
             
-            if columnas_faltantes:
-                logger.error(f"Faltan columnas necesarias: {columnas_faltantes}")
-                logger.error(f"Columnas disponibles: {list(df.columns)}")
-                return None
-            
-            plu_id_col = columnas_sp['plu_id']
-            descripcion_col = columnas_sp['descripcion']
-            pvp_col = columnas_sp['pvp']
-            categoria_id_col = columnas_sp['categoria_id']
-            plu_num_col = columnas_sp.get('plu_num', plu_id_col)  # Usar PLU_ID si no hay PLU_NUM
-            
-            logger.info(f"Columnas mapeadas:")
-            logger.info(f"  PLU_NUM: {plu_num_col}")
-            logger.info(f"  PLU_ID: {plu_id_col}")
-            logger.info(f"  DESCRIPCION: {descripcion_col}")
-            logger.info(f"  PVP: {pvp_col}")
-            logger.info(f"  CATEGORIA_ID: {categoria_id_col}")
-            
-            # Limpiar datos
-            df_limpio = df.copy()
-            
-            # Convertir todas las columnas a sus tipos correctos
-            df_limpio[plu_id_col] = df_limpio[plu_id_col].astype(str).str.strip().str.upper()
-            df_limpio[categoria_id_col] = df_limpio[categoria_id_col].astype(str).str.strip().str.upper()
-            df_limpio[pvp_col] = pd.to_numeric(df_limpio[pvp_col], errors='coerce').fillna(0.0)
-            
-            # Filtrar datos de categorías excluidas
-            if cdn_id:
-                categorias_excluidas = obtener_categorias_excluidas(cdn_id)
-                if categorias_excluidas:
-                    registros_originales = len(df_limpio)
-                    df_limpio = df_limpio[~df_limpio[categoria_id_col].isin(categorias_excluidas)]
-                    logger.info(f"Filtrados {registros_originales - len(df_limpio)} registros de categorías excluidas")
-            
-            # Log de muestra de datos
-            logger.info(f"Muestra de datos limpios (primeras 3 filas):")
-            logger.info(f"{df_limpio[[plu_num_col, plu_id_col, categoria_id_col, pvp_col]].head(3)}")
-            
-            # Obtener lista única de productos (sin categoría)
-            columnas_producto = [plu_num_col, plu_id_col, descripcion_col]
-            productos_unicos = df_limpio[columnas_producto].drop_duplicates(subset=[plu_id_col]).sort_values(plu_num_col).reset_index(drop=True)
-            
-            logger.info(f"Total de productos únicos: {len(productos_unicos)}")
-            
-            # Crear DataFrame final con columnas básicas
-            df_final = pd.DataFrame()
-            df_final['#PLU_NUM_PLU'] = productos_unicos[plu_num_col]
-            df_final['#PLU'] = productos_unicos[plu_id_col]
-            df_final['PRODUCTO'] = productos_unicos[descripcion_col]
-            
-            # Para cada categoría, crear columna con precios
-            logger.info(f"Procesando {len(categorias_df)} categorías...")
-            
-            for idx_cat, cat_row in categorias_df.iterrows():
-                cat_id = str(cat_row['IDCategoria']).strip().upper()
-                cat_nombre = cat_row['cat_descripcion']
-                nombre_columna = f"{cat_nombre}|{cat_id}"
-                
-                logger.info(f"Procesando categoría: {cat_nombre} (ID: {cat_id})")
-                
-                # Filtrar datos SOLO de esta categoría específica
-                mascara_categoria = df_limpio[categoria_id_col] == cat_id
-                datos_categoria = df_limpio[mascara_categoria].copy()
-                
-                logger.info(f"  Registros encontrados para esta categoría: {len(datos_categoria)}")
-                
-                # Crear columna de precios para esta categoría
-                columna_precios = []
-                
-                for plu_final in df_final['#PLU']:
-                    plu_key = str(plu_final).strip().upper()
-                    
-                    # Buscar este PLU específico en los datos de esta categoría específica
-                    mascara_plu = datos_categoria[plu_id_col] == plu_key
-                    filas_plu_en_categoria = datos_categoria[mascara_plu]
-                    
-                    if len(filas_plu_en_categoria) > 0:
-                        # Este PLU existe en esta categoría
-                        # Tomar el primer precio encontrado
-                        precio_value = filas_plu_en_categoria.iloc[0][pvp_col]
-                        
-                        # Si es nulo, NaN o None, usar 0.0
-                        if pd.isna(precio_value) or precio_value is None:
-                            precio = 0.0
-                        else:
-                            try:
-                                precio = float(precio_value)
-                                precio = max(0.0, precio)  # No negativos
-                            except (ValueError, TypeError):
-                                precio = 0.0
-                    else:
-                        # Este PLU NO existe en esta categoría
-                        precio = 0.0
-                    
-                    columna_precios.append(precio)
-                
-                df_final[nombre_columna] = columna_precios
-                
-                # Log de verificación
-                precios_no_cero = sum(1 for p in columna_precios if p > 0)
-                logger.info(f"  Productos con precio > 0 en columna final: {precios_no_cero}")
-            
-            # Asegurar formato numérico en todas las columnas de precios
-            for col in df_final.columns:
-                if '|' in col:  # Es una columna de categoría
-                    df_final[col] = pd.to_numeric(df_final[col], errors='coerce').fillna(0.0)
-            
-            logger.info(f"DataFrame final creado: {len(df_final)} filas x {len(df_final.columns)} columnas")
-            
-            # Verificar si el archivo existe y está abierto, intentar eliminarlo
-            if os.path.exists(ruta_completa):
-                try:
-                    os.remove(ruta_completa)
-                    logger.info(f"Archivo existente eliminado: {ruta_completa}")
-                except Exception as e:
-                    logger.warning(f"No se pudo eliminar archivo existente: {e}")
-                    # Agregar timestamp adicional si no se puede eliminar
-                    import time
-                    timestamp_extra = int(time.time())
-                    nombre_archivo = f"Precios_Plu_{nombre_cadena.replace(' ', '_')}_{timestamp}_{timestamp_extra}.xlsx"
-                    ruta_completa = os.path.join(ruta_salida, nombre_archivo)
-                    logger.info(f"Usando nuevo nombre de archivo: {nombre_archivo}")
-            
-            # Crear archivo Excel con formato
-            with pd.ExcelWriter(ruta_completa, engine='openpyxl') as writer:
-                df_final.to_excel(writer, index=False, sheet_name='Precios')
-                worksheet = writer.sheets['Precios']
-                
-                # Definir estilos
-                header_font = Font(name='Calibri', bold=True, size=11, color='FFFFFF')
-                header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-                header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                
-                data_font = Font(name='Calibri', size=10)
-                text_alignment = Alignment(horizontal='left', vertical='center')
-                number_alignment = Alignment(horizontal='right', vertical='center')
-                
-                thin_border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-                
-                # Aplicar formato a encabezados
-                for col_num, column_title in enumerate(df_final.columns, 1):
-                    cell = worksheet.cell(row=1, column=col_num)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-                    cell.border = thin_border
-                    
-                    # Ajustar ancho de columnas
-                    column_letter = get_column_letter(col_num)
-                    max_length = 0
-                    
-                    # Encontrar longitud máxima en la columna
-                    for cell_in_col in worksheet[column_letter]:
-                        try:
-                            if len(str(cell_in_col.value)) > max_length:
-                                max_length = len(str(cell_in_col.value))
-                        except:
-                            pass
-                    
-                    # Establecer ancho basado en el contenido
-                    adjusted_width = min(max_length + 2, 50)
-                    
-                    # Anchos especiales para columnas específicas
-                    if column_title in ['#PLU_NUM_PLU', '#PLU']:
-                        adjusted_width = max(12, adjusted_width)
-                    elif column_title == 'PRODUCTO':
-                        adjusted_width = max(40, adjusted_width)
-                    else:
-                        # Para columnas dinámicas (cat_descripcion|cat_id)
-                        adjusted_width = max(15, adjusted_width)
-                    
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # Aplicar formato a datos
-                total_filas = len(df_final)
-                for row_num in range(2, total_filas + 2):
-                    for col_num in range(1, len(df_final.columns) + 1):
-                        cell = worksheet.cell(row=row_num, column=col_num)
-                        cell.border = thin_border
-                        
-                        # Determinar alineación basada en tipo de columna
-                        column_title = df_final.columns[col_num - 1]
-                        
-                        if column_title in ['PRODUCTO']:
-                            cell.alignment = text_alignment
-                            cell.font = data_font
-                        elif column_title in ['#PLU_NUM_PLU', '#PLU']:
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                            cell.font = data_font
-                        else:  # Columnas de precios
-                            cell.alignment = number_alignment
-                            cell.font = data_font
-                            cell.number_format = '#,##0.00'
-                
-                # Aplicar filtros automáticos
-                worksheet.auto_filter.ref = worksheet.dimensions
-                
-                # Congelar paneles (encabezados y primeras 3 columnas)
-                worksheet.freeze_panes = 'D2'
-                
-                # Autoajustar altura de filas
-                for row in worksheet.iter_rows(min_row=1, max_row=total_filas + 1):
-                    worksheet.row_dimensions[row[0].row].height = 20
-            
-            logger.info(f"Archivo Excel generado exitosamente: {ruta_completa}")
+            logger.info(f"Archivo {exportador.descripcion} generado exitosamente: {ruta_completa}")
             logger.info(f"Tamaño del archivo: {os.path.getsize(ruta_completa) / 1024:.2f} KB")
             
             return ruta_completa
             
         except Exception as e:
-            logger.error(f"Error al generar archivo Excel: {e}")
+            logger.error(f"Error al generar archivo {formato or Config.FORMATO_REPORTE}: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
     
+    def _captura_almacen(
+        self,
+        almacen: AlmacenPrecios,
+        clave: str,
+        refrescar: Callable[[], bool],
+        forzar: bool = False
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Captura local que puede servirse según su antigüedad; sin captura hay que consultar el SP.
+        El segundo valor indica si la consulta al SP de la clave quedó reservada para este worker.
+        """
+        if not almacen.habilitado:
+            return None, False
+        
+        if forzar:
+            return None, almacen.tomar_refresco(clave)
+        
+        captura = almacen.captura(clave)
+        estado = almacen.estado_captura(captura)
+        
+        if estado == CAPTURA_FRESCA:
+            return captura, False
+        
+        if estado != CAPTURA_VENCIDA:
+            refrescar()
+            return captura, False
+        
+        # Vencida o inexistente: si otro worker ya consulta el SP para la misma clave, esperar su captura
+        if almacen.tomar_refresco(clave):
+            return None, True
+        
+        logger.info("Consulta al SP en curso para la misma cadena, esperando su resultado...")
+        if almacen.esperar_refresco(clave):
+            captura = almacen.captura(clave)
+            if almacen.estado_captura(captura) != CAPTURA_VENCIDA:
+                return captura, False
+        
+        return None, almacen.tomar_refresco(clave)
+    
+    def _notificar_progreso(self, progreso: Optional[Callable], paso: str, **datos):
+        if progreso is None:
+            return
+        try:
+            progreso(paso, datos)
+        except Exception as e:
+            logger.warning(f"Error en callback de progreso ({paso}): {e}")
+    
     def proceso_completo(
         self,
         nombre_cadena: str,
         canal_param: str = 'Canal',
-        canal_ids: Optional[List[str]] = None
-    ) -> Optional[str]:
+        canal_ids: Optional[List[str]] = None,
+        progreso: Optional[Callable[[str, Dict], None]] = None,
+        forzar: bool = False,
+        vigencia_cache: Optional[float] = None,
+        delta: bool = False,
+        formato: Optional[str] = None,
+        para_envio: bool = False
+    ) -> Optional[ResultadoReporte]:
+        """
+        Genera el reporte de precios de la cadena en el formato pedido (por defecto
+        Config.FORMATO_REPORTE). Con delta=True entrega solo las celdas PLU x categoría
+        que cambiaron respecto al snapshot de un día anterior; si no hay snapshot previo
+        se entrega el reporte completo.
+        
+        Con para_envio=True también prepara los archivos a subir a Telegram (entrega.py):
+        comprimidos si conviene y en partes por grupos de categorías si superan el límite.
+        
+        progreso(paso, datos) recibe los eventos de avance: categorias, filas_obtenidas (por lote),
+        precios, categorias_procesadas, filas_escritas (durante la escritura) y archivo.
+        """
+        tiempos = {}
+        resultado = self._generar_reporte(
+            tiempos, nombre_cadena, canal_param, canal_ids, progreso, forzar, vigencia_cache, delta, formato, para_envio
+        )
+        
+        # Las métricas se registran en el proceso que genera: cubre el bot, lote_reportes y el precalentamiento
+        metricas = obtener_metricas()
+        if resultado is None:
+            # Las etapas alcanzadas hasta el error también se miden
+            metricas.registrar_etapas(nombre_cadena, tiempos)
+            metricas.registrar_fallo(nombre_cadena, 'generacion')
+        elif not resultado.desde_cache:
+            metricas.registrar_etapas(nombre_cadena, resultado.tiempos)
+        return resultado
+    
+    def _generar_reporte(
+        self,
+        tiempos: Dict[str, float],
+        nombre_cadena: str,
+        canal_param: str,
+        canal_ids: Optional[List[str]],
+        progreso: Optional[Callable[[str, Dict], None]],
+        forzar: bool,
+        vigencia_cache: Optional[float],
+        delta: bool,
+        formato: Optional[str],
+        para_envio: bool
+    ) -> Optional[ResultadoReporte]:
         logger.info("="*60)
         logger.info(f"INICIANDO PROCESO COMPLETO PARA: {nombre_cadena}")
         logger.info("="*60)
         
+        inicio_proceso = time.perf_counter()
+        
         try:
             # Validar cadena
             if not validar_cadena(nombre_cadena):
                 logger.error(f"Cadena no válida: {nombre_cadena}")
                 return None
             
+            formato = obtener_exportador(formato).formato
+            
             # Obtener ID de cadena
             cdn_id = obtener_cdn_id(nombre_cadena)
             logger.info(f"PASO 1: cdn_id obtenido: {cdn_id}")
             
-            # Conectar a BD
-            if not self.conectar():
-                logger.error("No se pudo establecer conexión a la base de datos")
-                return None
-            
-            # Obtener categorías
+            # Obtener categorías (solo conecta a BD si no están en cache)
             logger.info("PASO 2: Consultando categorías...")
+            inicio = time.perf_counter()
             categorias_df = self.obtener_categorias_por_cadena(cdn_id)
+            tiempos['categorias'] = time.perf_counter() - inicio
             if categorias_df is None or len(categorias_df) == 0:
                 logger.error("PASO 2: No se pudieron obtener categorías")
                 self.desconectar()
                 return None
             logger.info(f"PASO 2: {len(categorias_df)} categorías obtenidas")
+            self._notificar_progreso(progreso, 'categorias', total=len(categorias_df))
             
-            # Ejecutar stored procedure
-            logger.info("PASO 3: Ejecutando stored procedure...")
-            df_precios = self.ejecutar_stored_procedure_precios(
-                cdn_id, categorias_df, canal_param, canal_ids
+            # Reutilizar un reporte reciente con los mismos canales y categorías
+            cache_reportes = obtener_cache_reportes()
+            clave_reporte = CacheReportes.clave(
+                cdn_id, canal_param, canal_ids, categorias_df['IDCategoria'],
+                variante='cambios' if delta else 'completo', formato=formato
             )
-            if df_precios is None or df_precios.empty:
+            if cache_reportes.habilitado and not forzar:
+                reporte_cacheado = cache_reportes.obtener(clave_reporte)
+                if reporte_cacheado is not None:
+                    try:
+                        resultado = ResultadoReporte.desde_dict(reporte_cacheado)
+                        resultado.desde_cache = True
+                        entrega_vigente = resultado.entrega and all(
+                            os.path.exists(archivo['ruta']) for archivo in resultado.entrega
+                        )
+                        if para_envio and not entrega_vigente:
+                            # Generado sin preparar el envío (p. ej. por lote) o con el zip ya desalojado: sin la matriz solo se puede comprimir
+                            inicio = time.perf_counter()
+                            resultado.entrega = [archivo.a_dict() for archivo in preparar_entrega(resultado.ruta)]
+                            tiempos['entrega'] = time.perf_counter() - inicio
+                            # Queda en la entrada: la próxima solicitud no vuelve a intentar el zip (ni lo rehace si no conviene)
+                            cache_reportes.actualizar(clave_reporte, resultado.ruta, entrega=resultado.entrega)
+                        resultado.tiempos = {**tiempos, 'total': time.perf_counter() - inicio_proceso}
+                        obtener_almacen_archivos().tocar(
+                            resultado.ruta, *(archivo['ruta'] for archivo in resultado.entrega)
+                        )
+                        logger.info(f"Reporte servido desde cache: {resultado.ruta}")
+                        return resultado
+                    except TypeError as e:
+                        logger.warning(f"Entrada de cache incompleta, se regenera el reporte: {e}")
+            
+            # Datos de precios: del almacén local si su antigüedad lo permite, si no del SP
+            almacen = obtener_almacen_precios()
+            clave_almacen = AlmacenPrecios.clave(cdn_id, canal_param, canal_ids, categorias_df['IDCategoria'])
+            datos_captura = {
+                'cdn_id': cdn_id,
+                'canal_param': canal_param,
+                'canales': ','.join(CANALES_POR_DEFECTO if canal_ids is None else canal_ids),
+                'categorias': ','.join(categorias_df['IDCategoria']),
+            }
+            
+            def refrescar_en_segundo_plano() -> bool:
+                return almacen.refrescar_en_segundo_plano(
+                    clave_almacen,
+                    lambda: _lotes_stored_procedure(cdn_id, categorias_df, canal_param, canal_ids),
+                    self._mapear_columnas_sp,
+                    **datos_captura
+                )
+            
+            captura, reservado = self._captura_almacen(almacen, clave_almacen, refrescar_en_segundo_plano, forzar)
+            
+            inicio = time.perf_counter()
+            if captura is not None:
+                logger.info(f"PASO 3: Leyendo precios del almacén local (capturados hace {time.time() - captura['capturado_en']:.0f}s)...")
+                origen_datos, datos_capturados_en = 'almacen', captura['capturado_en']
+                lotes = almacen.iterar_lotes(captura['id'])
+            else:
+                # Conectar a BD
+                if not self.conectar():
+                    logger.error("No se pudo establecer conexión a la base de datos")
+                    if reservado:
+                        almacen.liberar_refresco(clave_almacen)
+                    return None
+                
+                # Ejecutar stored procedure: los lotes se reducen a medida que llegan
+                logger.info("PASO 3: Ejecutando stored procedure...")
+                origen_datos, datos_capturados_en = 'sql', time.time()
+                lotes = self.iterar_stored_procedure_precios(cdn_id, categorias_df, canal_param, canal_ids)
+                if almacen.habilitado:
+                    lotes = almacen.registrar_lotes(
+                        clave_almacen, lotes, self._mapear_columnas_sp, reservado=reservado, **datos_captura
+                    )
+            
+            acumulador = self.acumular_lotes_precios(lotes, cdn_id, progreso)
+            tiempos['stored_procedure' if origen_datos == 'sql' else 'almacen'] = time.perf_counter() - inicio
+            if acumulador is None or acumulador.registros == 0:
                 logger.error("PASO 3: No se obtuvieron datos de precios")
                 self.desconectar()
                 return None
-            logger.info(f"PASO 3: Datos obtenidos: {len(df_precios)} registros")
+            logger.info(f"PASO 3: Datos obtenidos: {acumulador.registros} registros en {acumulador.lotes} lotes")
+            self._notificar_progreso(progreso, 'precios', registros=acumulador.registros)
+            
+            # La conexión ya no se necesita: liberarla antes de las etapas en memoria
+            self.desconectar()
             
             # Generar archivo Excel
-            logger.info("PASO 4: Generando archivo Excel...")
-            ruta_archivo = self.generar_archivo_excel(df_precios, categorias_df, nombre_cadena, cdn_id)
+            logger.info(f"PASO 4: Generando archivo {formato}...")
+            inicio = time.perf_counter()
+            df_final = acumulador.construir(categorias_df)
+            tiempos['matriz'] = time.perf_counter() - inicio
+            self._notificar_progreso(
+                progreso, 'categorias_procesadas', categorias=len(categorias_df), productos=len(df_final)
+            )
+            
+            # El delta compara contra el snapshot de un día anterior con los mismos canales y categorías
+            clave_matriz = clave_snapshot(cdn_id, canal_param, canal_ids, categorias_df['IDCategoria'])
+            snapshot_base = cargar_snapshot_base(clave_matriz) if delta else None
+            
+            df_salida, tipo, base_cambios = df_final, 'completo', None
+            if snapshot_base is not None:
+                inicio = time.perf_counter()
+                matriz_anterior, fecha_base = snapshot_base
+                df_salida = calcular_delta(matriz_anterior, df_final)
+                tipo, base_cambios = 'cambios', fecha_base.timestamp()
+                tiempos['delta'] = time.perf_counter() - inicio
+            elif delta:
+                logger.warning(f"Sin snapshot anterior para {nombre_cadena}: se entrega el reporte completo")
+                clave_reporte = CacheReportes.clave(
+                    cdn_id, canal_param, canal_ids, categorias_df['IDCategoria'],
+                    variante='completo', formato=formato
+                )
+            
+            # Solo los reportes completos quedan como snapshot del día
+            if tipo == 'completo':
+                inicio = time.perf_counter()
+                guardar_snapshot(clave_matriz, df_final)
+                tiempos['snapshot'] = time.perf_counter() - inicio
+            
+            inicio = time.perf_counter()
+            ruta_archivo = self.escribir_matriz(
+                df_salida,
+                nombre_cadena,
+                prefijo='Cambios_Precios' if tipo == 'cambios' else 'Precios_Plu',
+                formato=formato,
+                progreso=lambda escritas, total: self._notificar_progreso(
+                    progreso, 'filas_escritas', escritas=escritas, total=total
+                )
+            )
+            tiempos['escritura'] = time.perf_counter() - inicio
             if ruta_archivo is None:
-                logger.error("PASO 4: Error al generar archivo Excel")
-                self.desconectar()
+                logger.error(f"PASO 4: Error al generar archivo {formato}")
                 return None
             
+            archivos_entrega = []
+            if para_envio:
+                inicio = time.perf_counter()
+                prefijo = 'Cambios_Precios' if tipo == 'cambios' else 'Precios_Plu'
+                archivos_entrega = [archivo.a_dict() for archivo in preparar_entrega(
+                    ruta_archivo,
+                    df_salida,
+                    lambda df_parte, parte, partes: self.escribir_matriz(
+                        df_parte, f"{nombre_cadena} parte {parte} de {partes}", prefijo=prefijo, formato=formato
+                    )
+                )]
+                tiempos['entrega'] = time.perf_counter() - inicio
+            
+            tiempos['total'] = time.perf_counter() - inicio_proceso
+            resultado = ResultadoReporte(
+                ruta=ruta_archivo,
+                nombre_cadena=nombre_cadena,
+                tamano_bytes=os.path.getsize(ruta_archivo),
+                filas=len(df_salida),
+                columnas=len(df_salida.columns),
+                categorias=len(categorias_df),
+                hash_contenido=calcular_hash_matriz(df_salida),
+                tiempos=tiempos,
+                tipo=tipo,
+                base_cambios=base_cambios,
+                origen_datos=origen_datos,
+                datos_capturados_en=datos_capturados_en,
+                formato=formato,
+                entrega=archivos_entrega
+            )
+            
             logger.info(f"PASO 4: Archivo generado exitosamente")
+            self._notificar_progreso(progreso, 'archivo', ruta=ruta_archivo)
+            cache_reportes.guardar(clave_reporte, ruta_archivo, vigencia=vigencia_cache, **{
+                clave: valor for clave, valor in resultado.a_dict().items()
+                if clave not in ('ruta', 'generado_en', 'tiempos', 'desde_cache')
+            })
+            obtener_almacen_archivos().limpiar()
             logger.info("="*60)
             logger.info("PROCESO COMPLETADO EXITOSAMENTE")
             logger.info(f"Archivo: {ruta_archivo}")
+            logger.info(f"Tiempos por etapa: " + ", ".join(f"{etapa}={segundos:.2f}s" for etapa, segundos in tiempos.items()))
             logger.info("="*60)
             
-            return ruta_archivo
+            return resultado
             
         except Exception as e:
             logger.error(f"Error en proceso completo: {e}")
@@ -524,10 +788,34 @@ class ConsultasDB:
         finally:
             self.desconectar()
 
+def _lotes_stored_procedure(
+    cdn_id: int,
+    categorias_df: pd.DataFrame,
+    canal_param: str = 'Canal',
+    canal_ids: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """Lotes del SP con una conexión propia del pool, para refrescos fuera del reporte en curso"""
+    consultas = ConsultasDB()
+    if not consultas.conectar():
+        return
+    
+    try:
+        yield from consultas.iterar_stored_procedure_precios(cdn_id, categorias_df, canal_param, canal_ids)
+    finally:
+        consultas.desconectar()
+
 def procesar_cadena_simple(
     nombre_cadena: str,
     canal_param: str = 'Canal',
-    canal_ids: Optional[List[str]] = None
-) -> Optional[str]:
+    canal_ids: Optional[List[str]] = None,
+    progreso: Optional[Callable[[str, Dict], None]] = None,
+    forzar: bool = False,
+    vigencia_cache: Optional[float] = None,
+    delta: bool = False,
+    formato: Optional[str] = None,
+    para_envio: bool = False
+) -> Optional[ResultadoReporte]:
     consultas = ConsultasDB()
-    return consultas.proceso_completo(nombre_cadena, canal_param, canal_ids)
\ No newline at end of file
+    return consultas.proceso_completo(
+        nombre_cadena, canal_param, canal_ids, progreso, forzar, vigencia_cache, delta, formato, para_envio
+    )
\ No newline at end of file
@@ -0,0 +1,152 @@
+# delta_precios.py
+import glob
+import hashlib
+import logging
+import os
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_PRODUCTO = ['#PLU_NUM_PLU', '#PLU', 'PRODUCTO']
+COLUMNAS_DELTA = COLUMNAS_PRODUCTO + ['CATEGORIA', 'CAMBIO', 'PVP_ANTERIOR', 'PVP_NUEVO']
+
+CAMBIO_AGREGADO = 'AGREGADO'
+CAMBIO_ELIMINADO = 'ELIMINADO'
+CAMBIO_MODIFICADO = 'MODIFICADO'
+
+# Diferencia mínima de PVP para considerar un precio modificado
+TOLERANCIA_PVP = 1e-6
+
+def clave_snapshot(
+    cdn_id: int,
+    canal_param: str,
+    canal_ids: Optional[List[str]],
+    categoria_ids: Iterable[str]
+) -> str:
+    """
+    Identifica la matriz por los mismos parámetros que la clave de CacheReportes: reportes con
+    otros canales o categorías no se comparan entre sí
+    """
+    canales = ','.join(sorted(str(c).strip().upper() for c in canal_ids)) if canal_ids else 'default'
+    categorias = ','.join(sorted(str(c).strip().upper() for c in categoria_ids))
+    huella = hashlib.sha1(f"{canal_param}|{canales}|{categorias}".encode('utf-8')).hexdigest()[:16]
+    return f"{cdn_id}_{huella}"
+
+def _ruta_snapshot(clave: str, dia: date) -> str:
+    return os.path.join(Config.SNAPSHOTS_DIR, f"matriz_{clave}_{dia.strftime('%Y%m%d')}.pkl")
+
+def _listar_snapshots(clave: str = '*') -> List[Tuple[date, str]]:
+    """Snapshots de la clave (todos con '*') ordenados del más antiguo al más reciente"""
+    snapshots = []
+    for ruta in glob.glob(os.path.join(Config.SNAPSHOTS_DIR, f"matriz_{clave}_*.pkl")):
+        sufijo = os.path.splitext(os.path.basename(ruta))[0].rsplit('_', 1)[-1]
+        try:
+            snapshots.append((datetime.strptime(sufijo, '%Y%m%d').date(), ruta))
+        except ValueError:
+            continue
+    return sorted(snapshots)
+
+def guardar_snapshot(clave: str, df_final: pd.DataFrame) -> Optional[str]:
+    """
+    Guarda la matriz completa como snapshot del día (se sobrescribe dentro del mismo día)
+    y elimina los snapshots más antiguos que Config.SNAPSHOTS_DIAS.
+    """
+    try:
+        os.makedirs(Config.SNAPSHOTS_DIR, exist_ok=True)
+        ruta = _ruta_snapshot(clave, date.today())
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        df_final.to_pickle(ruta_temporal)
+        os.replace(ruta_temporal, ruta)
+        
+        for dia, ruta_antigua in _listar_snapshots():
+            if (date.today() - dia).days > Config.SNAPSHOTS_DIAS:
+                os.remove(ruta_antigua)
+                logger.info(f"Snapshot antiguo eliminado: {ruta_antigua}")
+        
+        return ruta
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el snapshot {clave}: {e}")
+        return None
+
+def cargar_snapshot_base(clave: str) -> Optional[Tuple[pd.DataFrame, datetime]]:
+    """Matriz del snapshot más reciente de un día anterior a hoy, con su fecha; None si no hay"""
+    anteriores = [(dia, ruta) for dia, ruta in _listar_snapshots(clave) if dia < date.today()]
+    if not anteriores:
+        return None
+    
+    _, ruta = anteriores[-1]
+    try:
+        return pd.read_pickle(ruta), datetime.fromtimestamp(os.path.getmtime(ruta))
+    except Exception as e:
+        logger.warning(f"No se pudo leer el snapshot {ruta}: {e}")
+        return None
+
+def _a_formato_largo(df_final: pd.DataFrame) -> pd.DataFrame:
+    """Celdas con precio > 0 de la matriz como filas (#PLU, CATEGORIA_ID, CATEGORIA, PVP)"""
+    columnas_categoria = [columna for columna in df_final.columns if columna not in COLUMNAS_PRODUCTO]
+    valores = df_final[columnas_categoria].to_numpy(dtype='float64', na_value=0.0)
+    filas, columnas = np.nonzero(valores > 0.0)
+    
+    # Encabezado cat_descripcion|cat_id: se compara por ID para tolerar cambios de descripción
+    partes = [str(columna).rpartition('|') for columna in columnas_categoria]
+    descripciones = np.array([descripcion or cat_id for descripcion, _, cat_id in partes], dtype=object)
+    cat_ids = np.array([cat_id for _, _, cat_id in partes], dtype=object)
+    
+    return pd.DataFrame({
+        '#PLU': df_final['#PLU'].to_numpy()[filas],
+        'CATEGORIA_ID': cat_ids[columnas],
+        'CATEGORIA': descripciones[columnas],
+        'PVP': valores[filas, columnas],
+    })
+
+def calcular_delta(anterior: pd.DataFrame, actual: pd.DataFrame) -> pd.DataFrame:
+    """
+    Celdas PLU x categoría agregadas, eliminadas o con PVP distinto entre dos matrices,
+    con el PVP anterior y el nuevo. Se calcula con un cruce outer sobre el formato largo.
+    """
+    cruce = _a_formato_largo(anterior).merge(
+        _a_formato_largo(actual),
+        on=['#PLU', 'CATEGORIA_ID'],
+        how='outer',
+        suffixes=('_ANTERIOR', '_NUEVO'),
+        indicator=True
+    )
+    
+    cambio = np.select(
+        [
+            cruce['_merge'] == 'right_only',
+            cruce['_merge'] == 'left_only',
+            (cruce['PVP_NUEVO'] - cruce['PVP_ANTERIOR']).abs() > TOLERANCIA_PVP,
+        ],
+        [CAMBIO_AGREGADO, CAMBIO_ELIMINADO, CAMBIO_MODIFICADO],
+        default=''
+    )
+    cruce['CAMBIO'] = cambio
+    cruce = cruce[cambio != ''].copy()
+    cruce['CATEGORIA'] = cruce['CATEGORIA_NUEVO'].fillna(cruce['CATEGORIA_ANTERIOR'])
+    
+    # Datos del producto desde la matriz actual; los PLU que ya no existen, desde la anterior
+    productos = (
+        pd.concat([actual[COLUMNAS_PRODUCTO], anterior[COLUMNAS_PRODUCTO]], ignore_index=True)
+        .drop_duplicates(subset=['#PLU'])
+    )
+    
+    delta = (
+        cruce.merge(productos, on='#PLU', how='left')
+        .sort_values(['#PLU_NUM_PLU', '#PLU', 'CATEGORIA'], kind='stable')
+        .reset_index(drop=True)
+    )
+    delta = delta[COLUMNAS_DELTA]
+    
+    logger.info(
+        f"Delta de precios: {int((cambio == CAMBIO_AGREGADO).sum())} agregados, "
+        f"{int((cambio == CAMBIO_ELIMINADO).sum())} eliminados, "
+        f"{int((cambio == CAMBIO_MODIFICADO).sum())} modificados"
+    )
+    return delta
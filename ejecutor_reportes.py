@@ -0,0 +1,111 @@
+# ejecutor_reportes.py
+import asyncio
+import contextlib
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ProgresoEnCola:
+    """Callback de progreso serializable: reenvía los eventos de un worker de proceso a una cola del Manager"""
+    
+    def __init__(self, cola):
+        self.cola = cola
+    
+    def __call__(self, paso: str, datos: Dict):
+        self.cola.put((paso, datos))
+
+class EjecutorReportes:
+    """Pool acotado de workers para correr la generación de reportes fuera del event loop"""
+    
+    def __init__(self, tipo: str = None, max_workers: int = None):
+        self.tipo = tipo or Config.REPORT_POOL
+        self.max_workers = max_workers or Config.REPORT_WORKERS
+        self._executor: Optional[Executor] = None
+        self._manager = None
+        
+        if self.tipo not in ('thread', 'process'):
+            raise ValueError(f"Tipo de pool no válido: {self.tipo}")
+    
+    @property
+    def admite_callbacks(self) -> bool:
+        """Los workers en hilos comparten memoria con el bot y pueden invocar callbacks"""
+        return self.tipo == 'thread'
+    
+    def _obtener_executor(self) -> Executor:
+        if self._executor is None:
+            if self.tipo == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='reporte'
+                )
+            logger.info(f"Pool de reportes iniciado: {self.tipo} con {self.max_workers} workers")
+        return self._executor
+    
+    @contextlib.asynccontextmanager
+    async def canal_progreso(self, al_evento: Callable[[str, Dict], None]) -> AsyncIterator[Callable]:
+        """
+        Entrega el callback de progreso para pasar al trabajo. En hilos es al_evento tal cual;
+        en procesos los eventos viajan por una cola del Manager y un hilo los entrega a al_evento.
+        al_evento puede invocarse desde cualquier hilo.
+        """
+        if self.admite_callbacks:
+            yield al_evento
+            return
+        
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        cola = self._manager.Queue()
+        
+        def drenar():
+            while True:
+                evento = cola.get()
+                if evento is None:
+                    return
+                try:
+                    al_evento(*evento)
+                except Exception as e:
+                    logger.warning(f"Error al procesar evento de progreso: {e}")
+        
+        lector = asyncio.get_running_loop().run_in_executor(None, drenar)
+        try:
+            yield ProgresoEnCola(cola)
+        finally:
+            cola.put(None)
+            await lector
+    
+    def enviar(self, funcion: Callable, *args, **kwargs) -> Future:
+        """Envía un trabajo al pool y devuelve su Future"""
+        return self._obtener_executor().submit(funcion, *args, **kwargs)
+    
+    async def ejecutar(self, funcion: Callable, *args, **kwargs) -> Any:
+        """Envía un trabajo al pool y espera su resultado sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        trabajo = functools.partial(funcion, *args, **kwargs)
+        return await loop.run_in_executor(self._obtener_executor(), trabajo)
+    
+    def cerrar(self, esperar: bool = True):
+        if self._executor is not None:
+            logger.info("Cerrando pool de reportes...")
+            self._executor.shutdown(wait=esperar, cancel_futures=not esperar)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+_ejecutor_reportes = None
+
+def obtener_ejecutor_reportes() -> EjecutorReportes:
+    global _ejecutor_reportes
+    
+    if _ejecutor_reportes is None:
+        _ejecutor_reportes = EjecutorReportes()
+    
+    return _ejecutor_reportes
@@ -0,0 +1,135 @@
+# entrega.py
+import logging
+import math
+import os
+import zipfile
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from almacen_archivos import obtener_almacen_archivos
+from config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tope de Telegram para documentos enviados por bots; ENTREGA_LIMITE_MB deja margen bajo este valor
+LIMITE_TELEGRAM_BYTES = 50 * 1024 * 1024
+COLUMNAS_FIJAS = ['#PLU_NUM_PLU', '#PLU', 'PRODUCTO']
+MAX_INTENTOS_DIVISION = 4
+
+@dataclass
+class ArchivoEntrega:
+    """Archivo a subir a Telegram: el reporte, su versión comprimida o una de sus partes"""
+    ruta: str
+    tamano_bytes: int
+    comprimido: bool = False
+    parte: int = 1
+    partes: int = 1
+    
+    @property
+    def nombre_archivo(self) -> str:
+        return os.path.basename(self.ruta)
+    
+    def a_dict(self) -> Dict:
+        return asdict(self)
+
+def limite_bytes() -> int:
+    return int(Config.ENTREGA_LIMITE_MB * 1024 * 1024)
+
+def comprimir(ruta: str) -> Optional[str]:
+    """
+    Zip del archivo (deflate nivel 9) si ahorra al menos ENTREGA_AHORRO_MINIMO del tamaño;
+    un xlsx ya viene comprimido y casi nunca lo logra, un CSV sí. Se reutiliza un zip previo.
+    """
+    ruta_zip = f"{ruta}.zip"
+    tamano = os.path.getsize(ruta)
+    
+    if not (os.path.exists(ruta_zip) and os.path.getmtime(ruta_zip) >= os.path.getmtime(ruta)):
+        with obtener_almacen_archivos().escritura_atomica(ruta_zip) as temporal:
+            with zipfile.ZipFile(temporal, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archivo_zip:
+                archivo_zip.write(ruta, arcname=os.path.basename(ruta))
+    
+    tamano_zip = os.path.getsize(ruta_zip)
+    if tamano_zip > tamano * (1 - Config.ENTREGA_AHORRO_MINIMO):
+        logger.info(f"Comprimir no conviene para {os.path.basename(ruta)} ({tamano} -> {tamano_zip} bytes)")
+        os.remove(ruta_zip)
+        return None
+    
+    logger.info(f"Archivo comprimido para envío: {tamano / 1024:.0f} KB -> {tamano_zip / 1024:.0f} KB")
+    return ruta_zip
+
+def archivo_para_envio(ruta: str, parte: int = 1, partes: int = 1) -> ArchivoEntrega:
+    """El archivo tal cual o comprimido, el que pese menos; bajo ENTREGA_COMPRIMIR_DESDE_MB no se intenta"""
+    tamano = os.path.getsize(ruta)
+    if tamano >= Config.ENTREGA_COMPRIMIR_DESDE_MB * 1024 * 1024:
+        ruta_zip = comprimir(ruta)
+        if ruta_zip is not None:
+            return ArchivoEntrega(ruta_zip, os.path.getsize(ruta_zip), True, parte, partes)
+    return ArchivoEntrega(ruta, tamano, False, parte, partes)
+
+def dividir_reporte(df_final: 'pd.DataFrame', partes: int) -> List['pd.DataFrame']:
+    """
+    Parte la matriz en grupos contiguos de categorías (cada parte conserva las columnas del
+    producto y solo los PLU con precio en su grupo). Un reporte sin columnas de categoría,
+    como el de cambios, se parte por filas.
+    """
+    columnas_precio = [columna for columna in df_final.columns if columna not in COLUMNAS_FIJAS]
+    fijas = [columna for columna in COLUMNAS_FIJAS if columna in df_final.columns]
+    
+    if len(fijas) < len(COLUMNAS_FIJAS) or len(columnas_precio) < partes:
+        tamano_parte = math.ceil(len(df_final) / partes)
+        return [
+            df_final.iloc[inicio:inicio + tamano_parte].reset_index(drop=True)
+            for inicio in range(0, len(df_final), tamano_parte)
+        ]
+    
+    tamano_grupo = math.ceil(len(columnas_precio) / partes)
+    divisiones = []
+    for inicio in range(0, len(columnas_precio), tamano_grupo):
+        grupo = columnas_precio[inicio:inicio + tamano_grupo]
+        con_precio = (df_final[grupo].to_numpy(dtype='float64', na_value=0.0) > 0).any(axis=1)
+        divisiones.append(df_final.loc[con_precio, fijas + grupo].reset_index(drop=True))
+    return divisiones
+
+def preparar_entrega(
+    ruta: str,
+    df_final: 'pd.DataFrame' = None,
+    escribir_parte: Callable[['pd.DataFrame', int, int], Optional[str]] = None
+) -> List[ArchivoEntrega]:
+    """
+    Elige el transporte más barato para Telegram: el archivo tal cual, comprimido o, si aun así
+    supera ENTREGA_LIMITE_MB, en partes por grupos de categorías (requiere df_final y escribir_parte).
+    """
+    archivo = archivo_para_envio(ruta)
+    limite = limite_bytes()
+    if archivo.tamano_bytes <= limite:
+        return [archivo]
+    
+    if df_final is None or escribir_parte is None:
+        logger.error(f"{archivo.nombre_archivo} supera el límite de envío ({archivo.tamano_bytes} bytes) y no se puede dividir")
+        return [archivo]
+    
+    # Estimación inicial por tamaño; si alguna parte aún no cabe se duplica la cantidad
+    partes = math.ceil(archivo.tamano_bytes * 1.1 / limite)
+    for _ in range(MAX_INTENTOS_DIVISION):
+        archivos = []
+        divisiones = dividir_reporte(df_final, partes)
+        for numero, division in enumerate(divisiones, 1):
+            ruta_parte = escribir_parte(division, numero, len(divisiones))
+            if ruta_parte is None:
+                raise RuntimeError(f"No se pudo escribir la parte {numero} de {len(divisiones)}")
+            archivos.append(archivo_para_envio(ruta_parte, numero, len(divisiones)))
+        
+        if all(parte.tamano_bytes <= limite for parte in archivos):
+            logger.info(f"Reporte dividido en {len(archivos)} partes para el envío")
+            return archivos
+        
+        for parte in archivos:
+            os.remove(parte.ruta)
+            if parte.comprimido:
+                os.remove(parte.ruta[:-len('.zip')])
+        partes *= 2
+    
+    raise RuntimeError(f"No se pudo dividir {os.path.basename(ruta)} en partes menores a {Config.ENTREGA_LIMITE_MB} MB")
@@ -0,0 +1,246 @@
+# escritor_excel.py
+import logging
+import math
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_PLU = ['#PLU_NUM_PLU', '#PLU']
+COLUMNA_PRODUCTO = 'PRODUCTO'
+# Columnas de texto del reporte de cambios (delta_precios.py)
+COLUMNAS_TEXTO = [COLUMNA_PRODUCTO, 'CATEGORIA', 'CAMBIO']
+FORMATO_PRECIO = '#,##0.00'
+ALTO_FILA = 20
+# Cada cuántas filas el escritor streaming informa su avance
+FILAS_POR_AVISO = 2000
+
+def _borde_fino() -> Border:
+    return Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+def _crear_estilos_nombrados() -> list:
+    """Estilos con nombre equivalentes al formato celda a celda del modo clásico"""
+    data_font = Font(name='Calibri', size=10)
+    
+    return [
+        NamedStyle(
+            name='precios_encabezado',
+            font=Font(name='Calibri', bold=True, size=11, color='FFFFFF'),
+            fill=PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            border=_borde_fino()
+        ),
+        NamedStyle(
+            name='precios_plu',
+            font=data_font,
+            alignment=Alignment(horizontal='center', vertical='center'),
+            border=_borde_fino()
+        ),
+        NamedStyle(
+            name='precios_texto',
+            font=data_font,
+            alignment=Alignment(horizontal='left', vertical='center'),
+            border=_borde_fino()
+        ),
+        NamedStyle(
+            name='precios_numero',
+            font=data_font,
+            alignment=Alignment(horizontal='right', vertical='center'),
+            border=_borde_fino(),
+            number_format=FORMATO_PRECIO
+        ),
+    ]
+
+def _estilo_columna(column_title: str) -> str:
+    if column_title in COLUMNAS_TEXTO:
+        return 'precios_texto'
+    if column_title in COLUMNAS_PLU:
+        return 'precios_plu'
+    return 'precios_numero'
+
+def _ancho_columna(column_title: str, max_length: int) -> float:
+    # Establecer ancho basado en el contenido
+    adjusted_width = min(max_length + 2, 50)
+    
+    # Anchos especiales para columnas específicas
+    if column_title in COLUMNAS_PLU:
+        return max(12, adjusted_width)
+    elif column_title == COLUMNA_PRODUCTO:
+        return max(40, adjusted_width)
+    # Para columnas dinámicas (cat_descripcion|cat_id)
+    return max(15, adjusted_width)
+
+def calcular_anchos_columnas(df_final: pd.DataFrame, ajustar: bool = None) -> dict:
+    """
+    Ancho por columna según el texto más largo (encabezado incluido), calculado en una
+    pasada vectorizada sobre df_final. Sin ajuste solo se aplican los mínimos (12/40/15).
+    """
+    if ajustar is None:
+        ajustar = Config.EXCEL_AUTOANCHO and len(df_final.columns) <= Config.EXCEL_AUTOANCHO_MAX_COLUMNAS
+    
+    if not ajustar:
+        return {column_title: _ancho_columna(column_title, 0) for column_title in df_final.columns}
+    
+    maximos = {column_title: len(str(column_title)) for column_title in df_final.columns}
+    
+    if len(df_final) > 0:
+        # Columnas de precios como un solo bloque: se formatea cada valor distinto una sola vez
+        precios = df_final.select_dtypes(include='float')
+        if len(precios.columns) > 0:
+            unicos, posiciones = np.unique(precios.to_numpy(), return_inverse=True)
+            largos_unicos = np.fromiter((len(str(valor)) for valor in unicos.tolist()), dtype=np.int64, count=len(unicos))
+            largos = largos_unicos[posiciones.reshape(-1)].reshape(precios.shape).max(axis=0)
+            for column_title, largo in zip(precios.columns, largos):
+                maximos[column_title] = max(maximos[column_title], int(largo))
+        
+        for column_title in df_final.columns.difference(precios.columns, sort=False):
+            largo = df_final[column_title].astype(str).str.len().max()
+            maximos[column_title] = max(maximos[column_title], int(largo))
+    
+    return {column_title: _ancho_columna(column_title, maximos[column_title]) for column_title in df_final.columns}
+
+def _valor_celda(valor):
+    # pandas deja vacías las celdas NaN; en modo streaming se replica omitiendo el valor
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    return valor
+
+def escribir_excel_streaming(
+    df_final: pd.DataFrame,
+    ruta: str,
+    anchos: dict = None,
+    hoja: str = 'Precios',
+    progreso: Optional[Callable[[int, int], None]] = None
+):
+    """
+    Escribe la matriz en un workbook write-only: cada fila se serializa una sola vez
+    y las celdas referencian estilos con nombre registrados al inicio.
+    progreso(filas_escritas, total) se invoca cada FILAS_POR_AVISO filas.
+    """
+    workbook = Workbook(write_only=True)
+    for estilo in _crear_estilos_nombrados():
+        workbook.add_named_style(estilo)
+    
+    worksheet = workbook.create_sheet(hoja)
+    columnas = list(df_final.columns)
+    total_filas = len(df_final)
+    ultima_columna = get_column_letter(max(len(columnas), 1))
+    
+    # En write-only todo lo que va antes de los datos se define antes de escribir filas
+    worksheet.freeze_panes = 'D2'
+    worksheet.sheet_format.defaultRowHeight = ALTO_FILA
+    worksheet.sheet_format.customHeight = True
+    worksheet.auto_filter.ref = f"A1:{ultima_columna}{total_filas + 1}"
+    
+    if anchos is None:
+        anchos = calcular_anchos_columnas(df_final)
+    
+    if anchos:
+        for col_num, column_title in enumerate(columnas, 1):
+            if column_title in anchos:
+                worksheet.column_dimensions[get_column_letter(col_num)].width = anchos[column_title]
+    
+    encabezado = []
+    for column_title in columnas:
+        cell = WriteOnlyCell(worksheet, value=column_title)
+        cell.style = 'precios_encabezado'
+        encabezado.append(cell)
+    worksheet.append(encabezado)
+    
+    estilos = [_estilo_columna(column_title) for column_title in columnas]
+    
+    for numero, fila in enumerate(df_final.itertuples(index=False, name=None), 1):
+        celdas = []
+        for valor, estilo in zip(fila, estilos):
+            cell = WriteOnlyCell(worksheet, value=_valor_celda(valor))
+            cell.style = estilo
+            celdas.append(cell)
+        worksheet.append(celdas)
+        if progreso is not None and numero % FILAS_POR_AVISO == 0:
+            progreso(numero, total_filas)
+    
+    workbook.save(ruta)
+    if progreso is not None:
+        progreso(total_filas, total_filas)
+    logger.info(f"Excel escrito en modo streaming: {total_filas} filas x {len(columnas)} columnas")
+
+def escribir_excel_clasico(df_final: pd.DataFrame, ruta: str, anchos: dict = None):
+    """Escribe con pandas y aplica el formato celda a celda sobre la hoja en memoria"""
+    if anchos is None:
+        anchos = calcular_anchos_columnas(df_final)
+    
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        df_final.to_excel(writer, index=False, sheet_name='Precios')
+        worksheet = writer.sheets['Precios']
+        
+        # Definir estilos
+        header_font = Font(name='Calibri', bold=True, size=11, color='FFFFFF')
+        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        
+        data_font = Font(name='Calibri', size=10)
+        text_alignment = Alignment(horizontal='left', vertical='center')
+        number_alignment = Alignment(horizontal='right', vertical='center')
+        
+        thin_border = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+        
+        # Aplicar formato a encabezados
+        for col_num, column_title in enumerate(df_final.columns, 1):
+            cell = worksheet.cell(row=1, column=col_num)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            cell.border = thin_border
+            
+            # Ajustar ancho de columnas
+            column_letter = get_column_letter(col_num)
+            worksheet.column_dimensions[column_letter].width = anchos[column_title]
+        
+        # Aplicar formato a datos
+        total_filas = len(df_final)
+        for row_num in range(2, total_filas + 2):
+            for col_num in range(1, len(df_final.columns) + 1):
+                cell = worksheet.cell(row=row_num, column=col_num)
+                cell.border = thin_border
+                
+                # Determinar alineación basada en tipo de columna
+                column_title = df_final.columns[col_num - 1]
+                
+                if column_title in COLUMNAS_TEXTO:
+                    cell.alignment = text_alignment
+                    cell.font = data_font
+                elif column_title in ['#PLU_NUM_PLU', '#PLU']:
+                    cell.alignment = Alignment(horizontal='center', vertical='center')
+                    cell.font = data_font
+                else:  # Columnas de precios
+                    cell.alignment = number_alignment
+                    cell.font = data_font
+                    cell.number_format = '#,##0.00'
+        
+        # Aplicar filtros automáticos
+        worksheet.auto_filter.ref = worksheet.dimensions
+        
+        # Congelar paneles (encabezados y primeras 3 columnas)
+        worksheet.freeze_panes = 'D2'
+        
+        # Autoajustar altura de filas
+        for row in worksheet.iter_rows(min_row=1, max_row=total_filas + 1):
+            worksheet.row_dimensions[row[0].row].height = 20
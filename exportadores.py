@@ -0,0 +1,117 @@
+# exportadores.py
+import importlib.util
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FILAS_POR_BLOQUE_CSV = 5000
+
+# progreso(filas_escritas, total_filas), invocado a medida que avanza la escritura
+ProgresoEscritura = Optional[Callable[[int, int], None]]
+
+class Exportador(ABC):
+    """Escribe df_final en un formato de archivo; las subclases definen formato, extensión y escritura"""
+    formato = ''
+    extension = ''
+    descripcion = ''
+    
+    @property
+    def disponible(self) -> bool:
+        return True
+    
+    @abstractmethod
+    def escribir(self, df_final: 'pd.DataFrame', ruta: str, progreso: ProgresoEscritura = None):
+        ...
+
+class ExportadorExcel(Exportador):
+    formato = 'xlsx'
+    extension = '.xlsx'
+    descripcion = 'Excel'
+    
+    def escribir(self, df_final: 'pd.DataFrame', ruta: str, progreso: ProgresoEscritura = None):
+        # openpyxl se importa al escribir el primer Excel, no al arrancar el bot
+        from escritor_excel import escribir_excel_clasico, escribir_excel_streaming
+        
+        if Config.EXCEL_STREAMING:
+            escribir_excel_streaming(df_final, ruta, progreso=progreso)
+        else:
+            escribir_excel_clasico(df_final, ruta)
+            if progreso is not None:
+                progreso(len(df_final), len(df_final))
+
+class ExportadorCSV(Exportador):
+    """CSV sin estilos para procesos automáticos; se escribe por bloques de filas"""
+    formato = 'csv'
+    extension = '.csv'
+    descripcion = 'CSV'
+    
+    def escribir(self, df_final: 'pd.DataFrame', ruta: str, progreso: ProgresoEscritura = None):
+        with open(ruta, 'w', encoding=Config.CSV_CODIFICACION, newline='') as archivo:
+            for inicio in range(0, max(len(df_final), 1), FILAS_POR_BLOQUE_CSV):
+                df_final.iloc[inicio:inicio + FILAS_POR_BLOQUE_CSV].to_csv(
+                    archivo,
+                    index=False,
+                    header=inicio == 0,
+                    sep=Config.CSV_SEPARADOR,
+                    lineterminator='\n'
+                )
+                if progreso is not None:
+                    progreso(min(inicio + FILAS_POR_BLOQUE_CSV, len(df_final)), len(df_final))
+        logger.info(f"CSV escrito: {len(df_final)} filas x {len(df_final.columns)} columnas")
+
+class ExportadorParquet(Exportador):
+    """Parquet columnar (requiere pyarrow)"""
+    formato = 'parquet'
+    extension = '.parquet'
+    descripcion = 'Parquet'
+    
+    @property
+    def disponible(self) -> bool:
+        return importlib.util.find_spec('pyarrow') is not None
+    
+    def escribir(self, df_final: 'pd.DataFrame', ruta: str, progreso: ProgresoEscritura = None):
+        import pandas as pd
+        
+        # Arrow exige un tipo por columna: las de tipos mezclados (p. ej. PLU numéricos y texto) van como texto
+        mezcladas = [
+            columna for columna in df_final.select_dtypes(include='object').columns
+            if pd.api.types.infer_dtype(df_final[columna], skipna=True).startswith('mixed')
+        ]
+        if mezcladas:
+            df_final = df_final.astype({columna: 'string' for columna in mezcladas})
+        
+        df_final.to_parquet(ruta, engine='pyarrow', index=False)
+        if progreso is not None:
+            progreso(len(df_final), len(df_final))
+        logger.info(f"Parquet escrito: {len(df_final)} filas x {len(df_final.columns)} columnas")
+
+_exportadores: Dict[str, Exportador] = {}
+
+def registrar_exportador(exportador: Exportador):
+    _exportadores[exportador.formato] = exportador
+
+def formatos_disponibles() -> List[str]:
+    return [formato for formato, exportador in _exportadores.items() if exportador.disponible]
+
+def obtener_exportador(formato: str = None) -> Exportador:
+    """Exportador del formato pedido (por defecto Config.FORMATO_REPORTE)"""
+    formato = (formato or Config.FORMATO_REPORTE).lower()
+    exportador = _exportadores.get(formato)
+    
+    if exportador is None:
+        raise ValueError(f"Formato de reporte no soportado: {formato}")
+    if not exportador.disponible:
+        raise ValueError(f"El formato {formato} no está disponible en este servidor")
+    
+    return exportador
+
+registrar_exportador(ExportadorExcel())
+registrar_exportador(ExportadorCSV())
+registrar_exportador(ExportadorParquet())
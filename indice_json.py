@@ -0,0 +1,117 @@
+# indice_json.py
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: el lock queda solo dentro del proceso
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SUFIJO_TEMPORAL = '.tmp'
+SUFIJO_BLOQUEO = '.lock'
+
+@contextmanager
+def escritura_atomica(ruta: str) -> Iterator[str]:
+    """
+    Entrega una ruta temporal junto al destino; si el bloque termina sin error se publica con
+    os.replace, así nadie ve (ni sube) un archivo a medio escribir
+    """
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}{SUFIJO_TEMPORAL}"
+    try:
+        yield temporal
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+@contextmanager
+def bloqueo_entre_procesos(ruta: str):
+    """Lock exclusivo con flock sobre un archivo auxiliar ruta.lock (lo comparten todos los procesos)"""
+    if fcntl is None:
+        yield
+        return
+    
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(f"{ruta}{SUFIJO_BLOQUEO}", 'a') as archivo_bloqueo:
+        fcntl.flock(archivo_bloqueo.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo_bloqueo.fileno(), fcntl.LOCK_UN)
+
+class IndiceJSON:
+    """
+    Diccionario persistido como JSON y compartido entre hilos, workers y procesos. Las lecturas
+    releen el archivo solo si cambió su mtime; cada modificación relee, aplica y escribe bajo un
+    lock entre procesos, así dos escritores no pisan sus cambios.
+    """
+    
+    def __init__(self, ruta: str, descripcion: str = 'índice'):
+        self.ruta = ruta
+        self.descripcion = descripcion
+        self._entradas: Dict[str, Dict] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+    
+    def _cargar(self, forzar: bool = False):
+        """Relee el índice desde disco si otro proceso lo modificó (llamar con el lock tomado)"""
+        try:
+            mtime = os.stat(self.ruta).st_mtime_ns
+        except OSError:
+            if forzar:
+                self._entradas, self._mtime = {}, None
+            return
+        
+        if mtime == self._mtime and not forzar:
+            return
+        
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                self._entradas = json.load(f)
+            self._mtime = mtime
+        except Exception as e:
+            logger.warning(f"No se pudo leer el {self.descripcion}: {e}")
+    
+    def _guardar(self):
+        """Escribe el índice de forma atómica (llamar con el lock tomado)"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            with escritura_atomica(self.ruta) as ruta_temporal:
+                with open(ruta_temporal, 'w', encoding='utf-8') as f:
+                    json.dump(self._entradas, f, ensure_ascii=False, indent=2)
+            self._mtime = os.stat(self.ruta).st_mtime_ns
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el {self.descripcion}: {e}")
+    
+    def leer(self) -> Dict[str, Dict]:
+        """Copia de las entradas actuales"""
+        with self._lock:
+            self._cargar()
+            return dict(self._entradas)
+    
+    @contextmanager
+    def modificar(self) -> Iterator[Dict[str, Dict]]:
+        """
+        Entrega las entradas recién leídas para modificarlas en el lugar; al salir del bloque se
+        escriben. Si el bloque lanza una excepción no se escribe nada.
+        """
+        with self._lock, bloqueo_entre_procesos(self.ruta):
+            self._cargar(forzar=True)
+            try:
+                yield self._entradas
+            except BaseException:
+                # Descartar los cambios a medias: la próxima lectura vuelve al disco
+                self._mtime = None
+                raise
+            self._guardar()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entradas)
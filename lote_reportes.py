@@ -0,0 +1,185 @@
+# lote_reportes.py
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from cadenas_config import CADENAS_LISTA, validar_cadena, obtener_nombre_por_numero
+from config import Config
+from db_consultas import procesar_cadena_simple
+from ejecutor_reportes import EjecutorReportes
+from exportadores import formatos_disponibles, obtener_exportador
+from metricas import obtener_metricas
+
+logger = logging.getLogger(__name__)
+
+def _resolver_cadenas(cadenas: Optional[List[str]]) -> List[str]:
+    """Acepta nombres o números de cadena (1..N); sin cadenas se procesan todas"""
+    if not cadenas:
+        return list(CADENAS_LISTA)
+    
+    resueltas = []
+    for cadena in cadenas:
+        nombre = cadena.strip().upper()
+        if nombre.isdigit():
+            nombre = obtener_nombre_por_numero(int(nombre)) or nombre
+        if not validar_cadena(nombre):
+            raise ValueError(f"Cadena no válida: {cadena}")
+        if nombre not in resueltas:
+            resueltas.append(nombre)
+    
+    return resueltas
+
+def _entrada_manifiesto(nombre_cadena: str, resultado, error: Optional[str], duracion: float) -> Dict:
+    entrada = {
+        'cadena': nombre_cadena,
+        'estado': 'ok' if resultado else 'error',
+        'duracion_segundos': round(duracion, 3),
+        'error': error,
+    }
+    
+    if resultado:
+        entrada.update({
+            'ruta': resultado.ruta,
+            'tamano_bytes': resultado.tamano_bytes,
+            'filas': resultado.filas,
+            'columnas': resultado.columnas,
+            'categorias': resultado.categorias,
+            'hash_contenido': resultado.hash_contenido,
+            'formato': resultado.formato,
+            'desde_cache': resultado.desde_cache,
+            'tiempos': {etapa: round(segundos, 3) for etapa, segundos in resultado.tiempos.items()},
+        })
+    elif error is None:
+        entrada['error'] = 'No se pudo generar el reporte (ver log)'
+    
+    return entrada
+
+def generar_reportes_lote(
+    cadenas: Optional[List[str]] = None,
+    max_paralelo: int = None,
+    tipo_pool: str = None,
+    forzar: bool = False,
+    ruta_manifiesto: str = None,
+    formato: str = None,
+    ruta_metricas: str = None
+) -> Dict:
+    """
+    Genera reportes para varias cadenas en paralelo acotado y escribe un manifiesto JSON
+    con estado y tiempos por cadena. Un fallo en una cadena no detiene a las demás.
+    Con ruta_metricas también escribe las métricas del lote en formato de texto de Prometheus
+    (p. ej. para el textfile collector de node_exporter).
+    """
+    nombres = _resolver_cadenas(cadenas)
+    formato = obtener_exportador(formato).formato
+    ejecutor = EjecutorReportes(tipo_pool or Config.LOTE_POOL, max_paralelo or Config.LOTE_WORKERS)
+    
+    logger.info(f"Iniciando lote de {len(nombres)} cadenas ({ejecutor.tipo}, {ejecutor.max_workers} en paralelo)")
+    iniciado_en = datetime.now()
+    inicio_lote = time.perf_counter()
+    entradas = {}
+    
+    try:
+        futuros = {}
+        for nombre_cadena in nombres:
+            futuro = ejecutor.enviar(procesar_cadena_simple, nombre_cadena, forzar=forzar, formato=formato)
+            futuros[futuro] = (nombre_cadena, time.perf_counter())
+        
+        for futuro in as_completed(futuros):
+            nombre_cadena, enviado_en = futuros[futuro]
+            resultado, error = None, None
+            try:
+                resultado = futuro.result()
+                if not ejecutor.admite_callbacks:
+                    # Con procesos, las métricas de la generación quedaron en el worker
+                    obtener_metricas().registrar_generacion(nombre_cadena, resultado)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.error(f"Error en lote para {nombre_cadena}: {error}")
+                obtener_metricas().registrar_fallo(nombre_cadena, 'generacion')
+            
+            entradas[nombre_cadena] = _entrada_manifiesto(
+                nombre_cadena, resultado, error, time.perf_counter() - enviado_en
+            )
+            logger.info(f"Lote: {nombre_cadena} -> {entradas[nombre_cadena]['estado']}")
+    finally:
+        ejecutor.cerrar()
+    
+    manifiesto = {
+        'iniciado_en': iniciado_en.isoformat(timespec='seconds'),
+        'duracion_segundos': round(time.perf_counter() - inicio_lote, 3),
+        'pool': ejecutor.tipo,
+        'paralelo': ejecutor.max_workers,
+        'formato': formato,
+        'total': len(nombres),
+        'exitosos': sum(1 for entrada in entradas.values() if entrada['estado'] == 'ok'),
+        'fallidos': sum(1 for entrada in entradas.values() if entrada['estado'] != 'ok'),
+        'cadenas': [entradas[nombre] for nombre in nombres],
+    }
+    
+    if ruta_manifiesto is None:
+        timestamp = iniciado_en.strftime("%Y%m%d_%H%M%S")
+        ruta_manifiesto = os.path.join(Config.DOWNLOAD_DIR, f"manifiesto_lote_{timestamp}.json")
+    
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_manifiesto)), exist_ok=True)
+    with open(ruta_manifiesto, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    
+    manifiesto['ruta_manifiesto'] = os.path.abspath(ruta_manifiesto)
+    
+    if ruta_metricas:
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_metricas)), exist_ok=True)
+        ruta_temporal = f"{ruta_metricas}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            f.write(obtener_metricas().exponer())
+        os.replace(ruta_temporal, ruta_metricas)
+        manifiesto['ruta_metricas'] = os.path.abspath(ruta_metricas)
+    
+    logger.info(
+        f"Lote finalizado: {manifiesto['exitosos']}/{manifiesto['total']} exitosos "
+        f"en {manifiesto['duracion_segundos']:.1f}s. Manifiesto: {manifiesto['ruta_manifiesto']}"
+    )
+    return manifiesto
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera reportes de precios para varias cadenas en paralelo")
+    parser.add_argument('cadenas', nargs='*', help="Nombres o números de cadena (por defecto, todas)")
+    parser.add_argument('--paralelo', type=int, default=None, help="Máximo de reportes simultáneos")
+    parser.add_argument('--hilos', action='store_true', help="Usar hilos en lugar de procesos")
+    parser.add_argument('--forzar', action='store_true', help="Ignorar reportes recientes en cache")
+    parser.add_argument('--manifiesto', default=None, help="Ruta del manifiesto JSON")
+    parser.add_argument('--metricas', default=None, help="Archivo .prom donde escribir las métricas del lote")
+    parser.add_argument(
+        '--formato', default=None, choices=formatos_disponibles(),
+        help="Formato de los reportes (por defecto FORMATO_REPORTE); csv y parquet no llevan estilos"
+    )
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
+    )
+    
+    try:
+        manifiesto = generar_reportes_lote(
+            cadenas=args.cadenas,
+            max_paralelo=args.paralelo,
+            tipo_pool='thread' if args.hilos else None,
+            forzar=args.forzar,
+            ruta_manifiesto=args.manifiesto,
+            formato=args.formato,
+            ruta_metricas=args.metricas
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    
+    return 0 if manifiesto['fallidos'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
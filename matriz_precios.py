@@ -0,0 +1,131 @@
+# matriz_precios.py
+import logging
+from typing import Dict
+
+import pandas as pd
+
+from cadenas_config import obtener_categorias_excluidas
+
+logger = logging.getLogger(__name__)
+
+class AcumuladorMatriz:
+    """
+    Construye la matriz PLU x categoría a partir de lotes del stored procedure.
+    De cada lote solo se conserva el primer precio por (PLU, categoría) y el primer
+    registro por PLU, así la memoria depende del tamaño del lote y no del total de filas.
+    """
+    
+    def __init__(self, columnas_sp: Dict[str, str], cdn_id: int = None, compactar_cada: int = 8):
+        self.plu_id_col = columnas_sp['plu_id']
+        self.descripcion_col = columnas_sp['descripcion']
+        self.pvp_col = columnas_sp['pvp']
+        self.categoria_id_col = columnas_sp['categoria_id']
+        self.plu_num_col = columnas_sp.get('plu_num', self.plu_id_col)  # Usar PLU_ID si no hay PLU_NUM
+        
+        self.columnas_usadas = list(dict.fromkeys([
+            self.plu_num_col, self.plu_id_col, self.descripcion_col, self.pvp_col, self.categoria_id_col
+        ]))
+        self.columnas_producto = list(dict.fromkeys([self.plu_num_col, self.plu_id_col, self.descripcion_col]))
+        self.columnas_precio = [self.plu_id_col, self.categoria_id_col, self.pvp_col]
+        
+        self.categorias_excluidas = obtener_categorias_excluidas(cdn_id) if cdn_id else []
+        self.compactar_cada = compactar_cada
+        
+        self._productos = []
+        self._precios = []
+        self.registros = 0
+        self.lotes = 0
+        self.filtrados = 0
+    
+    def agregar(self, lote: pd.DataFrame):
+        self.registros += len(lote)
+        self.lotes += 1
+        
+        # Limpiar datos (solo las columnas que se usan)
+        df_limpio = lote[self.columnas_usadas].copy()
+        df_limpio[self.plu_id_col] = df_limpio[self.plu_id_col].astype(str).str.strip().str.upper()
+        df_limpio[self.categoria_id_col] = df_limpio[self.categoria_id_col].astype(str).str.strip().str.upper()
+        df_limpio[self.pvp_col] = pd.to_numeric(df_limpio[self.pvp_col], errors='coerce').fillna(0.0)
+        
+        # Filtrar datos de categorías excluidas
+        if self.categorias_excluidas:
+            registros_lote = len(df_limpio)
+            df_limpio = df_limpio[~df_limpio[self.categoria_id_col].isin(self.categorias_excluidas)]
+            self.filtrados += registros_lote - len(df_limpio)
+        
+        self._productos.append(df_limpio[self.columnas_producto].drop_duplicates(subset=[self.plu_id_col]))
+        self._precios.append(
+            df_limpio[self.columnas_precio].drop_duplicates(subset=[self.plu_id_col, self.categoria_id_col])
+        )
+        
+        if len(self._precios) >= self.compactar_cada:
+            self._compactar()
+    
+    def _compactar(self):
+        # concat conserva el orden de llegada, por lo que "primero gana" se mantiene entre lotes
+        if len(self._productos) > 1:
+            self._productos = [
+                pd.concat(self._productos, ignore_index=True).drop_duplicates(subset=[self.plu_id_col])
+            ]
+        if len(self._precios) > 1:
+            self._precios = [
+                pd.concat(self._precios, ignore_index=True)
+                .drop_duplicates(subset=[self.plu_id_col, self.categoria_id_col])
+            ]
+    
+    def construir(self, categorias_df: pd.DataFrame) -> pd.DataFrame:
+        """Arma df_final: #PLU_NUM_PLU, #PLU, PRODUCTO y una columna cat_descripcion|cat_id por categoría"""
+        if self.filtrados:
+            logger.info(f"Filtrados {self.filtrados} registros de categorías excluidas")
+        
+        if not self._precios:
+            vacio = pd.DataFrame(columns=self.columnas_usadas)
+            self._productos = [vacio[self.columnas_producto]]
+            self._precios = [vacio[self.columnas_precio]]
+        
+        self._compactar()
+        
+        # Obtener lista única de productos (sin categoría)
+        productos_unicos = (
+            self._productos[0]
+            .sort_values(self.plu_num_col, kind='stable')
+            .reset_index(drop=True)
+        )
+        
+        logger.info(f"Total de productos únicos: {len(productos_unicos)}")
+        
+        # Crear DataFrame final con columnas básicas
+        df_final = pd.DataFrame({
+            '#PLU_NUM_PLU': productos_unicos[self.plu_num_col],
+            '#PLU': productos_unicos[self.plu_id_col],
+            'PRODUCTO': productos_unicos[self.descripcion_col],
+        })
+        
+        # Columnas de categoría en el orden de categorias_df: cat_descripcion|cat_id
+        cat_ids = categorias_df['IDCategoria'].astype(str).str.strip().str.upper().tolist()
+        nombres_columnas = [
+            f"{cat_nombre}|{cat_id}"
+            for cat_nombre, cat_id in zip(categorias_df['cat_descripcion'], cat_ids)
+        ]
+        
+        logger.info(f"Procesando {len(cat_ids)} categorías...")
+        
+        # Primer precio por (PLU, categoría) ya resuelto: un solo pivot alineado a productos y categorías
+        primeros_precios = self._precios[0]
+        matriz = primeros_precios.pivot(index=self.plu_id_col, columns=self.categoria_id_col, values=self.pvp_col)
+        matriz = matriz.reindex(index=df_final['#PLU'], columns=cat_ids)
+        
+        # NaN (PLU sin precio en la categoría) o negativos -> 0.0
+        valores = matriz.to_numpy(dtype='float64', na_value=0.0)
+        valores[~(valores > 0.0)] = 0.0
+        
+        precios = pd.DataFrame(valores, columns=nombres_columnas, index=df_final.index)
+        # Un nombre repetido es la misma categoría (mismo cat_id, mismos precios): queda en su primera
+        # posición, como cuando la columna se asignaba con df_final[nombre_columna]
+        precios = precios.loc[:, ~precios.columns.duplicated(keep='first')]
+        df_final = pd.concat([df_final, precios], axis=1)
+        
+        logger.info(f"PLUs con al menos un precio > 0: {int((valores > 0).any(axis=1).sum())}")
+        logger.info(f"DataFrame final creado: {len(df_final)} filas x {len(df_final.columns)} columnas")
+        
+        return df_final
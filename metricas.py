@@ -0,0 +1,232 @@
+# metricas.py
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Límites en segundos: desde consultas de categorías cacheadas hasta SP de varios minutos
+LIMITES_DURACION = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _numero(valor: float) -> str:
+    """Valor de una muestra sin perder precisión: enteros tal cual, el resto con repr"""
+    if math.isnan(valor):
+        return 'NaN'
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    if isinstance(valor, int) or (float(valor).is_integer() and abs(valor) < 2 ** 53):
+        return str(int(valor))
+    return repr(float(valor))
+
+def _etiquetas(nombres: Sequence[str], valores: Tuple, extra: str = '') -> str:
+    partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+class Contador:
+    """Contador monotónico por combinación de etiquetas"""
+    tipo = 'counter'
+    
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def incrementar(self, valor: float = 1, **etiquetas):
+        clave = tuple(str(etiquetas.get(nombre, '')) for nombre in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+    
+    def exponer(self) -> list:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}" for clave, valor in valores]
+
+class Histograma:
+    """Histograma acumulativo (buckets, suma y cantidad) por combinación de etiquetas"""
+    tipo = 'histogram'
+    
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str], limites: Sequence[float] = LIMITES_DURACION):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(sorted(limites))
+        # Por clave: [conteos por bucket..., suma, cantidad]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(str(etiquetas.get(nombre, '')) for nombre in self.etiquetas)
+        with self._lock:
+            serie = self._series.setdefault(clave, [0] * len(self.limites) + [0.0, 0])
+            for posicion, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie[posicion] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+    
+    def exponer(self) -> list:
+        with self._lock:
+            series = sorted((clave, list(serie)) for clave, serie in self._series.items())
+        
+        lineas = []
+        for clave, serie in series:
+            for limite, conteo in zip(self.limites, serie):
+                etiquetas = _etiquetas(self.etiquetas, clave, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {conteo}")
+            etiquetas = _etiquetas(self.etiquetas, clave, 'le="+Inf"')
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(serie[-2])}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie[-1]}")
+        return lineas
+
+class RegistroMetricas:
+    """Métricas de reportes del proceso del bot, en formato de texto de Prometheus"""
+    
+    def __init__(self):
+        self.inicio = time.time()
+        self.duracion_etapa = Histograma(
+            'reportes_etapa_duracion_segundos',
+            'Duración de cada etapa del reporte (categorias, stored_procedure, matriz, escritura, envio, total...)',
+            ('cadena', 'etapa')
+        )
+        self.reportes = Contador(
+            'reportes_total', 'Reportes entregados', ('cadena', 'tipo', 'formato', 'origen')
+        )
+        self.fallos = Contador(
+            'reportes_fallidos_total', 'Reportes que fallaron, por etapa (generacion o envio)', ('cadena', 'etapa')
+        )
+        self.rechazos = Contador(
+            'reportes_rechazados_total', 'Solicitudes no admitidas (usuario con reporte en curso o cola llena)', ('motivo',)
+        )
+        self.filas = Contador('reportes_filas_total', 'Filas de los reportes entregados', ('cadena',))
+        self.bytes = Contador('reportes_bytes_total', 'Bytes de los archivos entregados', ('cadena',))
+        self.bytes_enviados = Contador(
+            'reportes_bytes_enviados_total', 'Bytes subidos a Telegram (tras comprimir o dividir)', ('cadena',)
+        )
+        self._metricas = [
+            self.duracion_etapa, self.reportes, self.fallos, self.rechazos, self.filas, self.bytes, self.bytes_enviados
+        ]
+    
+    def registrar_etapa(self, nombre_cadena: str, etapa: str, segundos: float):
+        self.duracion_etapa.observar(segundos, cadena=nombre_cadena, etapa=etapa)
+    
+    def registrar_etapas(self, nombre_cadena: str, tiempos: Dict[str, float]):
+        for etapa, segundos in tiempos.items():
+            self.registrar_etapa(nombre_cadena, etapa, segundos)
+    
+    def registrar_generacion(self, nombre_cadena: str, resultado):
+        """
+        Etapas (o el fallo) de una generación. proceso_completo las registra al terminar; quien
+        la corrió en un pool de procesos las registra otra vez aquí con lo que volvió del worker
+        """
+        if resultado is None:
+            self.registrar_fallo(nombre_cadena, 'generacion')
+        elif not resultado.desde_cache:
+            self.registrar_etapas(nombre_cadena, resultado.tiempos)
+    
+    def registrar_reporte(self, resultado, bytes_enviados: int = None):
+        """Cuenta un ResultadoReporte entregado (sus etapas ya se registraron al generarlo)"""
+        origen = 'cache' if resultado.desde_cache else resultado.origen_datos
+        self.reportes.incrementar(
+            cadena=resultado.nombre_cadena, tipo=resultado.tipo, formato=resultado.formato, origen=origen
+        )
+        self.filas.incrementar(resultado.filas, cadena=resultado.nombre_cadena)
+        self.bytes.incrementar(resultado.tamano_bytes, cadena=resultado.nombre_cadena)
+        self.bytes_enviados.incrementar(
+            resultado.tamano_bytes if bytes_enviados is None else bytes_enviados, cadena=resultado.nombre_cadena
+        )
+    
+    def registrar_fallo(self, nombre_cadena: str, etapa: str):
+        self.fallos.incrementar(cadena=nombre_cadena, etapa=etapa)
+    
+    def registrar_rechazo(self, motivo: str):
+        self.rechazos.incrementar(motivo=motivo)
+    
+    @contextmanager
+    def medir(self, nombre_cadena: str, etapa: str):
+        """Span de una etapa medida en este proceso (p. ej. el envío a Telegram)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_etapa(nombre_cadena, etapa, time.perf_counter() - inicio)
+    
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in self._metricas:
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.exponer())
+        lineas.append("# HELP bot_inicio_segundos Instante de inicio del proceso (epoch)")
+        lineas.append("# TYPE bot_inicio_segundos gauge")
+        lineas.append(f"bot_inicio_segundos {self.inicio:.0f}")
+        return '\n'.join(lineas) + '\n'
+
+_registro_metricas = None
+
+def obtener_metricas() -> RegistroMetricas:
+    global _registro_metricas
+    
+    if _registro_metricas is None:
+        _registro_metricas = RegistroMetricas()
+    
+    return _registro_metricas
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        
+        cuerpo = obtener_metricas().exponer().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+    
+    def log_message(self, formato, *args):
+        logger.debug(f"Métricas {self.address_string()}: {formato % args}")
+
+_servidor_metricas = None
+
+def iniciar_servidor_metricas(host: str = None, puerto: int = None) -> Optional[ThreadingHTTPServer]:
+    """Levanta el endpoint /metrics en un hilo daemon; puerto 0 o METRICAS_HABILITADAS=false lo desactiva"""
+    global _servidor_metricas
+    
+    host = Config.METRICAS_HOST if host is None else host
+    puerto = Config.METRICAS_PUERTO if puerto is None else puerto
+    if not Config.METRICAS_HABILITADAS or puerto <= 0 or _servidor_metricas is not None:
+        return _servidor_metricas
+    
+    try:
+        _servidor_metricas = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+        _servidor_metricas.daemon_threads = True
+    except OSError as e:
+        logger.error(f"No se pudo iniciar el endpoint de métricas en {host}:{puerto}: {e}")
+        return None
+    
+    threading.Thread(target=_servidor_metricas.serve_forever, name='metricas', daemon=True).start()
+    logger.info(f"Métricas disponibles en http://{host}:{puerto}/metrics")
+    return _servidor_metricas
+
+def detener_servidor_metricas():
+    global _servidor_metricas
+    
+    if _servidor_metricas is not None:
+        _servidor_metricas.shutdown()
+        _servidor_metricas.server_close()
+        _servidor_metricas = None
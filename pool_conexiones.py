@@ -0,0 +1,203 @@
+# pool_conexiones.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class PoolConexiones:
+    """Pool thread-safe de conexiones reutilizables con verificación de salud y expiración por inactividad"""
+    
+    def __init__(
+        self,
+        fabrica: Callable[[], Any],
+        minimo: int = 1,
+        maximo: int = 5,
+        tiempo_inactividad: float = 300,
+        tiempo_espera: float = 30,
+        consulta_salud: str = 'SELECT 1'
+    ):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError(f"Tamaños de pool no válidos: minimo={minimo}, maximo={maximo}")
+        
+        self.fabrica = fabrica
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tiempo_inactividad = tiempo_inactividad
+        self.tiempo_espera = tiempo_espera
+        self.consulta_salud = consulta_salud
+        
+        # Conexiones libres como (conexion, instante de devolución); se reutiliza la más reciente
+        self._libres = deque()
+        self._total = 0
+        self._cerrado = False
+        self._condicion = threading.Condition()
+        
+        self._creadas = 0
+        self._descartadas = 0
+        self._reutilizadas = 0
+    
+    def _crear(self) -> Any:
+        conexion = self.fabrica()
+        with self._condicion:
+            self._creadas += 1
+        return conexion
+    
+    def _cerrar_conexion(self, conexion: Any):
+        try:
+            conexion.close()
+        except Exception as e:
+            logger.warning(f"Error al cerrar conexión del pool: {e}")
+    
+    def _es_saludable(self, conexion: Any) -> bool:
+        try:
+            cursor = conexion.cursor()
+            cursor.execute(self.consulta_salud)
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool no saludable, se descarta: {e}")
+            return False
+    
+    def _expirar_inactivas(self) -> list:
+        """Saca del pool las conexiones inactivas por sobre el mínimo (llamar con el lock tomado)"""
+        expiradas = []
+        ahora = time.monotonic()
+        
+        # Las más antiguas están al inicio de la cola
+        while self._libres and self._total > self.minimo:
+            conexion, devuelta_en = self._libres[0]
+            if ahora - devuelta_en < self.tiempo_inactividad:
+                break
+            self._libres.popleft()
+            self._total -= 1
+            self._descartadas += 1
+            expiradas.append(conexion)
+        
+        return expiradas
+    
+    def obtener(self) -> Any:
+        """Entrega una conexión saludable; crea una nueva si hay cupo o espera a que se libere una"""
+        limite = time.monotonic() + self.tiempo_espera
+        
+        while True:
+            conexion = None
+            crear = False
+            
+            with self._condicion:
+                if self._cerrado:
+                    raise RuntimeError("El pool de conexiones está cerrado")
+                
+                expiradas = self._expirar_inactivas()
+                
+                while not self._libres and self._total >= self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise TimeoutError(
+                            f"No hay conexiones disponibles tras {self.tiempo_espera}s "
+                            f"(máximo {self.maximo})"
+                        )
+                    self._condicion.wait(restante)
+                    if self._cerrado:
+                        raise RuntimeError("El pool de conexiones está cerrado")
+                
+                if self._libres:
+                    conexion, _ = self._libres.pop()
+                else:
+                    self._total += 1
+                    crear = True
+            
+            for expirada in expiradas:
+                self._cerrar_conexion(expirada)
+            
+            if crear:
+                try:
+                    return self._crear()
+                except Exception:
+                    with self._condicion:
+                        self._total -= 1
+                        self._condicion.notify()
+                    raise
+            
+            if self._es_saludable(conexion):
+                with self._condicion:
+                    self._reutilizadas += 1
+                return conexion
+            
+            self._cerrar_conexion(conexion)
+            with self._condicion:
+                self._total -= 1
+                self._descartadas += 1
+                self._condicion.notify()
+    
+    def liberar(self, conexion: Any, descartar: bool = False):
+        """Devuelve una conexión al pool; si está dañada o el pool cerró, se cierra"""
+        if conexion is None:
+            return
+        
+        if not descartar:
+            try:
+                # Dejar la conexión sin transacciones abiertas para el siguiente uso
+                conexion.rollback()
+            except Exception as e:
+                logger.warning(f"No se pudo reiniciar la conexión, se descarta: {e}")
+                descartar = True
+        
+        with self._condicion:
+            if self._cerrado or descartar:
+                self._total -= 1
+                self._descartadas += 1
+                cerrar = True
+            else:
+                self._libres.append((conexion, time.monotonic()))
+                cerrar = False
+            self._condicion.notify()
+        
+        if cerrar:
+            self._cerrar_conexion(conexion)
+    
+    def calentar(self) -> bool:
+        """Abre conexiones hasta alcanzar el mínimo; devuelve False si no se pudo conectar"""
+        conexiones = []
+        try:
+            with self._condicion:
+                faltantes = max(self.minimo - self._total, 0)
+            
+            # Si el pool ya está lleno basta con validar una conexión
+            for _ in range(max(faltantes, 1)):
+                conexiones.append(self.obtener())
+            
+            return True
+        except Exception as e:
+            logger.error(f"Error al calentar el pool de conexiones: {e}")
+            return False
+        finally:
+            for conexion in conexiones:
+                self.liberar(conexion)
+    
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            libres = [conexion for conexion, _ in self._libres]
+            self._libres.clear()
+            self._total -= len(libres)
+            self._condicion.notify_all()
+        
+        for conexion in libres:
+            self._cerrar_conexion(conexion)
+        
+        logger.info("Pool de conexiones cerrado")
+    
+    def estadisticas(self) -> Dict[str, int]:
+        with self._condicion:
+            return {
+                'total': self._total,
+                'libres': len(self._libres),
+                'en_uso': self._total - len(self._libres),
+                'creadas': self._creadas,
+                'reutilizadas': self._reutilizadas,
+                'descartadas': self._descartadas,
+            }
@@ -0,0 +1,121 @@
+# precalentamiento.py
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+from telegram.ext import Application, ContextTypes
+
+from admision import USUARIO_SISTEMA, RechazoAdmision, obtener_control_admision
+from cadenas_config import validar_cadena
+from config import Config
+from ejecutor_reportes import obtener_ejecutor_reportes
+from metricas import obtener_metricas
+
+logger = logging.getLogger(__name__)
+
+# Última actualización programada por cadena: {'en', 'estado', 'duracion', 'ruta'}
+ultimas_actualizaciones: Dict[str, Dict] = {}
+
+async def precalentar_reportes(context: ContextTypes.DEFAULT_TYPE):
+    """Regenera los reportes configurados y los deja en el cache con la vigencia de precalentamiento"""
+    from db_consultas import procesar_cadena_simple
+    
+    cadenas = [cadena for cadena in Config.PRECALENTAR_CADENAS if validar_cadena(cadena)]
+    ejecutor = obtener_ejecutor_reportes()
+    
+    logger.info(f"Precalentando reportes de {len(cadenas)} cadenas...")
+    
+    # Secuencial y por el control de admisión: cada cadena ocupa un cupo como una solicitud más,
+    # así el precalentamiento no deja sin workers a los usuarios ni los usuarios lo saltan
+    admision = obtener_control_admision()
+    for nombre_cadena in cadenas:
+        inicio = time.perf_counter()
+        try:
+            turno = admision.solicitar(USUARIO_SISTEMA)
+        except RechazoAdmision as e:
+            logger.warning(f"Precalentamiento de {nombre_cadena} omitido: {e}")
+            ultimas_actualizaciones[nombre_cadena] = {
+                'en': datetime.now(),
+                'estado': 'omitido',
+                'duracion': time.perf_counter() - inicio,
+                'ruta': None,
+            }
+            continue
+        
+        try:
+            await admision.esperar(turno)
+            resultado = await ejecutor.ejecutar(
+                procesar_cadena_simple,
+                nombre_cadena,
+                forzar=True,
+                vigencia_cache=Config.PRECALENTAR_VIGENCIA,
+                para_envio=True
+            )
+            if not ejecutor.admite_callbacks:
+                obtener_metricas().registrar_generacion(nombre_cadena, resultado)
+            estado = 'ok' if resultado else 'error'
+        except Exception as e:
+            logger.error(f"Error al precalentar {nombre_cadena}: {e}")
+            obtener_metricas().registrar_fallo(nombre_cadena, 'generacion')
+            resultado, estado = None, 'error'
+        finally:
+            admision.liberar(turno)
+        
+        ultimas_actualizaciones[nombre_cadena] = {
+            'en': datetime.now(),
+            'estado': estado,
+            'duracion': time.perf_counter() - inicio,
+            'ruta': resultado.ruta if resultado else None,
+        }
+        logger.info(f"Precalentamiento {nombre_cadena}: {estado}")
+
+def registrar_precalentamiento(application: Application) -> Optional[object]:
+    """Programa el precalentamiento con la expresión cron de PRECALENTAR_CRON"""
+    if not Config.PRECALENTAR_CADENAS:
+        logger.info("Precalentamiento desactivado (PRECALENTAR_CADENAS vacío)")
+        return None
+    
+    invalidas = [cadena for cadena in Config.PRECALENTAR_CADENAS if not validar_cadena(cadena)]
+    if invalidas:
+        logger.warning(f"Cadenas de precalentamiento no válidas, se omiten: {invalidas}")
+    
+    if application.job_queue is None:
+        logger.warning("JobQueue no disponible: instala python-telegram-bot[job-queue] para precalentar reportes")
+        return None
+    
+    trigger = CronTrigger.from_crontab(Config.PRECALENTAR_CRON, timezone=pytz.timezone(Config.ZONA_HORARIA))
+    job = application.job_queue.run_custom(
+        precalentar_reportes,
+        job_kwargs={'trigger': trigger},
+        name='precalentar_reportes'
+    )
+    
+    logger.info(
+        f"Precalentamiento programado ({Config.PRECALENTAR_CRON}, {Config.ZONA_HORARIA}) "
+        f"para: {', '.join(Config.PRECALENTAR_CADENAS)}"
+    )
+    return job
+
+def texto_estado_precalentamiento(job=None) -> str:
+    if not Config.PRECALENTAR_CADENAS:
+        return "Precalentamiento de reportes: desactivado"
+    
+    lineas = [f"Precalentamiento de reportes ({Config.PRECALENTAR_CRON}):"]
+    
+    for nombre_cadena in [cadena for cadena in Config.PRECALENTAR_CADENAS if validar_cadena(cadena)]:
+        actualizacion = ultimas_actualizaciones.get(nombre_cadena)
+        if actualizacion is None:
+            lineas.append(f"- {nombre_cadena}: sin actualizar aún")
+        else:
+            lineas.append(
+                f"- {nombre_cadena}: {actualizacion['en'].strftime('%d/%m %H:%M')} "
+                f"({actualizacion['estado']}, {actualizacion['duracion']:.0f}s)"
+            )
+    
+    if job is not None and job.next_t is not None:
+        lineas.append(f"Próxima ejecución: {job.next_t.astimezone(pytz.timezone(Config.ZONA_HORARIA)).strftime('%d/%m %H:%M')}")
+    
+    return "\n".join(lineas)
@@ -0,0 +1,60 @@
+# resultado_reporte.py
+import hashlib
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+@dataclass
+class ResultadoReporte:
+    """Metadatos de un reporte generado; evita volver a leer el archivo para describirlo"""
+    ruta: str
+    nombre_cadena: str
+    tamano_bytes: int
+    filas: int
+    columnas: int
+    categorias: int
+    hash_contenido: str
+    tiempos: Dict[str, float] = field(default_factory=dict)
+    generado_en: float = field(default_factory=time.time)
+    desde_cache: bool = False
+    # 'completo' (matriz PLU x categoría) o 'cambios' (delta contra el snapshot base_cambios)
+    tipo: str = 'completo'
+    base_cambios: Optional[float] = None
+    # 'sql' (consulta al SP) o 'almacen' (copia local capturada en datos_capturados_en)
+    origen_datos: str = 'sql'
+    datos_capturados_en: Optional[float] = None
+    formato: str = 'xlsx'
+    # Archivos a subir (ArchivoEntrega.a_dict): el reporte, su zip o sus partes; vacío si no se preparó el envío
+    entrega: List[Dict] = field(default_factory=list)
+    
+    @property
+    def nombre_archivo(self) -> str:
+        return os.path.basename(self.ruta)
+    
+    @property
+    def tamano_kb(self) -> float:
+        return self.tamano_bytes / 1024
+    
+    def a_dict(self) -> Dict:
+        return asdict(self)
+    
+    @classmethod
+    def desde_dict(cls, datos: Dict) -> 'ResultadoReporte':
+        campos = cls.__dataclass_fields__
+        return cls(**{clave: valor for clave, valor in datos.items() if clave in campos})
+
+def calcular_hash_matriz(df_final: 'pd.DataFrame') -> str:
+    """
+    Hash SHA-256 del contenido de la matriz (encabezados y valores). A diferencia del hash
+    del archivo, no cambia con la fecha de creación que openpyxl graba en el xlsx.
+    """
+    import pandas as pd
+    
+    hash_sha = hashlib.sha256()
+    hash_sha.update('\x1f'.join(str(columna) for columna in df_final.columns).encode('utf-8'))
+    hash_sha.update(pd.util.hash_pandas_object(df_final, index=False).to_numpy().tobytes())
+    return hash_sha.hexdigest()
@@ -0,0 +1,14 @@
+# conftest.py
+import os
+import tempfile
+
+# Config lee el entorno al importarse: las pruebas escriben en un directorio temporal y usan el backend local
+_DIRECTORIO_PRUEBAS = tempfile.mkdtemp(prefix='pruebas_precios_')
+os.environ.setdefault('DOWNLOAD_DIR', os.path.join(_DIRECTORIO_PRUEBAS, 'descargas'))
+os.environ.setdefault('ALMACEN_RUTA', os.path.join(_DIRECTORIO_PRUEBAS, 'almacen_precios.db'))
+os.environ.setdefault('BACKEND_LOCAL_RUTA', os.path.join(_DIRECTORIO_PRUEBAS, 'sqlserver_local.db'))
+os.environ.setdefault('DB_BACKEND', 'local')
+os.environ.setdefault('METRICAS_HABILITADAS', 'false')
+os.environ.setdefault('BACKEND_LOCAL_PLUS', '200')
+os.environ.setdefault('BACKEND_LOCAL_CATEGORIAS', '5')
+os.environ.setdefault('PRECALENTAR_CADENAS', '')
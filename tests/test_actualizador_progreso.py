@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+import actualizador_progreso
+from actualizador_progreso import ActualizadorProgreso
+
+class EditorFalso:
+    def __init__(self, fallos=()):
+        self.ediciones = []
+        self.fallos = list(fallos)
+    
+    async def __call__(self, texto):
+        if self.fallos:
+            raise self.fallos.pop(0)
+        self.ediciones.append((time.monotonic(), texto))
+    
+    @property
+    def textos(self):
+        return [texto for _, texto in self.ediciones]
+
+async def _terminar(actualizador, texto_final=None):
+    """Cierra y espera a que el ciclo de ediciones termine"""
+    actualizador.cerrar(texto_final)
+    await asyncio.wait_for(asyncio.gather(*actualizador_progreso._tareas_activas), 5)
+
+def test_agrupa_los_textos_publicados_durante_el_intervalo():
+    async def escenario():
+        editor = EditorFalso()
+        actualizador = ActualizadorProgreso(editor, intervalo=0.05)
+        actualizador.publicar('categorías')
+        await asyncio.sleep(0.01)
+        for texto in ('lote 1', 'lote 2', 'lote 3'):
+            actualizador.publicar(texto)
+        await asyncio.sleep(0.1)
+        actualizador.publicar('lote 3')
+        await _terminar(actualizador)
+        return editor, actualizador
+    
+    editor, actualizador = asyncio.run(escenario())
+    
+    assert editor.textos == ['categorías', 'lote 3']
+    assert actualizador.descartados == 2
+    assert actualizador.ediciones == 2
+
+def test_respeta_el_intervalo_entre_ediciones():
+    async def escenario():
+        editor = EditorFalso()
+        actualizador = ActualizadorProgreso(editor, intervalo=0.1)
+        for numero in range(5):
+            actualizador.publicar(f"paso {numero}")
+            await asyncio.sleep(0.03)
+        await _terminar(actualizador, 'listo')
+        return editor
+    
+    editor = asyncio.run(escenario())
+    instantes = [instante for instante, _ in editor.ediciones]
+    
+    assert editor.textos[0] == 'paso 0' and editor.textos[-1] == 'listo'
+    assert len(editor.textos) < 6
+    assert all(siguiente - anterior >= 0.095 for anterior, siguiente in zip(instantes, instantes[1:]))
+
+def test_retry_after_posterga_la_siguiente_edicion():
+    async def escenario():
+        editor = EditorFalso(fallos=[RetryAfter(1)])
+        actualizador = ActualizadorProgreso(editor, intervalo=0.01)
+        inicio = time.monotonic()
+        actualizador.publicar('rechazado')
+        await asyncio.sleep(0.05)
+        actualizador.publicar('después de esperar')
+        await asyncio.sleep(0.5)
+        assert editor.ediciones == []
+        await asyncio.sleep(0.7)
+        await _terminar(actualizador)
+        return editor, inicio
+    
+    editor, inicio = asyncio.run(escenario())
+    
+    assert editor.textos == ['después de esperar']
+    assert editor.ediciones[0][0] - inicio >= 1
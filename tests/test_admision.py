@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from admision import RECHAZO_COLA, RECHAZO_USUARIO, ControlAdmision, RechazoAdmision
+
+def _control(**kwargs):
+    parametros = {'max_concurrentes': 2, 'max_por_usuario': 1, 'max_cola': 2, 'duracion_inicial': 60}
+    parametros.update(kwargs)
+    return ControlAdmision(**parametros)
+
+def test_admite_hasta_el_cupo_y_encola_el_resto():
+    async def escenario():
+        control = _control()
+        primero, segundo, tercero, cuarto = (control.solicitar(usuario) for usuario in (1, 2, 3, 4))
+        
+        assert primero.admitido and segundo.admitido
+        assert (control.posicion(tercero), control.posicion(cuarto)) == (1, 2)
+        assert control.espera_estimada(1) == 60
+        assert control.espera_estimada(3) == 120
+        
+        control.liberar(primero)
+        assert tercero.admitido
+        assert control.posicion(cuarto) == 1
+        assert (control.activos, control.en_cola) == (2, 1)
+    
+    asyncio.run(escenario())
+
+def test_rechaza_por_usuario_y_por_cola_llena():
+    async def escenario():
+        control = _control(max_cola=1)
+        control.solicitar(1)
+        control.solicitar(2)
+        control.solicitar(3)
+        
+        with pytest.raises(RechazoAdmision) as rechazo_usuario:
+            control.solicitar(1)
+        with pytest.raises(RechazoAdmision) as rechazo_cola:
+            control.solicitar(4)
+        
+        assert rechazo_usuario.value.motivo == RECHAZO_USUARIO
+        assert rechazo_cola.value.motivo == RECHAZO_COLA
+        assert control.rechazados == {RECHAZO_USUARIO: 1, RECHAZO_COLA: 1}
+    
+    asyncio.run(escenario())
+
+def test_esperar_avisa_la_posicion_y_liberar_es_idempotente():
+    async def escenario():
+        control = _control(max_concurrentes=1)
+        activo = control.solicitar(1)
+        en_cola = control.solicitar(2)
+        avisos = []
+        
+        async def al_avanzar(posicion, espera):
+            avisos.append(posicion)
+        
+        espera = asyncio.ensure_future(control.esperar(en_cola, al_avanzar))
+        await asyncio.sleep(0)
+        control.liberar(activo)
+        control.liberar(activo)
+        await asyncio.wait_for(espera, 1)
+        
+        assert avisos == [1]
+        assert en_cola.admitido
+        assert control.activos == 1
+        
+        control.liberar(en_cola)
+        assert (control.activos, control.en_cola) == (0, 0)
+        # El usuario liberado puede volver a pedir
+        assert control.solicitar(2).admitido
+    
+    asyncio.run(escenario())
+
+def test_turno_cancelado_sale_de_la_cola():
+    async def escenario():
+        control = _control(max_concurrentes=1)
+        control.solicitar(1)
+        cancelado = control.solicitar(2)
+        siguiente = control.solicitar(3)
+        
+        control.liberar(cancelado)
+        
+        assert control.posicion(siguiente) == 1
+        assert control.en_cola == 1
+    
+    asyncio.run(escenario())
+
+def test_admision_durante_el_aviso_no_se_pierde():
+    async def escenario():
+        control = _control(max_concurrentes=1)
+        activo = control.solicitar(1)
+        en_cola = control.solicitar(2)
+        
+        async def al_avanzar(posicion, espera):
+            # Como una edición de mensaje en Telegram: el cupo se libera mientras está en vuelo
+            control.liberar(activo)
+            await asyncio.sleep(0.05)
+        
+        await asyncio.wait_for(control.esperar(en_cola, al_avanzar), 1)
+        
+        assert en_cola.admitido
+        assert control.activos == 1
+    
+    asyncio.run(escenario())
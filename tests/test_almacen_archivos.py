@@ -0,0 +1,97 @@
+import os
+import time
+
+import pytest
+
+import almacen_archivos
+from almacen_archivos import AlmacenArchivos
+from cache_reportes import CacheReportes
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    # Grupos según un índice de reportes vacío propio de la prueba
+    cache = CacheReportes(str(tmp_path / '.cache_reportes.json'), ttl=60)
+    monkeypatch.setattr(almacen_archivos, 'obtener_cache_reportes', lambda: cache)
+    return tmp_path
+
+def _archivo(directorio, nombre, tamano, hace):
+    ruta = str(directorio / nombre)
+    with open(ruta, 'wb') as f:
+        f.write(b'x' * tamano)
+    instante = time.time() - hace
+    os.utime(ruta, (instante, instante))
+    return ruta
+
+def test_desaloja_los_menos_usados_hasta_quedar_bajo_el_tope(directorio):
+    antiguo = _archivo(directorio, 'antiguo.csv', 400, hace=300)
+    intermedio = _archivo(directorio, 'intermedio.csv', 400, hace=200)
+    reciente = _archivo(directorio, 'reciente.csv', 400, hace=100)
+    almacen = AlmacenArchivos(str(directorio), max_bytes=900, max_edad=0, proteccion=0)
+    
+    resultado = almacen.limpiar()
+    
+    assert resultado == {'eliminados': 1, 'bytes_liberados': 400}
+    assert not os.path.exists(antiguo)
+    assert os.path.exists(intermedio) and os.path.exists(reciente)
+
+def test_tocar_renueva_el_ultimo_uso(directorio):
+    antiguo = _archivo(directorio, 'antiguo.csv', 400, hace=300)
+    reciente = _archivo(directorio, 'reciente.csv', 400, hace=100)
+    almacen = AlmacenArchivos(str(directorio), max_bytes=500, max_edad=0, proteccion=0)
+    
+    almacen.tocar(antiguo)
+    almacen.limpiar()
+    
+    assert os.path.exists(antiguo)
+    assert not os.path.exists(reciente)
+
+def test_archivos_en_uso_o_recientes_no_se_desalojan(directorio):
+    en_uso = _archivo(directorio, 'en_uso.csv', 400, hace=3000)
+    protegido = _archivo(directorio, 'protegido.csv', 400, hace=10)
+    almacen = AlmacenArchivos(str(directorio), max_bytes=100, max_edad=0, proteccion=60)
+    
+    with almacen.en_uso(en_uso):
+        assert almacen.limpiar()['eliminados'] == 0
+    
+    assert os.path.exists(en_uso) and os.path.exists(protegido)
+    # Al terminar la subida el archivo queda marcado como recién usado
+    assert almacen.limpiar()['eliminados'] == 0
+    assert almacen.estadisticas()['en_uso'] == 0
+
+def test_reporte_y_su_zip_se_desalojan_juntos_y_vencen_por_edad(directorio):
+    reporte = _archivo(directorio, 'reporte.csv', 100, hace=10 * 86400)
+    comprimido = _archivo(directorio, 'reporte.csv.zip', 50, hace=60)
+    vigente = _archivo(directorio, 'vigente.csv', 100, hace=60)
+    _archivo(directorio, '.cache_reportes.json', 10, hace=10 * 86400)
+    almacen = AlmacenArchivos(str(directorio), max_bytes=0, max_edad=86400 * 7, proteccion=0)
+    
+    almacen.limpiar()
+    
+    assert os.path.exists(reporte) and os.path.exists(comprimido)
+    os.utime(comprimido, (time.time() - 8 * 86400,) * 2)
+    almacen.limpiar()
+    assert not os.path.exists(reporte) and not os.path.exists(comprimido)
+    assert os.path.exists(vigente)
+    assert os.path.exists(str(directorio / '.cache_reportes.json'))
+
+def test_temporales_huerfanos_se_eliminan(directorio):
+    huerfano = _archivo(directorio, 'reporte.csv.123.456.tmp', 10, hace=7200)
+    en_escritura = _archivo(directorio, 'otro.csv.123.789.tmp', 10, hace=5)
+    almacen = AlmacenArchivos(str(directorio), max_bytes=0, max_edad=0, proteccion=0)
+    
+    almacen.limpiar()
+    
+    assert not os.path.exists(huerfano)
+    assert os.path.exists(en_escritura)
+
+def test_escritura_atomica_no_deja_archivo_a_medias(directorio):
+    almacen = AlmacenArchivos(str(directorio))
+    ruta = str(directorio / 'reporte.csv')
+    
+    with pytest.raises(ValueError):
+        with almacen.escritura_atomica(ruta) as temporal:
+            with open(temporal, 'w') as f:
+                f.write('parcial')
+            raise ValueError("falla al escribir")
+    
+    assert os.listdir(directorio) == []
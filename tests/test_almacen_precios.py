@@ -0,0 +1,80 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from almacen_precios import AlmacenPrecios
+
+COLUMNAS_SP = {
+    'plu_num': 'plu_num_plu',
+    'plu_id': 'plu_id',
+    'descripcion': 'plu_descripcion',
+    'pvp': 'pr_pvp',
+    'categoria_id': 'IDCategoria',
+}
+
+CLAVE = AlmacenPrecios.clave(10, 'Canal', None, ['C1'])
+
+def _lotes(precio, cantidad=2):
+    for numero in range(cantidad):
+        yield pd.DataFrame({
+            'plu_num_plu': [numero],
+            'plu_id': [f"P{numero}"],
+            'plu_descripcion': [f"Producto {numero}"],
+            'pr_pvp': [precio],
+            'IDCategoria': ['C1'],
+        })
+
+def _escritor(almacen, precio):
+    return almacen.registrar_lotes(CLAVE, _lotes(precio), lambda lote: COLUMNAS_SP, cdn_id=10)
+
+def _filas(almacen):
+    with closing(sqlite3.connect(almacen.ruta)) as conexion:
+        capturas = conexion.execute("SELECT id, completa, registros FROM capturas").fetchall()
+        precios = conexion.execute("SELECT captura_id, pr_pvp FROM precios").fetchall()
+    return capturas, precios
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenPrecios(ruta=str(tmp_path / 'almacen.db'), max_antiguedad=3600, refresco_max=600)
+
+def test_escritor_que_empezo_despues_gana_aunque_publique_primero(almacen):
+    primero, segundo = _escritor(almacen, 1.0), _escritor(almacen, 2.0)
+    next(primero)
+    
+    # El segundo escritor completa y publica mientras el primero sigue en curso
+    assert len(list(segundo)) == 2
+    assert len(list(primero)) == 1
+    
+    capturas, precios = _filas(almacen)
+    captura = almacen.captura(CLAVE)
+    assert capturas == [(captura['id'], 1, 2)]
+    assert {pvp for _, pvp in precios} == {2.0}
+    assert {captura_id for captura_id, _ in precios} == {captura['id']}
+
+def test_publicar_no_borra_la_captura_en_curso_de_otro_escritor(almacen):
+    primero, segundo = _escritor(almacen, 1.0), _escritor(almacen, 2.0)
+    next(primero)
+    next(segundo)
+    
+    assert len(list(primero)) == 1
+    capturas, _ = _filas(almacen)
+    assert len(capturas) == 2
+    
+    assert len(list(segundo)) == 1
+    capturas, precios = _filas(almacen)
+    assert capturas == [(almacen.captura(CLAVE)['id'], 1, 2)]
+    assert {pvp for _, pvp in precios} == {2.0}
+
+def test_captura_borrada_antes_de_publicarse_no_deja_precios_huerfanos(almacen):
+    escritor = _escritor(almacen, 1.0)
+    next(escritor)
+    with closing(sqlite3.connect(almacen.ruta)) as conexion:
+        conexion.execute("DELETE FROM capturas")
+        conexion.commit()
+    
+    list(escritor)
+    
+    assert almacen.captura(CLAVE) is None
+    assert _filas(almacen) == ([], [])
@@ -0,0 +1,61 @@
+import pytest
+
+from backends_db import BackendDB, BackendLocal
+from db_consultas import SP_LISTADO_PRECIOS
+
+def test_backend_incompleto_no_se_puede_instanciar():
+    class BackendSinConexion(BackendDB):
+        nombre = 'incompleto'
+        
+        @property
+        def Error(self):
+            return Exception
+        
+        @property
+        def ErrorProgramacion(self):
+            return Exception
+    
+    with pytest.raises(TypeError):
+        BackendSinConexion()
+
+def test_backend_local_abre_conexion_saludable(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.BACKEND_LOCAL_PLUS', 20)
+    monkeypatch.setattr('config.Config.BACKEND_LOCAL_CATEGORIAS', 3)
+    backend = BackendLocal(ruta=str(tmp_path / 'local.db'))
+    conexion = backend.conectar()
+    try:
+        cursor = conexion.cursor()
+        cursor.execute(backend.consulta_salud)
+        assert cursor.fetchone() is not None
+    finally:
+        conexion.close()
+
+def test_cupo_de_sp_se_ocupa_hasta_leer_todo_el_result_set(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.BACKEND_LOCAL_PLUS', 20)
+    monkeypatch.setattr('config.Config.BACKEND_LOCAL_CATEGORIAS', 3)
+    monkeypatch.setattr('config.Config.BACKEND_LOCAL_CONCURRENCIA', 1)
+    backend = BackendLocal(ruta=str(tmp_path / 'local.db'))
+    conexion = backend.conectar()
+    try:
+        categorias = ','.join(fila[0] for fila in conexion.sqlite.execute("SELECT IDCategoria FROM Categoria WHERE cdn_id = 12"))
+        
+        def cupo_libre():
+            if not backend._cupo_sp.acquire(blocking=False):
+                return False
+            backend._cupo_sp.release()
+            return True
+        
+        cursor = conexion.cursor()
+        cursor.execute(SP_LISTADO_PRECIOS, (12, categorias, 'Todos', ''))
+        assert cursor.fetchmany(5)
+        assert not cupo_libre()
+        while cursor.fetchmany(5):
+            assert not cupo_libre()
+        assert cupo_libre()
+        
+        cursor.execute(SP_LISTADO_PRECIOS, (12, categorias, 'Todos', ''))
+        assert not cupo_libre()
+        cursor.close()
+        assert cupo_libre()
+    finally:
+        conexion.close()
@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmark_arranque import MODULOS_PESADOS, _entorno_medicion, comparar_resultados
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importar_bot_no_carga_modulos_pesados(tmp_path):
+    # Intérprete nuevo: en el de pytest otras pruebas ya importaron pandas
+    proceso = subprocess.run(
+        [sys.executable, '-c', (
+            "import json, sys\n"
+            "import bot\n"
+            f"print(json.dumps([modulo for modulo in {MODULOS_PESADOS!r} if modulo in sys.modules]))"
+        )],
+        cwd=RAIZ, env=_entorno_medicion(str(tmp_path), 'local'), capture_output=True, text=True, timeout=60
+    )
+    
+    assert proceso.returncode == 0, proceso.stderr
+    assert json.loads(proceso.stdout.strip().splitlines()[-1]) == []
+
+def test_comparacion_marca_regresiones_sobre_el_umbral():
+    anterior = {'etapas': {'import_bot': {'segundos': 1.0}, 'verificacion_bd': {'segundos': 2.0}}}
+    actual = {'etapas': {
+        'import_bot': {'segundos': 1.3},
+        'verificacion_bd': {'segundos': 2.2},
+        'listo_para_atender': {'segundos': 1.5},
+    }}
+    
+    comparacion = {fila['etapa']: fila for fila in comparar_resultados(actual, anterior, umbral=0.2)}
+    
+    assert set(comparacion) == {'import_bot', 'verificacion_bd'}
+    assert comparacion['import_bot']['regresion']
+    assert not comparacion['verificacion_bd']['regresion']
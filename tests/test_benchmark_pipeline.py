@@ -0,0 +1,33 @@
+import pytest
+
+import db_consultas
+from benchmark_pipeline import BackendSintetico, ConsultasSinteticas, ejecutar_benchmark
+from config import Config
+
+def test_valores_temporales_restaura_config_aunque_falle():
+    original = Config.REPORTE_CACHE_TTL
+    
+    with pytest.raises(RuntimeError):
+        with Config.valores_temporales(REPORTE_CACHE_TTL=0):
+            assert Config.REPORTE_CACHE_TTL == 0
+            raise RuntimeError("falla dentro del bloque")
+    
+    assert Config.REPORTE_CACHE_TTL == original
+
+def test_consultas_sinteticas_no_usa_el_backend_configurado(monkeypatch):
+    def obtener_backend():
+        raise AssertionError("no debe resolver el backend ni leer credenciales")
+    
+    monkeypatch.setattr(db_consultas, 'obtener_backend', obtener_backend)
+    
+    consultas = ConsultasSinteticas(None, None, '.')
+    
+    assert isinstance(consultas.backend, BackendSintetico)
+
+def test_benchmark_no_deja_cambios_en_config():
+    antes = (Config.DOWNLOAD_DIR, Config.SNAPSHOTS_DIR, Config.REPORTE_CACHE_TTL, Config.ALMACEN_HABILITADO)
+    
+    resultados = ejecutar_benchmark(['50x3'], formatos=['csv'], memoria=False)
+    
+    assert resultados['escenarios'][0]['etapas']['pipeline']['segundos'] >= 0
+    assert (Config.DOWNLOAD_DIR, Config.SNAPSHOTS_DIR, Config.REPORTE_CACHE_TTL, Config.ALMACEN_HABILITADO) == antes
@@ -0,0 +1,69 @@
+import pandas as pd
+
+import cache_categorias
+from cache_categorias import CacheCategorias
+from cadenas_config import obtener_categorias_excluidas
+from db_consultas import ConsultasDB
+
+def _categorias():
+    return pd.DataFrame({'IDCategoria': ['A', 'B'], 'cat_abreviatura': ['A', 'B'], 'cat_descripcion': ['UNO', 'DOS']})
+
+def test_entrada_vence_con_el_ttl(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_categorias.time, 'monotonic', lambda: ahora[0])
+    cache = CacheCategorias(ttl=60)
+    cache.guardar(12, _categorias())
+    
+    ahora[0] += 59
+    assert cache.obtener(12) is not None
+    
+    ahora[0] += 1
+    assert cache.obtener(12) is None
+    assert cache.estadisticas() == {'entradas': 0, 'aciertos': 1, 'fallos': 1}
+
+def test_devuelve_copias_independientes():
+    cache = CacheCategorias(ttl=60)
+    original = _categorias()
+    cache.guardar(12, original)
+    original.loc[0, 'cat_descripcion'] = 'MODIFICADA'
+    
+    copia = cache.obtener(12)
+    copia.loc[1, 'cat_descripcion'] = 'OTRA'
+    
+    assert list(cache.obtener(12)['cat_descripcion']) == ['UNO', 'DOS']
+
+def test_invalidar_una_cadena_o_todas():
+    cache = CacheCategorias(ttl=60)
+    cache.guardar(8, _categorias())
+    cache.guardar(12, _categorias())
+    
+    cache.invalidar(8)
+    assert cache.obtener(8) is None
+    assert cache.obtener(12) is not None
+    
+    cache.invalidar()
+    assert cache.obtener(12) is None
+    assert cache.estadisticas() == {'entradas': 0, 'aciertos': 1, 'fallos': 2}
+
+def test_ttl_cero_no_guarda():
+    cache = CacheCategorias(ttl=0)
+    cache.guardar(12, _categorias())
+    
+    assert not cache.habilitado
+    assert cache.estadisticas()['entradas'] == 0
+
+def test_guarda_las_categorias_ya_filtradas(monkeypatch):
+    cache = CacheCategorias(ttl=60)
+    monkeypatch.setattr(cache_categorias, '_cache_categorias', cache)
+    consultas = ConsultasDB()
+    try:
+        desde_bd = consultas.obtener_categorias_por_cadena(12)
+        desde_cache = consultas.obtener_categorias_por_cadena(12)
+    finally:
+        consultas.desconectar()
+    
+    excluidas = obtener_categorias_excluidas(12)
+    assert excluidas and not desde_bd['IDCategoria'].isin(excluidas).any()
+    assert not cache.obtener(12)['IDCategoria'].isin(excluidas).any()
+    pd.testing.assert_frame_equal(desde_cache, desde_bd)
+    assert (cache.aciertos, cache.fallos) == (2, 1)
@@ -0,0 +1,65 @@
+import pytest
+
+from cache_envios import CacheEnvios
+
+@pytest.fixture
+def ruta_indice(tmp_path):
+    return str(tmp_path / '.cache_envios.json')
+
+def test_clave_distingue_formato_compresion_y_parte():
+    claves = {
+        CacheEnvios.clave('abc', 'xlsx'),
+        CacheEnvios.clave('abc', 'csv'),
+        CacheEnvios.clave('abc', 'csv', comprimido=True),
+        CacheEnvios.clave('abc', 'csv', comprimido=True, parte=1, partes=2),
+        CacheEnvios.clave('abc', 'csv', comprimido=True, parte=2, partes=2),
+        CacheEnvios.clave('def', 'xlsx'),
+    }
+    
+    assert len(claves) == 6
+    assert CacheEnvios.clave('abc', 'xlsx') == 'abc|xlsx|plano|1/1'
+    assert CacheEnvios.clave('abc', 'csv', True, 2, 3) == 'abc|csv|zip|2/3'
+
+def test_file_id_se_comparte_entre_instancias_y_vence(ruta_indice, monkeypatch):
+    clave = CacheEnvios.clave('abc', 'xlsx')
+    CacheEnvios(ruta_indice, ttl=60).guardar(clave, 'FILE-1', 'JUAN VALDEZ', 'completo')
+    
+    cache = CacheEnvios(ruta_indice, ttl=60)
+    assert cache.obtener(clave) == 'FILE-1'
+    
+    monkeypatch.setattr('cache_envios.time.time', lambda: 10 ** 12)
+    assert cache.obtener(clave) is None
+    assert cache.estadisticas() == {'entradas': 0, 'aciertos': 1, 'fallos': 1}
+
+def test_contenido_nuevo_reemplaza_el_de_la_misma_cadena_y_tipo(ruta_indice):
+    cache = CacheEnvios(ruta_indice, ttl=60)
+    anterior, otra_cadena = CacheEnvios.clave('abc', 'xlsx'), CacheEnvios.clave('xyz', 'xlsx')
+    cache.guardar(anterior, 'FILE-1', 'JUAN VALDEZ', 'completo')
+    cache.guardar(otra_cadena, 'FILE-2', 'CAJUN', 'completo')
+    
+    cache.guardar(CacheEnvios.clave('def', 'xlsx'), 'FILE-3', 'JUAN VALDEZ', 'completo')
+    
+    assert cache.obtener(anterior) is None
+    assert cache.obtener(otra_cadena) == 'FILE-2'
+
+def test_descartar_y_cache_deshabilitado(ruta_indice):
+    clave = CacheEnvios.clave('abc', 'xlsx')
+    cache = CacheEnvios(ruta_indice, ttl=60)
+    cache.guardar(clave, 'FILE-1', 'JUAN VALDEZ', 'completo')
+    
+    cache.descartar(clave)
+    
+    assert cache.obtener(clave) is None
+    deshabilitado = CacheEnvios(ruta_indice, ttl=0)
+    deshabilitado.guardar(clave, 'FILE-1', 'JUAN VALDEZ', 'completo')
+    assert deshabilitado.obtener(clave) is None
+
+def test_mismo_contenido_con_otro_nombre_no_reutiliza_el_file_id(ruta_indice):
+    cache = CacheEnvios(ruta_indice, ttl=60)
+    ayer = CacheEnvios.clave('abc', 'xlsx', nombre_archivo='Precios_Plu_CAJUN_20261017_090000.xlsx')
+    hoy = CacheEnvios.clave('abc', 'xlsx', nombre_archivo='Precios_Plu_CAJUN_20261018_090000.xlsx')
+    cache.guardar(ayer, 'FILE-1', 'CAJUN', 'completo')
+    
+    assert ayer != hoy
+    assert cache.obtener(ayer) == 'FILE-1'
+    assert cache.obtener(hoy) is None
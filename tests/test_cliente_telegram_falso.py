@@ -0,0 +1,15 @@
+import socket
+
+import pytest
+
+pytest.importorskip('tornado', reason="el modo webhook de python-telegram-bot requiere tornado")
+
+from cliente_telegram_falso import ejecutar_prueba
+
+def _puerto_libre() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_flujo_completo_por_webhook():
+    assert ejecutar_prueba('JUAN VALDEZ', puerto_webhook=_puerto_libre(), timeout=120)
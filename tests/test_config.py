@@ -0,0 +1,42 @@
+import os
+
+import bot
+from config import Config
+
+def test_modo_servidor_mal_escrito_no_es_valido(monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'MODO_SERVIDOR', 'webhok')
+    
+    assert not Config.validar()
+    assert "MODO_SERVIDOR" in capsys.readouterr().out
+
+def test_main_no_arranca_con_configuracion_invalida(monkeypatch):
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123456:prueba')
+    monkeypatch.setattr(Config, 'TELEGRAM_BOT_TOKEN', '123456:prueba')
+    monkeypatch.setattr(Config, 'MODO_SERVIDOR', 'webhok')
+    
+    def no_debe_llamarse():
+        raise AssertionError("main() siguió con una configuración inválida")
+    
+    monkeypatch.setattr(bot, 'iniciar_servidor_metricas', no_debe_llamarse)
+    monkeypatch.setattr(bot, 'obtener_credenciales_manager', no_debe_llamarse)
+    
+    assert bot.main() is None
+
+def test_caches_compartidos_siguen_los_valores_temporales(tmp_path):
+    from almacen_archivos import obtener_almacen_archivos
+    from cache_envios import obtener_cache_envios
+    from cache_reportes import obtener_cache_reportes
+    
+    cache_reportes, cache_envios, almacen = obtener_cache_reportes(), obtener_cache_envios(), obtener_almacen_archivos()
+    directorio = str(tmp_path)
+    
+    with Config.valores_temporales(DOWNLOAD_DIR=directorio, REPORTE_CACHE_TTL=0, ENVIOS_CACHE_TTL=0, ARCHIVOS_MAX_MB=1):
+        assert obtener_cache_reportes() is cache_reportes
+        assert not cache_reportes.habilitado and not cache_envios.habilitado
+        assert cache_reportes.ruta_indice.startswith(directorio)
+        assert cache_envios.ruta_indice.startswith(directorio)
+        assert almacen.directorio == directorio
+        assert almacen.max_bytes == 1024 * 1024
+    
+    assert cache_reportes.habilitado and cache_envios.habilitado
+    assert almacen.directorio == os.path.abspath(Config.DOWNLOAD_DIR) != directorio
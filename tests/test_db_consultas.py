@@ -0,0 +1,99 @@
+import decimal
+
+import pandas as pd
+
+from db_consultas import SP_LISTADO_PRECIOS, ConsultasDB
+
+class CursorFalso:
+    def __init__(self, filas, description):
+        self.filas = list(filas)
+        self.description = description
+        self.ejecutados = []
+        self.lotes = []
+        self.cerrado = False
+    
+    def execute(self, sql, parametros=()):
+        self.ejecutados.append((sql, parametros))
+        return self
+    
+    def nextset(self):
+        return False
+    
+    def fetchmany(self, tamano):
+        lote, self.filas = self.filas[:tamano], self.filas[tamano:]
+        self.lotes.append(len(lote))
+        return lote
+    
+    def fetchall(self):
+        lote, self.filas = self.filas, []
+        return lote
+    
+    def close(self):
+        self.cerrado = True
+
+class ConexionFalsa:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.timeout = 0
+    
+    def cursor(self):
+        return self._cursor
+
+DESCRIPCION_SP = (
+    ('plu_id', int, None, None, None, None, True),
+    ('plu_descripcion', str, None, None, None, None, True),
+    ('pr_pvp', decimal.Decimal, None, None, None, None, True),
+)
+
+def _consultas(cursor):
+    consultas = ConsultasDB()
+    consultas.conexion = ConexionFalsa(cursor)
+    return consultas
+
+def test_lote_tipa_las_columnas_numericas_segun_la_descripcion():
+    lote = ConsultasDB._lote_a_dataframe(
+        [(1, '001', decimal.Decimal('1.50')), (2, '002', 'sin precio'), (3, None, None)],
+        ['plu_id', 'plu_descripcion', 'pr_pvp'],
+        [int, str, decimal.Decimal]
+    )
+    
+    assert list(lote.columns) == ['plu_id', 'plu_descripcion', 'pr_pvp']
+    assert pd.api.types.is_integer_dtype(lote['plu_id'])
+    assert lote['plu_descripcion'].dtype == object
+    assert list(lote['plu_descripcion']) == ['001', '002', None]
+    assert lote['pr_pvp'].dtype == float
+    assert lote['pr_pvp'].iloc[0] == 1.5
+    assert lote['pr_pvp'].iloc[1:].isna().all()
+
+def test_lote_vacio_conserva_las_columnas():
+    lote = ConsultasDB._lote_a_dataframe([], ['plu_id', 'pr_pvp'], [int, float])
+    
+    assert list(lote.columns) == ['plu_id', 'pr_pvp']
+    assert lote.empty
+
+def test_sp_se_invoca_con_parametros_enlazados_y_se_lee_por_lotes():
+    filas = [(numero, f"PLU {numero}", decimal.Decimal(numero)) for numero in range(5)]
+    cursor = CursorFalso(filas, DESCRIPCION_SP)
+    categorias = pd.DataFrame({'IDCategoria': ["A'; DROP TABLE Categoria; --", 'B']})
+    
+    lotes = list(_consultas(cursor).iterar_stored_procedure_precios(
+        12, categorias, canal_param='Canal', canal_ids=['C1', 'C2'], tamano_lote=2
+    ))
+    
+    assert cursor.ejecutados == [
+        (SP_LISTADO_PRECIOS, (12, "A'; DROP TABLE Categoria; --,B", 'Canal', 'C1,C2')),
+    ]
+    assert [len(lote) for lote in lotes] == [2, 2, 1]
+    assert cursor.lotes == [2, 2, 1, 0]
+    assert cursor.cerrado
+    assert pd.concat(lotes)['plu_id'].tolist() == list(range(5))
+
+def test_tamano_lote_cero_lee_todo_de_una_vez():
+    cursor = CursorFalso([(1, 'PLU', decimal.Decimal('2.5'))], DESCRIPCION_SP)
+    
+    lotes = list(_consultas(cursor).iterar_stored_procedure_precios(
+        12, pd.DataFrame({'IDCategoria': ['A']}), tamano_lote=0
+    ))
+    
+    assert len(lotes) == 1 and lotes[0]['pr_pvp'].iloc[0] == 2.5
+    assert cursor.lotes == []
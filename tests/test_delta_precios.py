@@ -0,0 +1,82 @@
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+import delta_precios
+from config import Config
+from delta_precios import (
+    CAMBIO_AGREGADO, CAMBIO_ELIMINADO, CAMBIO_MODIFICADO, COLUMNAS_DELTA,
+    calcular_delta, cargar_snapshot_base, clave_snapshot, guardar_snapshot
+)
+
+def _matriz(filas):
+    return pd.DataFrame(filas, columns=['#PLU_NUM_PLU', '#PLU', 'PRODUCTO', 'Local|C1', 'Domicilio|C2'])
+
+def test_calcular_delta_clasifica_los_cambios():
+    anterior = _matriz([
+        (1, 'P1', 'Café', 2.5, 3.0),
+        (2, 'P2', 'Té', 1.0, 0.0),
+        (3, 'P3', 'Jugo', 4.0, 4.0),
+    ])
+    actual = _matriz([
+        (1, 'P1', 'Café', 2.5, 3.5),
+        (2, 'P2', 'Té', 1.0, 1.2),
+        (4, 'P4', 'Agua', 0.8, 0.0),
+    ])
+    
+    delta = calcular_delta(anterior, actual)
+    
+    assert list(delta.columns) == COLUMNAS_DELTA
+    cambios = {
+        (fila['#PLU'], fila['CATEGORIA']): (fila['CAMBIO'], fila['PVP_ANTERIOR'], fila['PVP_NUEVO'])
+        for _, fila in delta.iterrows()
+    }
+    assert cambios[('P1', 'Domicilio')] == (CAMBIO_MODIFICADO, 3.0, 3.5)
+    assert cambios[('P2', 'Domicilio')][0] == CAMBIO_AGREGADO
+    assert cambios[('P3', 'Local')][0] == CAMBIO_ELIMINADO
+    assert cambios[('P3', 'Local')][1] == 4.0
+    assert cambios[('P4', 'Local')][0] == CAMBIO_AGREGADO
+    assert ('P1', 'Local') not in cambios
+    assert len(delta) == 5
+    # Los PLU que ya no existen conservan sus datos de producto desde la matriz anterior
+    assert set(delta.loc[delta['#PLU'] == 'P3', 'PRODUCTO']) == {'Jugo'}
+
+def test_calcular_delta_sin_cambios_esta_vacio():
+    matriz = _matriz([(1, 'P1', 'Café', 2.5, 3.0)])
+    
+    assert len(calcular_delta(matriz, matriz.copy())) == 0
+
+def test_clave_snapshot_sigue_los_parametros_del_reporte():
+    base = clave_snapshot(10, 'Canal', None, ['c1', 'C2'])
+    
+    assert base == clave_snapshot(10, 'Canal', None, ['C2', ' C1'])
+    assert base != clave_snapshot(10, 'Canal', ['DELIVERY'], ['C1', 'C2'])
+    assert base != clave_snapshot(10, 'Canal', None, ['C1'])
+    assert base != clave_snapshot(11, 'Canal', None, ['C1', 'C2'])
+
+def test_snapshot_base_es_de_la_misma_clave_y_de_un_dia_anterior(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SNAPSHOTS_DIR', str(tmp_path))
+    matriz = _matriz([(1, 'P1', 'Café', 2.5, 3.0)])
+    clave, otra_clave = clave_snapshot(10, 'Canal', None, ['C1']), clave_snapshot(10, 'Canal', None, ['C2'])
+    
+    guardar_snapshot(clave, matriz)
+    assert cargar_snapshot_base(clave) is None
+    
+    ayer = delta_precios._ruta_snapshot(clave, date.today() - timedelta(days=1))
+    os.replace(delta_precios._ruta_snapshot(clave, date.today()), ayer)
+    
+    base, _ = cargar_snapshot_base(clave)
+    assert base.equals(matriz)
+    assert cargar_snapshot_base(otra_clave) is None
+
+def test_guardar_snapshot_elimina_los_vencidos(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SNAPSHOTS_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'SNAPSHOTS_DIAS', 7)
+    matriz = _matriz([(1, 'P1', 'Café', 2.5, 3.0)])
+    vencido = delta_precios._ruta_snapshot('10_otra', date.today() - timedelta(days=8))
+    matriz.to_pickle(vencido)
+    
+    guardar_snapshot(clave_snapshot(10, 'Canal', None, ['C1']), matriz)
+    
+    assert not os.path.exists(vencido)
@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+import pytest
+
+from ejecutor_reportes import EjecutorReportes
+
+def _trabajo_con_progreso(progreso, pasos):
+    for numero in range(pasos):
+        progreso('lote', {'numero': numero, 'pid': os.getpid()})
+    return pasos
+
+def _trabajo_que_falla():
+    raise ValueError("falló el SP")
+
+def _ejecutar_con_progreso(ejecutor):
+    eventos = []
+    
+    async def escenario():
+        async with ejecutor.canal_progreso(lambda paso, datos: eventos.append((paso, datos))) as progreso:
+            return await ejecutor.ejecutar(_trabajo_con_progreso, progreso, 3)
+    
+    try:
+        return asyncio.run(escenario()), eventos
+    finally:
+        ejecutor.cerrar()
+
+@pytest.mark.parametrize('tipo', ['thread', 'process'])
+def test_progreso_del_worker_llega_completo_al_salir_del_canal(tipo):
+    resultado, eventos = _ejecutar_con_progreso(EjecutorReportes(tipo, 1))
+    
+    assert resultado == 3
+    assert [(paso, datos['numero']) for paso, datos in eventos] == [('lote', 0), ('lote', 1), ('lote', 2)]
+    pids = {datos['pid'] for _, datos in eventos}
+    assert (pids == {os.getpid()}) == (tipo == 'thread')
+
+@pytest.mark.parametrize('tipo', ['thread', 'process'])
+def test_excepcion_del_worker_se_propaga(tipo):
+    ejecutor = EjecutorReportes(tipo, 1)
+    try:
+        with pytest.raises(ValueError, match="falló el SP"):
+            asyncio.run(ejecutor.ejecutar(_trabajo_que_falla))
+        # El pool sigue sirviendo después del fallo
+        assert ejecutor.enviar(_trabajo_con_progreso, print, 0).result() == 0
+    finally:
+        ejecutor.cerrar()
+
+def test_tipo_de_pool_no_valido():
+    with pytest.raises(ValueError):
+        EjecutorReportes('fibras')
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+from entrega import COLUMNAS_FIJAS, archivo_para_envio, dividir_reporte, preparar_entrega
+
+@pytest.fixture
+def umbrales(monkeypatch):
+    def fijar(limite_mb=49, comprimir_desde_mb=0, ahorro_minimo=0.15):
+        monkeypatch.setattr(Config, 'ENTREGA_LIMITE_MB', limite_mb)
+        monkeypatch.setattr(Config, 'ENTREGA_COMPRIMIR_DESDE_MB', comprimir_desde_mb)
+        monkeypatch.setattr(Config, 'ENTREGA_AHORRO_MINIMO', ahorro_minimo)
+    return fijar
+
+def _matriz(productos=400, categorias=8, semilla=0):
+    generador = np.random.default_rng(semilla)
+    df_final = pd.DataFrame({
+        '#PLU_NUM_PLU': range(productos),
+        '#PLU': [f"P{numero}" for numero in range(productos)],
+        'PRODUCTO': [f"Producto {numero}" for numero in range(productos)],
+    })
+    for numero in range(categorias):
+        df_final[f"Categoria {numero}|C{numero}"] = np.round(generador.uniform(0.5, 20, productos), 2)
+    return df_final
+
+def _escribir(df_final, ruta):
+    df_final.to_csv(ruta, index=False)
+    return ruta
+
+def test_bajo_el_umbral_no_se_comprime(tmp_path, umbrales):
+    umbrales(comprimir_desde_mb=1)
+    ruta = _escribir(_matriz(), str(tmp_path / 'reporte.csv'))
+    
+    archivo = archivo_para_envio(ruta)
+    
+    assert not archivo.comprimido
+    assert archivo.ruta == ruta
+    assert not os.path.exists(f"{ruta}.zip")
+
+def test_csv_sobre_el_umbral_se_comprime(tmp_path, umbrales):
+    umbrales()
+    ruta = _escribir(_matriz(), str(tmp_path / 'reporte.csv'))
+    
+    archivo = archivo_para_envio(ruta)
+    
+    assert archivo.comprimido
+    assert archivo.ruta == f"{ruta}.zip"
+    assert archivo.tamano_bytes < os.path.getsize(ruta)
+
+def test_no_se_comprime_si_no_ahorra_lo_suficiente(tmp_path, umbrales):
+    umbrales(ahorro_minimo=0.99)
+    ruta = _escribir(_matriz(), str(tmp_path / 'reporte.csv'))
+    
+    archivo = archivo_para_envio(ruta)
+    
+    assert not archivo.comprimido
+    assert not os.path.exists(f"{ruta}.zip")
+
+def test_sobre_el_limite_se_divide_por_categorias(tmp_path, umbrales):
+    df_final = _matriz()
+    ruta = _escribir(df_final, str(tmp_path / 'reporte.csv'))
+    # Ni comprimido cabe: el límite queda en un tercio del zip completo
+    umbrales(limite_mb=archivo_para_envio(ruta).tamano_bytes / 3 / 1024 / 1024)
+    
+    def escribir_parte(df_parte, parte, partes):
+        return _escribir(df_parte, str(tmp_path / f"reporte_parte_{parte}_de_{partes}.csv"))
+    
+    archivos = preparar_entrega(ruta, df_final, escribir_parte)
+    
+    assert len(archivos) > 1
+    assert all(archivo.tamano_bytes <= Config.ENTREGA_LIMITE_MB * 1024 * 1024 for archivo in archivos)
+    assert [archivo.parte for archivo in archivos] == list(range(1, len(archivos) + 1))
+    assert {archivo.partes for archivo in archivos} == {len(archivos)}
+
+def test_sobre_el_limite_sin_matriz_se_entrega_entero(tmp_path, umbrales):
+    ruta = _escribir(_matriz(), str(tmp_path / 'reporte.csv'))
+    umbrales(limite_mb=0.001, comprimir_desde_mb=100)
+    
+    archivos = preparar_entrega(ruta)
+    
+    assert [archivo.ruta for archivo in archivos] == [ruta]
+
+def test_dividir_reporte_conserva_columnas_del_producto_y_todas_las_categorias():
+    df_final = _matriz(productos=10, categorias=5)
+    
+    divisiones = dividir_reporte(df_final, 2)
+    
+    assert len(divisiones) == 2
+    assert all(list(division.columns[:3]) == COLUMNAS_FIJAS for division in divisiones)
+    categorias = [columna for division in divisiones for columna in division.columns[3:]]
+    assert categorias == list(df_final.columns[3:])
+
+def test_reporte_cacheado_recuerda_que_el_zip_no_conviene(umbrales, monkeypatch):
+    import db_consultas
+    
+    umbrales(ahorro_minimo=0.99)
+    llamadas = []
+    
+    def preparar_contando(ruta, *args, **kwargs):
+        llamadas.append(ruta)
+        return preparar_entrega(ruta, *args, **kwargs)
+    
+    monkeypatch.setattr(db_consultas, 'preparar_entrega', preparar_contando)
+    # Generado por lote: queda en cache sin preparar el envío
+    generado = db_consultas.procesar_cadena_simple('JUAN VALDEZ', forzar=True, formato='csv')
+    
+    primero = db_consultas.procesar_cadena_simple('JUAN VALDEZ', formato='csv', para_envio=True)
+    segundo = db_consultas.procesar_cadena_simple('JUAN VALDEZ', formato='csv', para_envio=True)
+    
+    assert primero.desde_cache and segundo.desde_cache
+    assert llamadas == [generado.ruta]
+    assert segundo.entrega == primero.entrega == [{
+        'ruta': generado.ruta, 'tamano_bytes': generado.tamano_bytes, 'comprimido': False, 'parte': 1, 'partes': 1,
+    }]
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from config import Config
+from escritor_excel import (
+    ALTO_FILA, FORMATO_PRECIO, calcular_anchos_columnas, escribir_excel_clasico, escribir_excel_streaming
+)
+
+def _matriz():
+    return pd.DataFrame({
+        '#PLU_NUM_PLU': [101, 102],
+        '#PLU': [1, 2],
+        'PRODUCTO': ['CAFE', 'TORTA DE CHOCOLATE'],
+        'BEBIDAS|A1': [2.5, np.nan],
+        'POSTRES|B2': [1234.5, 3.0],
+    })
+
+def _hojas(tmp_path):
+    df = _matriz()
+    escribir_excel_streaming(df, str(tmp_path / 'streaming.xlsx'))
+    escribir_excel_clasico(df, str(tmp_path / 'clasico.xlsx'))
+    return (
+        load_workbook(tmp_path / 'streaming.xlsx')['Precios'],
+        load_workbook(tmp_path / 'clasico.xlsx')['Precios'],
+    )
+
+def _formato(celda):
+    return (
+        celda.value, celda.font.b, celda.font.sz, celda.font.color.rgb if celda.font.color else None,
+        celda.fill.fgColor.rgb, celda.alignment.horizontal, celda.alignment.wrap_text,
+        celda.border.left.style, celda.number_format,
+    )
+
+def test_streaming_replica_el_formato_del_escritor_clasico(tmp_path):
+    streaming, clasico = _hojas(tmp_path)
+    
+    assert streaming.freeze_panes == clasico.freeze_panes == 'D2'
+    assert streaming.auto_filter.ref == clasico.auto_filter.ref == 'A1:E3'
+    assert {letra: dimension.width for letra, dimension in streaming.column_dimensions.items()} == \
+        {letra: dimension.width for letra, dimension in clasico.column_dimensions.items()}
+    
+    for fila_streaming, fila_clasica in zip(streaming.iter_rows(), clasico.iter_rows()):
+        assert [_formato(celda) for celda in fila_streaming] == [_formato(celda) for celda in fila_clasica]
+    
+    encabezado = streaming['A1']
+    assert encabezado.font.b and encabezado.fill.fgColor.rgb == '00366092'
+    assert streaming['D2'].number_format == streaming['E3'].number_format == FORMATO_PRECIO
+    # NaN queda como celda vacía, como con pandas
+    assert streaming['D3'].value is None
+
+def test_streaming_usa_alto_de_fila_por_defecto(tmp_path):
+    streaming, clasico = _hojas(tmp_path)
+    
+    assert streaming.sheet_format.defaultRowHeight == ALTO_FILA
+    assert streaming.sheet_format.customHeight
+    assert not any(dimension.height for dimension in streaming.row_dimensions.values())
+    assert {dimension.height for dimension in clasico.row_dimensions.values()} == {ALTO_FILA}
+
+def test_streaming_informa_el_avance(tmp_path, monkeypatch):
+    monkeypatch.setattr('escritor_excel.FILAS_POR_AVISO', 1)
+    avisos = []
+    
+    escribir_excel_streaming(_matriz(), str(tmp_path / 'avance.xlsx'), progreso=lambda filas, total: avisos.append((filas, total)))
+    
+    assert avisos == [(1, 2), (2, 2), (2, 2)]
+
+def test_anchos_respetan_minimos_y_maximo():
+    df = pd.DataFrame({
+        '#PLU': [1],
+        'PRODUCTO': ['X' * 80],
+        'BEBIDAS|A1': [123456789012345.25],
+        'POSTRES|B2': [1.5],
+    })
+    
+    assert calcular_anchos_columnas(df, ajustar=True) == {
+        '#PLU': 12,
+        'PRODUCTO': 50,
+        'BEBIDAS|A1': len('123456789012345.25') + 2,
+        'POSTRES|B2': 15,
+    }
+
+def test_anchos_cuentan_el_encabezado_y_el_texto_mas_largo():
+    df = pd.DataFrame({'#PLU_NUM_PLU': [1, 22], 'PRODUCTO': ['A', 'B' * 45]})
+    
+    assert calcular_anchos_columnas(df, ajustar=True) == {'#PLU_NUM_PLU': 14, 'PRODUCTO': 47}
+
+def test_sin_autoancho_sobre_el_limite_de_columnas(monkeypatch):
+    df = pd.DataFrame({'PRODUCTO': ['B' * 45], 'BEBIDAS|A1': [1.5], 'POSTRES|B2': [2.5]})
+    monkeypatch.setattr(Config, 'EXCEL_AUTOANCHO', True)
+    
+    monkeypatch.setattr(Config, 'EXCEL_AUTOANCHO_MAX_COLUMNAS', 3)
+    assert calcular_anchos_columnas(df)['PRODUCTO'] == 47
+    
+    monkeypatch.setattr(Config, 'EXCEL_AUTOANCHO_MAX_COLUMNAS', 2)
+    assert calcular_anchos_columnas(df) == {'PRODUCTO': 40, 'BEBIDAS|A1': 15, 'POSTRES|B2': 15}
+    
+    monkeypatch.setattr(Config, 'EXCEL_AUTOANCHO_MAX_COLUMNAS', 3)
+    monkeypatch.setattr(Config, 'EXCEL_AUTOANCHO', False)
+    assert calcular_anchos_columnas(df)['PRODUCTO'] == 40
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from exportadores import Exportador, ExportadorCSV, ExportadorParquet, formatos_disponibles, obtener_exportador
+
+def test_exportador_sin_escribir_no_se_puede_instanciar():
+    class ExportadorIncompleto(Exportador):
+        formato = 'txt'
+    
+    with pytest.raises(TypeError):
+        ExportadorIncompleto()
+
+def test_formatos_registrados():
+    assert {'xlsx', 'csv'} <= set(formatos_disponibles())
+    with pytest.raises(ValueError):
+        obtener_exportador('pdf')
+
+def test_csv_escribe_todas_las_filas(tmp_path):
+    df_final = pd.DataFrame({'#PLU': [f"P{numero}" for numero in range(12)], 'Local|C1': [1.5] * 12})
+    ruta = str(tmp_path / 'reporte.csv')
+    avances = []
+    
+    ExportadorCSV().escribir(df_final, ruta, progreso=lambda escritas, total: avances.append((escritas, total)))
+    
+    assert len(pd.read_csv(ruta, sep=None, engine='python')) == 12
+    assert avances[-1] == (12, 12)
+
+def test_csv_por_bloques_reconstruye_la_matriz(tmp_path, monkeypatch):
+    monkeypatch.setattr('exportadores.FILAS_POR_BLOQUE_CSV', 5)
+    monkeypatch.setattr('config.Config.CSV_SEPARADOR', ';')
+    df_final = pd.DataFrame({
+        '#PLU_NUM_PLU': list(range(12)),
+        'PRODUCTO': [f"Producto; {numero}" for numero in range(12)],
+        'Local|C1': [numero * 1.25 for numero in range(12)],
+    })
+    ruta = str(tmp_path / 'bloques.csv')
+    avances = []
+    
+    ExportadorCSV().escribir(df_final, ruta, progreso=lambda escritas, total: avances.append(escritas))
+    
+    with open(ruta, encoding='utf-8-sig') as archivo:
+        assert sum(1 for linea in archivo if linea.startswith('#PLU_NUM_PLU')) == 1
+    pd.testing.assert_frame_equal(pd.read_csv(ruta, sep=';', encoding='utf-8-sig'), df_final)
+    assert avances == [5, 10, 12]
+
+def test_csv_de_matriz_vacia_solo_lleva_encabezado(tmp_path):
+    ruta = str(tmp_path / 'vacio.csv')
+    
+    ExportadorCSV().escribir(pd.DataFrame(columns=['#PLU', 'Local|C1']), ruta)
+    
+    leido = pd.read_csv(ruta, sep=None, engine='python', encoding='utf-8-sig')
+    assert list(leido.columns) == ['#PLU', 'Local|C1'] and leido.empty
+
+def test_registro_rechaza_formatos_desconocidos_o_no_disponibles(monkeypatch):
+    assert obtener_exportador('CSV').formato == 'csv'
+    
+    with pytest.raises(ValueError, match="no soportado"):
+        obtener_exportador('xml')
+    
+    monkeypatch.setattr(ExportadorParquet, 'disponible', property(lambda self: False))
+    assert 'parquet' not in formatos_disponibles()
+    with pytest.raises(ValueError, match="no está disponible"):
+        obtener_exportador('parquet')
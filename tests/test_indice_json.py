@@ -0,0 +1,63 @@
+import multiprocessing
+
+from cache_reportes import CacheReportes
+from indice_json import IndiceJSON
+
+def _registrar(ruta, proceso, cantidad):
+    indice = IndiceJSON(ruta)
+    for numero in range(cantidad):
+        with indice.modificar() as entradas:
+            entradas[f"{proceso}-{numero}"] = {'proceso': proceso}
+
+def test_escritores_en_procesos_distintos_no_pierden_cambios(tmp_path):
+    ruta = str(tmp_path / '.indice.json')
+    procesos = [
+        multiprocessing.get_context('fork').Process(target=_registrar, args=(ruta, proceso, 25))
+        for proceso in range(4)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join(30)
+    
+    assert all(proceso.exitcode == 0 for proceso in procesos)
+    assert len(IndiceJSON(ruta).leer()) == 100
+
+def test_lectura_ve_cambios_de_otra_instancia(tmp_path):
+    ruta = str(tmp_path / '.indice.json')
+    lector, escritor = IndiceJSON(ruta), IndiceJSON(ruta)
+    assert lector.leer() == {}
+    
+    with escritor.modificar() as entradas:
+        entradas['a'] = {'valor': 1}
+    
+    assert lector.leer() == {'a': {'valor': 1}}
+
+def test_excepcion_en_modificar_no_escribe(tmp_path):
+    ruta = str(tmp_path / '.indice.json')
+    indice = IndiceJSON(ruta)
+    with indice.modificar() as entradas:
+        entradas['a'] = {'valor': 1}
+    
+    try:
+        with indice.modificar() as entradas:
+            entradas['b'] = {'valor': 2}
+            raise ValueError("falla a mitad")
+    except ValueError:
+        pass
+    
+    assert indice.leer() == {'a': {'valor': 1}}
+    assert IndiceJSON(ruta).leer() == {'a': {'valor': 1}}
+
+def test_cache_reportes_comparte_entradas_entre_instancias(tmp_path):
+    ruta_reporte = tmp_path / 'reporte.xlsx'
+    ruta_reporte.write_bytes(b'xlsx')
+    ruta_indice = str(tmp_path / '.cache_reportes.json')
+    clave = CacheReportes.clave(10, 'canal', None, ['C1'])
+    
+    CacheReportes(ruta_indice, ttl=60).guardar(clave, str(ruta_reporte))
+    cache = CacheReportes(ruta_indice, ttl=60)
+    
+    assert cache.obtener(clave)['ruta'] == str(ruta_reporte)
+    cache.invalidar(10)
+    assert CacheReportes(ruta_indice, ttl=60).obtener(clave) is None
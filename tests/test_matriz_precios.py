@@ -0,0 +1,86 @@
+import pandas as pd
+
+from cadenas_config import obtener_categorias_excluidas
+from matriz_precios import AcumuladorMatriz
+
+COLUMNAS_SP = {
+    'plu_num': 'plu_num_plu',
+    'plu_id': 'plu_id',
+    'descripcion': 'plu_descripcion',
+    'pvp': 'pr_pvp',
+    'categoria_id': 'IDCategoria',
+}
+
+CATEGORIAS = pd.DataFrame({'IDCategoria': ['C1', 'C2'], 'cat_descripcion': ['Local', 'Domicilio']})
+
+def _lote(filas):
+    return pd.DataFrame(filas, columns=['plu_num_plu', 'plu_id', 'plu_descripcion', 'pr_pvp', 'IDCategoria'])
+
+def test_primer_precio_gana_entre_lotes():
+    # compactar_cada=2 obliga a compactar entre lotes: el orden de llegada debe conservarse
+    acumulador = AcumuladorMatriz(COLUMNAS_SP, compactar_cada=2)
+    acumulador.agregar(_lote([(1, 'p1', 'Café', 2.5, 'c1')]))
+    acumulador.agregar(_lote([(1, 'P1', 'Café repetido', 9.9, 'C1'), (2, 'p2', 'Té', 1.0, 'C2')]))
+    acumulador.agregar(_lote([(1, 'p1', 'Café', 7.0, 'C2'), (2, 'p2', 'Té', 5.0, 'C2')]))
+    
+    df_final = acumulador.construir(CATEGORIAS)
+    
+    assert list(df_final.columns) == ['#PLU_NUM_PLU', '#PLU', 'PRODUCTO', 'Local|C1', 'Domicilio|C2']
+    assert df_final['PRODUCTO'].tolist() == ['Café', 'Té']
+    assert df_final['Local|C1'].tolist() == [2.5, 0.0]
+    assert df_final['Domicilio|C2'].tolist() == [7.0, 1.0]
+    assert acumulador.registros == 5
+    assert acumulador.lotes == 3
+
+def test_precios_invalidos_o_negativos_quedan_en_cero():
+    acumulador = AcumuladorMatriz(COLUMNAS_SP)
+    acumulador.agregar(_lote([(1, 'p1', 'Café', 'no numérico', 'C1'), (1, 'p1', 'Café', -3, 'C2')]))
+    
+    df_final = acumulador.construir(CATEGORIAS)
+    
+    assert df_final[['Local|C1', 'Domicilio|C2']].values.tolist() == [[0.0, 0.0]]
+
+def test_sin_lotes_devuelve_matriz_vacia_con_columnas():
+    df_final = AcumuladorMatriz(COLUMNAS_SP).construir(CATEGORIAS)
+    
+    assert len(df_final) == 0
+    assert list(df_final.columns) == ['#PLU_NUM_PLU', '#PLU', 'PRODUCTO', 'Local|C1', 'Domicilio|C2']
+
+def test_categoria_repetida_queda_en_su_primera_posicion():
+    categorias = pd.DataFrame({
+        'IDCategoria': ['C1', 'C2', 'c1 '],
+        'cat_descripcion': ['Local', 'Domicilio', 'Local'],
+    })
+    acumulador = AcumuladorMatriz(COLUMNAS_SP)
+    acumulador.agregar(_lote([(1, 'p1', 'Café', 2.5, 'C1'), (1, 'p1', 'Café', 3.0, 'C2')]))
+    
+    df_final = acumulador.construir(categorias)
+    
+    assert list(df_final.columns) == ['#PLU_NUM_PLU', '#PLU', 'PRODUCTO', 'Local|C1', 'Domicilio|C2']
+    assert df_final[['Local|C1', 'Domicilio|C2']].values.tolist() == [[2.5, 3.0]]
+
+def test_filtra_categorias_excluidas_de_la_cadena():
+    excluida = obtener_categorias_excluidas(12)[0]
+    categorias = pd.DataFrame({'IDCategoria': ['C1', excluida], 'cat_descripcion': ['Local', 'Excluida']})
+    acumulador = AcumuladorMatriz(COLUMNAS_SP, cdn_id=12)
+    acumulador.agregar(_lote([
+        (1, 'p1', 'Café', 2.5, 'C1'),
+        (1, 'p1', 'Café', 4.0, excluida.lower()),
+        (2, 'p2', 'Solo excluida', 1.0, excluida),
+    ]))
+    
+    df_final = acumulador.construir(categorias)
+    
+    assert acumulador.filtrados == 2
+    assert df_final['PRODUCTO'].tolist() == ['Café']
+    assert df_final[f'Excluida|{excluida}'].tolist() == [0.0]
+
+def test_precios_nulos_quedan_en_cero_y_el_primero_gana_tras_compactar():
+    acumulador = AcumuladorMatriz(COLUMNAS_SP, compactar_cada=1)
+    acumulador.agregar(_lote([(1, 'p1', 'Café', None, 'C1'), (1, 'p1', 'Café', float('nan'), 'C2')]))
+    acumulador.agregar(_lote([(1, 'p1', 'Café', 8.0, 'C1'), (1, 'p1', 'Café', 0, 'C2')]))
+    
+    df_final = acumulador.construir(CATEGORIAS)
+    
+    # El primer registro (nulo, llevado a 0.0) gana aunque un lote posterior traiga precio
+    assert df_final[['Local|C1', 'Domicilio|C2']].values.tolist() == [[0.0, 0.0]]
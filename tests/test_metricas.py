@@ -0,0 +1,30 @@
+from metricas import Contador, Histograma
+
+def test_contador_expone_enteros_grandes_sin_notacion_cientifica():
+    contador = Contador('reportes_bytes_total', 'Bytes', ('cadena',))
+    contador.incrementar(123456789, cadena='JUAN VALDEZ')
+    contador.incrementar(1, cadena='JUAN VALDEZ')
+    
+    assert contador.exponer() == ['reportes_bytes_total{cadena="JUAN VALDEZ"} 123456790']
+
+def test_contador_expone_decimales_con_precision_completa():
+    contador = Contador('segundos_total', 'Segundos', ())
+    contador.incrementar(0.1)
+    contador.incrementar(1234567.125)
+    
+    assert contador.exponer() == [f"segundos_total {1234567.225!r}"]
+    assert float(contador.exponer()[0].split()[-1]) == 0.1 + 1234567.125
+
+def test_histograma_expone_buckets_suma_y_cantidad():
+    histograma = Histograma('duracion_segundos', 'Duración', ('etapa',), limites=(0.5, 1, 1000000))
+    histograma.observar(0.25, etapa='matriz')
+    histograma.observar(0.7, etapa='matriz')
+    
+    assert histograma.exponer() == [
+        'duracion_segundos_bucket{etapa="matriz",le="0.5"} 1',
+        'duracion_segundos_bucket{etapa="matriz",le="1"} 2',
+        'duracion_segundos_bucket{etapa="matriz",le="1000000"} 2',
+        'duracion_segundos_bucket{etapa="matriz",le="+Inf"} 2',
+        'duracion_segundos_sum{etapa="matriz"} 0.95',
+        'duracion_segundos_count{etapa="matriz"} 2',
+    ]
@@ -0,0 +1,67 @@
+import pytest
+
+import db_consultas
+import metricas
+from lote_reportes import generar_reportes_lote
+
+@pytest.fixture
+def registro(monkeypatch):
+    registro = metricas.RegistroMetricas()
+    monkeypatch.setattr(metricas, '_registro_metricas', registro)
+    return registro
+
+def _etapas(registro, nombre_cadena):
+    return {etapa for cadena, etapa in registro.duracion_etapa._series if cadena == nombre_cadena}
+
+def test_proceso_completo_registra_sus_etapas(registro):
+    resultado = db_consultas.procesar_cadena_simple('JUAN VALDEZ', forzar=True, formato='csv')
+    
+    assert resultado is not None
+    assert {'categorias', 'stored_procedure', 'matriz', 'escritura', 'total'} <= _etapas(registro, 'JUAN VALDEZ')
+    assert registro.fallos._valores == {}
+
+def test_proceso_completo_registra_fallos(registro, monkeypatch):
+    monkeypatch.setattr(db_consultas.ConsultasDB, 'obtener_categorias_por_cadena', lambda self, cdn_id: None)
+    
+    assert db_consultas.procesar_cadena_simple('JUAN VALDEZ', forzar=True) is None
+    assert registro.fallos._valores == {('JUAN VALDEZ', 'generacion'): 1}
+    assert _etapas(registro, 'JUAN VALDEZ') == {'categorias'}
+
+def test_lote_con_hilos_mide_cada_cadena_una_vez(registro, tmp_path):
+    ruta_metricas = str(tmp_path / 'lote.prom')
+    
+    manifiesto = generar_reportes_lote(
+        ['JUAN VALDEZ', 'CAJUN'], max_paralelo=2, tipo_pool='thread', forzar=True, formato='csv',
+        ruta_manifiesto=str(tmp_path / 'manifiesto.json'), ruta_metricas=ruta_metricas
+    )
+    
+    assert manifiesto['exitosos'] == 2
+    for nombre_cadena in ('JUAN VALDEZ', 'CAJUN'):
+        assert registro.duracion_etapa._series[(nombre_cadena, 'total')][-1] == 1
+    with open(ruta_metricas, encoding='utf-8') as f:
+        assert 'reportes_etapa_duracion_segundos_count{cadena="CAJUN",etapa="total"} 1' in f.read()
+
+def test_lote_con_procesos_registra_las_etapas_del_worker(registro, tmp_path):
+    manifiesto = generar_reportes_lote(
+        ['JUAN VALDEZ'], max_paralelo=1, tipo_pool='process', forzar=True, formato='csv',
+        ruta_manifiesto=str(tmp_path / 'manifiesto.json')
+    )
+    
+    assert manifiesto['exitosos'] == 1
+    # Las etapas se midieron en el worker; el proceso padre las registra con el ResultadoReporte devuelto
+    assert {'categorias', 'stored_procedure', 'matriz', 'escritura', 'total'} <= _etapas(registro, 'JUAN VALDEZ')
+    assert registro.duracion_etapa._series[('JUAN VALDEZ', 'total')][-1] == 1
+
+def test_registrar_generacion_cuenta_fallos_y_omite_el_cache(registro):
+    resultado = db_consultas.procesar_cadena_simple('CAJUN', forzar=True, formato='csv')
+    desde_cache = db_consultas.procesar_cadena_simple('CAJUN', formato='csv')
+    # Registro aparte: la generación de arriba ya registró sus etapas en el del proceso
+    padre = metricas.RegistroMetricas()
+    
+    padre.registrar_generacion('CAJUN', None)
+    padre.registrar_generacion('CAJUN', desde_cache)
+    padre.registrar_generacion('CAJUN', resultado)
+    
+    assert desde_cache.desde_cache and not resultado.desde_cache
+    assert padre.fallos._valores == {('CAJUN', 'generacion'): 1}
+    assert padre.duracion_etapa._series[('CAJUN', 'total')][-1] == 1
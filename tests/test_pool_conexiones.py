@@ -0,0 +1,85 @@
+import pytest
+
+from pool_conexiones import PoolConexiones
+
+class ConexionFalsa:
+    def __init__(self):
+        self.sana = True
+        self.cerrada = False
+    
+    def cursor(self):
+        return self
+    
+    def execute(self, consulta):
+        if not self.sana:
+            raise ConnectionError("conexión caída")
+    
+    def fetchone(self):
+        return (1,)
+    
+    def close(self):
+        self.cerrada = True
+    
+    def rollback(self):
+        pass
+
+def _pool(**kwargs):
+    creadas = []
+    
+    def fabrica():
+        creadas.append(ConexionFalsa())
+        return creadas[-1]
+    
+    return PoolConexiones(fabrica, **kwargs), creadas
+
+def test_reutiliza_conexion_saludable():
+    pool, creadas = _pool(minimo=1, maximo=2)
+    
+    pool.liberar(pool.obtener())
+    conexion = pool.obtener()
+    
+    assert conexion is creadas[0]
+    assert pool.estadisticas()['creadas'] == 1
+    assert pool.estadisticas()['reutilizadas'] == 1
+
+def test_descarta_conexion_que_falla_la_verificacion_de_salud():
+    pool, creadas = _pool(minimo=1, maximo=2)
+    pool.liberar(pool.obtener())
+    creadas[0].sana = False
+    
+    conexion = pool.obtener()
+    
+    assert conexion is creadas[1]
+    assert creadas[0].cerrada
+    estadisticas = pool.estadisticas()
+    assert estadisticas['descartadas'] == 1
+    assert estadisticas['total'] == 1
+
+def test_expira_inactivas_sobre_el_minimo():
+    pool, creadas = _pool(minimo=1, maximo=3, tiempo_inactividad=0)
+    primera, segunda = pool.obtener(), pool.obtener()
+    pool.liberar(primera)
+    pool.liberar(segunda)
+    
+    # Al pedir otra conexión se expiran las libres inactivas, pero se respeta el mínimo
+    conexion = pool.obtener()
+    
+    assert primera.cerrada
+    assert conexion is segunda
+    assert pool.estadisticas()['total'] == 1
+
+def test_espera_acotada_sin_cupo():
+    pool, _ = _pool(minimo=0, maximo=1, tiempo_espera=0.05)
+    pool.obtener()
+    
+    with pytest.raises(TimeoutError):
+        pool.obtener()
+
+def test_pool_cerrado_no_entrega_conexiones():
+    pool, creadas = _pool(minimo=0, maximo=1)
+    pool.liberar(pool.obtener())
+    pool.cerrar()
+    
+    assert creadas[0].cerrada
+    with pytest.raises(RuntimeError):
+        pool.obtener()
@@ -0,0 +1,48 @@
+import asyncio
+
+import admision
+import db_consultas
+import precalentamiento
+from config import Config
+
+class EjecutorFalso:
+    def __init__(self, control):
+        self.control = control
+        self.activos_durante = []
+    
+    async def ejecutar(self, funcion, *args, **kwargs):
+        self.activos_durante.append(self.control.activos)
+        return None
+
+def test_precalentamiento_ocupa_cupo_de_admision(monkeypatch):
+    control = admision.ControlAdmision(max_concurrentes=1, max_por_usuario=1, max_cola=5)
+    ejecutor = EjecutorFalso(control)
+    monkeypatch.setattr(precalentamiento, 'obtener_control_admision', lambda: control)
+    monkeypatch.setattr(precalentamiento, 'obtener_ejecutor_reportes', lambda: ejecutor)
+    monkeypatch.setattr(db_consultas, 'procesar_cadena_simple', lambda *args, **kwargs: None)
+    monkeypatch.setattr(Config, 'PRECALENTAR_CADENAS', ['JUAN VALDEZ', 'CADENA INEXISTENTE'])
+    
+    asyncio.run(precalentamiento.precalentar_reportes(None))
+    
+    assert ejecutor.activos_durante == [1]
+    assert control.activos == 0
+    assert control.admitidos == 1
+
+def test_precalentamiento_se_omite_con_la_cola_llena(monkeypatch):
+    async def escenario():
+        control = admision.ControlAdmision(max_concurrentes=1, max_por_usuario=1, max_cola=0)
+        ocupado = control.solicitar(123)
+        monkeypatch.setattr(precalentamiento, 'obtener_control_admision', lambda: control)
+        await precalentamiento.precalentar_reportes(None)
+        control.liberar(ocupado)
+        return control
+    
+    ejecutor = EjecutorFalso(None)
+    monkeypatch.setattr(precalentamiento, 'obtener_ejecutor_reportes', lambda: ejecutor)
+    monkeypatch.setattr(Config, 'PRECALENTAR_CADENAS', ['JUAN VALDEZ'])
+    
+    control = asyncio.run(escenario())
+    
+    assert ejecutor.activos_durante == []
+    assert control.rechazados[admision.RECHAZO_COLA] == 1
+    assert precalentamiento.ultimas_actualizaciones['JUAN VALDEZ']['estado'] == 'omitido'
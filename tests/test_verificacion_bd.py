@@ -0,0 +1,21 @@
+import asyncio
+
+import db_consultas
+from config import Config
+from verificacion_bd import VerificacionBD
+
+def test_verificacion_deja_el_pool_caliente(monkeypatch):
+    monkeypatch.setattr(Config, 'DB_POOL_MIN', 2)
+    db_consultas.cerrar_pool_conexiones()
+    try:
+        verificacion = VerificacionBD()
+        
+        assert asyncio.run(verificacion.verificar())
+        assert db_consultas.estadisticas_pool_conexiones() == {
+            'total': 2, 'libres': 2, 'en_uso': 0, 'creadas': 2, 'reutilizadas': 0, 'descartadas': 0,
+        }
+        assert "Conexiones BD: 0 en uso, 2 libres" in verificacion.texto_estado()
+    finally:
+        db_consultas.cerrar_pool_conexiones()
+    
+    assert db_consultas.estadisticas_pool_conexiones() is None
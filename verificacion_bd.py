@@ -0,0 +1,124 @@
+# verificacion_bd.py
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_VERIFICANDO = 'verificando'
+ESTADO_LISTA = 'lista'
+ESTADO_ERROR = 'error'
+
+class VerificacionBD:
+    """
+    Verificación de la conexión a la base de datos en segundo plano: el bot atiende desde el
+    arranque y la consulta (con su Connection Timeout) corre en un hilo. Si falla se reintenta
+    cada BD_REINTENTO_SEGUNDOS hasta lograrlo.
+    """
+    
+    def __init__(self, intervalo_reintento: float = None):
+        self.intervalo_reintento = Config.BD_REINTENTO_SEGUNDOS if intervalo_reintento is None else intervalo_reintento
+        self.estado = ESTADO_PENDIENTE
+        self.error: Optional[str] = None
+        self.intentos = 0
+        self.verificada_en: Optional[float] = None
+        self.duracion: Optional[float] = None
+        self._tarea: Optional[asyncio.Task] = None
+    
+    @property
+    def lista(self) -> bool:
+        return self.estado == ESTADO_LISTA
+    
+    def _conectar(self) -> bool:
+        # db_consultas trae pandas y openpyxl: se importa aquí, fuera del camino de arranque
+        from db_consultas import ConsultasDB, obtener_pool_conexiones
+        
+        consultas = ConsultasDB()
+        if not consultas.backend.configurado:
+            return False
+        # Abre DB_POOL_MIN conexiones: el primer reporte las encuentra listas en el pool
+        return obtener_pool_conexiones(consultas.backend).calentar()
+    
+    async def verificar(self) -> bool:
+        """Un intento de conexión en un hilo; actualiza el estado"""
+        self.estado = ESTADO_VERIFICANDO
+        self.intentos += 1
+        inicio = time.perf_counter()
+        try:
+            conectado = await asyncio.to_thread(self._conectar)
+            self.error = None if conectado else "No se pudo conectar a la base de datos"
+        except Exception as e:
+            conectado, self.error = False, str(e)
+        
+        self.duracion = time.perf_counter() - inicio
+        self.estado = ESTADO_LISTA if conectado else ESTADO_ERROR
+        if conectado:
+            self.verificada_en = time.time()
+            logger.info(f"Conexión a BD verificada en {self.duracion:.2f}s (intento {self.intentos})")
+        else:
+            logger.error(
+                f"Verificación de BD fallida (intento {self.intentos}): {self.error}; "
+                f"se reintenta en {self.intervalo_reintento:.0f}s"
+            )
+        return conectado
+    
+    async def _ciclo(self):
+        while not await self.verificar():
+            await asyncio.sleep(self.intervalo_reintento)
+    
+    def iniciar(self) -> asyncio.Task:
+        """Lanza la verificación sin esperarla (llamar desde el event loop)"""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._ciclo())
+        return self._tarea
+    
+    def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+    
+    def texto_estado(self) -> str:
+        if self.estado == ESTADO_LISTA:
+            from db_consultas import estadisticas_pool_conexiones
+            
+            verificada = datetime.fromtimestamp(self.verificada_en).strftime('%H:%M:%S')
+            texto = f"Base de datos: conectada (verificada {verificada}, {self.duracion:.1f} s)"
+            pool = estadisticas_pool_conexiones()
+            if pool is not None:
+                texto += (
+                    f"\nConexiones BD: {pool['en_uso']} en uso, {pool['libres']} libres "
+                    f"({pool['creadas']} abiertas, {pool['reutilizadas']} reutilizadas, "
+                    f"{pool['descartadas']} descartadas)"
+                )
+            return texto
+        if self.estado == ESTADO_ERROR:
+            return (
+                f"Base de datos: sin conexión ({self.intentos} intento(s), "
+                f"se reintenta cada {self.intervalo_reintento:.0f} s)"
+            )
+        return "Base de datos: verificando conexión..."
+    
+    def aviso_usuario(self) -> Optional[str]:
+        """Aviso para /start mientras la base no está lista; None si no hace falta"""
+        if self.estado == ESTADO_LISTA:
+            return None
+        if self.estado == ESTADO_ERROR:
+            return (
+                "Aviso: la base de datos no está disponible en este momento y se reintenta "
+                "automáticamente. Los reportes recientes en cache siguen disponibles."
+            )
+        return "Aviso: el sistema acaba de iniciar y se está verificando la conexión a la base de datos."
+
+_verificacion_bd = None
+
+def obtener_verificacion_bd() -> VerificacionBD:
+    global _verificacion_bd
+    
+    if _verificacion_bd is None:
+        _verificacion_bd = VerificacionBD()
+    
+    return _verificacion_bd